@@ -0,0 +1,252 @@
+# Microbenchmark for the Porter stemmer. Run it from the repository root:
+#   python benchmark_porter.py [repetitions]
+#
+# It compares porter.stem_term() with the baseline implementation below (porter.py before the measures were computed
+# from a cached consonant/vowel pattern), which rebuilds the consonant set and rescans the stem for every measure.
+# The baseline raises IndexError for terms whose measured stem is empty (e. g. "eed", "ically"); these terms are
+# counted and left out of its timing.
+
+import os
+import sys
+import time
+
+import porter
+
+RAW_DATA_PATH = "raw_data"
+
+
+# Baseline implementation:
+
+def _baseline_get_measure(term: str) -> int:
+    vowels = "aeiou"
+    consonants = ''.join(set('abcdefghijklmnopqrstuvwxyz') - set(vowels))
+    m = 0
+    current_is_vowel = term[0] in vowels
+    for letter in term[1:]:
+        if current_is_vowel and letter in consonants:
+            m += 1
+            current_is_vowel = False
+        elif not current_is_vowel and letter in vowels:
+            current_is_vowel = True
+    return m
+
+
+def _baseline_condition_v(stem: str) -> bool:
+    """
+    Returns whether condition *v* is true for a given stem (= the stem contains a vowel).
+    :param stem: Word stem to check
+    :return: True if the condition *v* holds
+    """
+    vowels = "aeiou"
+    for letter in stem:
+        if letter in vowels:
+            return True
+    return False
+
+
+def _baseline_condition_d(stem: str) -> bool:
+    """
+    Returns whether condition *d is true for a given stem (= the stem ends with a double consonant (e.g. -TT, -SS)).
+    :param stem: Word stem to check
+    :return: True if the condition *d holds
+    """
+    consonants = ''.join(set('abcdefghijklmnopqrstuvwxyz') - set("aeiou"))
+    return len(stem) > 1 and stem[-1] == stem[-2] and stem[-1] in consonants
+
+
+def _baseline_cond_o(stem: str) -> bool:
+    """
+    Returns whether condition *o is true for a given stem (= the stem ends cvc, where the second c is not W, X or Y
+    (e.g. -WIL, -HOP)).
+    :param stem: Word stem to check
+    :return: True if the condition *o holds
+    """
+    if len(stem) < 3:
+        return False
+    vowels = "aeiou"
+    consonants = ''.join(set('abcdefghijklmnopqrstuvwxyz') - set(vowels))
+    return (stem[-1] in consonants and
+            stem[-1] not in "wxy" and
+            stem[-2] in vowels and
+            stem[-3] in consonants)
+
+
+def _baseline_stem_term(term: str) -> str:
+    """
+    porter.stem_term() as it was before the measures were computed from a cached consonant/vowel pattern.
+    """
+    if len(term) <= 2:
+        return term
+
+    # Step 1a
+    if term.endswith("sses"):
+        term = term[:-2]
+    elif term.endswith("ies"):
+        term = term[:-2]
+    elif term.endswith("ss"):
+        term = term
+    elif term.endswith("s"):
+        term = term[:-1]
+
+    # Step 1b
+    if term.endswith("eed"):
+        if _baseline_get_measure(term[:-3]) > 0:
+            term = term[:-1]
+    elif term.endswith("ed") or term.endswith("ing"):
+        stem = term[:-2] if term.endswith("ed") else term[:-3]
+        if _baseline_condition_v(stem):
+            term = stem
+            if term.endswith("at") or term.endswith("bl") or term.endswith("iz"):
+                term += "e"
+            elif _baseline_condition_d(term) and not (term.endswith("l") or term.endswith("s") or term.endswith("z")):
+                term = term[:-1]
+            elif _baseline_get_measure(term) == 1 and _baseline_cond_o(term):
+                term += "e"
+
+    # Step 1c
+    if term.endswith("y") and _baseline_condition_v(term[:-1]):
+        term = term[:-1] + "i"
+
+    # Steps 2 to 5...
+    # Step 2
+        if term.endswith('ational') and _baseline_get_measure(term[:-5]) > 0:
+            term = term[:-5] + 'e'
+        elif term.endswith('tional') and _baseline_get_measure(term[:-2]) > 0:
+            term = term[:-2]
+        elif term.endswith('enic') and _baseline_get_measure(term[:-1]) > 0:
+            term = term[:-1] + 'e'
+        elif term.endswith('anci') and _baseline_get_measure(term[:-1]) > 0:
+            term = term[:-1] + 'e'
+        elif term.endswith('izer') and _baseline_get_measure(term[:-1]) > 0:
+            term = term[:-1]
+        elif term.endswith('abli') and _baseline_get_measure(term[:-1]) > 0:
+            term = term[:-1] + 'e'
+        elif term.endswith('alli') and _baseline_get_measure(term[:-2]) > 0:
+            term = term[:-2]
+        elif term.endswith('entli') and _baseline_get_measure(term[:-2]) > 0:
+            term = term[:-1]
+        elif term.endswith('eli') and _baseline_get_measure(term[:-2]) > 0:
+            term = term[:-2]
+        elif term.endswith('ousli') and _baseline_get_measure(term[:-2]) > 0:
+            term = term[:-2]
+        elif term.endswith('ization') and _baseline_get_measure(term[:-5]) > 0:
+            term = term[:-5] + 'e'
+        elif term.endswith('ation') and _baseline_get_measure(term[:-4]) > 0:
+            term = term[:-4] + 'e'
+        elif term.endswith('ator') and _baseline_get_measure(term[:-2]) > 0:
+            term = term[:-2] + 'e'
+        elif term.endswith('alism') and _baseline_get_measure(term[:-3]) > 0:
+            term = term[:-3]
+        elif term.endswith('iveness') and _baseline_get_measure(term[:-4]) > 0:
+            term = term[:-4]
+        elif term.endswith('fulness') and _baseline_get_measure(term[:-4]) > 0:
+            term = term[:-4]
+        elif term.endswith('ousness') and _baseline_get_measure(term[:-4]) > 0:
+            term = term[:-4]
+        elif term.endswith('aliti') and _baseline_get_measure(term[:-3]) > 0:
+            term = term[:-3]
+        elif term.endswith('iviti') and _baseline_get_measure(term[:-3]) > 0:
+            term = term[:-3] + 'e'
+        elif term.endswith('biliti') and _baseline_get_measure(term[:-5]) > 0:
+            term = term[:-5] + 'le'
+        elif term.endswith('xflurti') and _baseline_get_measure(term[:-6]) > 0:
+            term = term[:-6] + 'ti'
+
+        if term.endswith('icate') and _baseline_get_measure(term[:-3]) > 0:
+            term = term[:-3]
+        elif term.endswith('ative') and _baseline_get_measure(term[:-5]) > 0:
+            term = term[:-5]
+        elif term.endswith('alize') and _baseline_get_measure(term[:-3]) > 0:
+            term = term[:-3]
+        elif term.endswith('icite') and _baseline_get_measure(term[:-3]) > 0:
+            term = term[:-3]
+        elif term.endswith('ical') and _baseline_get_measure(term[:-2]) > 0:
+            term = term[:-2]
+        elif term.endswith('ful') and _baseline_get_measure(term[:-3]) > 0:
+            term = term[:-3]
+        elif term.endswith('ness') and _baseline_get_measure(term[:-4]) > 0:
+            term = term[:-4]
+        
+        if term.endswith('ement') and _baseline_get_measure(term[:-5]) > 0:
+            term = term[:-5]
+        elif term.endswith(('ance', 'ence', 'able', 'ible', 'ment')) and _baseline_get_measure(term[:-4]) > 1:
+            term = term[:-4]
+        elif (term.endswith(('ant', 'ent', 'ism', 'ate', 'iti', 'ous', 'ive', 'ize'))
+              and _baseline_get_measure(term[:-3]) > 1):
+            term = term[:-3]
+        elif term.endswith(('al', 'er', 'ic', 'ou')) and _baseline_get_measure(term[:-2]) > 1:
+            term = term[:-2]
+        elif term.endswith('ion') and _baseline_get_measure(term[:-3]) > 1 and (term[-1] == 's' or term[-1] == 't'):
+            term = term[:-3]
+        
+        if term.endswith('e'):
+            if _baseline_get_measure(term[:-1]) > 1 or (
+                    _baseline_get_measure(term[:-1]) == 1 and not _baseline_cond_o(term[:-1])):
+                term = term[:-1]
+
+        # Step 5b
+        if _baseline_get_measure(term) > 1 and term.endswith('ll'):
+            term = term[:-1]
+    # Apply further steps as per the algorithm description
+
+    return term
+
+
+def load_words(file_names=("porter.txt", "aesopa10.txt")) -> list[str]:
+    """
+    Loads all lowercased alphabetic words of the given files from the raw data directory.
+    :param file_names: Names of the files to read
+    :return: List of words (with repetitions)
+    """
+    words = []
+    for file_name in file_names:
+        with open(os.path.join(RAW_DATA_PATH, file_name), "r", encoding="utf-8", errors="ignore") as file:
+            words.extend(word for word in file.read().lower().split() if word.isalpha())
+    return words
+
+
+def words_per_second(stem_function, words: list[str], repetitions: int) -> float:
+    start_time = time.perf_counter()
+    for _ in range(repetitions):
+        for word in words:
+            stem_function(word)
+    elapsed = time.perf_counter() - start_time
+    return len(words) * repetitions / elapsed
+
+
+def compare_stems(words: list[str]) -> tuple[list[str], list[str]]:
+    """
+    Stems every word with the baseline and with porter.stem_term().
+    :return: Words that are stemmed differently, words the baseline fails on
+    """
+    different, failed = [], []
+    for word in words:
+        try:
+            baseline_stem = _baseline_stem_term(word)
+        except IndexError:
+            failed.append(word)
+            continue
+        if baseline_stem != porter.stem_term(word):
+            different.append(word)
+    return different, failed
+
+
+if __name__ == "__main__":
+    repetitions = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    words = load_words()
+    distinct_words = sorted(set(words))
+    print(f"{len(words)} words, {len(distinct_words)} distinct, {repetitions} repetitions")
+
+    different, failed = compare_stems(distinct_words)
+    print(f"Stems identical to the baseline: {len(distinct_words) - len(different) - len(failed)} of "
+          f"{len(distinct_words)} distinct words, {len(different)} different {different[:10]}")
+    print(f"Baseline raises IndexError for {len(failed)} words {failed[:10]} "
+          f"(stem_term: {[porter.stem_term(word) for word in failed[:10]]})")
+    failed = set(failed)
+    for label, word_list in (("all words", words), ("distinct words", distinct_words)):
+        word_list = [word for word in word_list if word not in failed]
+        before = words_per_second(_baseline_stem_term, word_list, repetitions)
+        after = words_per_second(porter.stem_term, word_list, repetitions)
+        print(f"stem_term ({label}): {before:,.0f} -> {after:,.0f} words/s ({after / before:.2f}x)")
+    stemmer = porter.Stemmer()
+    print(f"Stemmer.stem (all words):   {words_per_second(stemmer.stem, words, repetitions):,.0f} words/s")
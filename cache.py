@@ -0,0 +1,132 @@
+# Contains a small least-recently-used cache that is shared by the query compiler and the IR system. Besides the number
+# of entries, the cache can limit the total size of its values (e. g. of the indexes the IR system keeps in memory) and
+# the time an entry stays valid.
+
+import time
+from collections import OrderedDict
+
+
+class LRUCache(object):
+    """
+    Mapping with a maximum number of entries and, optionally, a maximum total size. When it is full, the least recently
+    used entries are evicted. With a time to live, entries also expire a fixed time after they were stored.
+    """
+
+    def __init__(self, max_entries: int = 1024, max_bytes: int = None, sizeof=None, ttl: float = None,
+                 clock=time.monotonic, on_evict=None):
+        """
+        :param max_entries: Maximum number of entries
+        :param max_bytes: Maximum total size of the values, None for no limit
+        :param sizeof: Function that returns the size of a value in bytes, required for max_bytes
+        :param ttl: Time to live of an entry in seconds, None for no expiry
+        :param clock: Function that returns the current time in seconds
+        :param on_evict: Function that is called with the key and the value of every entry the cache drops by itself
+        (evicted, expired or cleared), e. g. to release resources of the value
+        """
+        if max_bytes is not None and sizeof is None:
+            raise ValueError("max_bytes requires a sizeof function")
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self._entries = OrderedDict()
+        self._sizes = {}
+        self.ttl = ttl
+        self.clock = clock
+        self.on_evict = on_evict
+        self._expiry_times = {}
+        self.bytes = 0  # Total size of the values, only tracked with a sizeof function.
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key, default=None):
+        """
+        Returns the value for a key and marks it as recently used.
+        :param key: Key to look up
+        :param default: Value to return if the key is not cached
+        :return: Cached value or default
+        """
+        try:
+            value = self._entries[key]
+        except KeyError:
+            self.misses += 1
+            return default
+        if self._is_expired(key):
+            self.pop(key)
+            self.expirations += 1
+            if self.on_evict is not None:
+                self.on_evict(key, value)
+            self.misses += 1
+            return default
+        self.hits += 1
+        self._entries.move_to_end(key)
+        return value
+
+    def put(self, key, value):
+        """
+        Stores a value, evicting the least recently used entries if the cache is full. The newest entry is kept even
+        if it alone exceeds max_bytes.
+        :param key: Key to store the value under
+        :param value: Value to store (storing a key again also updates the size of its value)
+        """
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        if self.ttl is not None:
+            self._expiry_times[key] = self.clock() + self.ttl
+        if self.sizeof is not None:
+            size = self.sizeof(value)
+            self.bytes += size - self._sizes.get(key, 0)
+            self._sizes[key] = size
+        while len(self._entries) > self.max_entries or (
+            self.max_bytes is not None and self.bytes > self.max_bytes and len(self._entries) > 1
+        ):
+            self._evict()
+
+    def _evict(self):
+        key, value = self._entries.popitem(last=False)
+        self.bytes -= self._sizes.pop(key, 0)
+        self._expiry_times.pop(key, None)
+        self.evictions += 1
+        if self.on_evict is not None:
+            self.on_evict(key, value)
+
+    def _is_expired(self, key) -> bool:
+        return self.ttl is not None and self.clock() >= self._expiry_times[key]
+
+    def pop(self, key, default=None):
+        self.bytes -= self._sizes.pop(key, 0)
+        self._expiry_times.pop(key, None)
+        return self._entries.pop(key, default)
+
+    def clear(self):
+        entries = list(self._entries.items()) if self.on_evict is not None else []
+        self._entries.clear()
+        self._sizes.clear()
+        self._expiry_times.clear()
+        self.bytes = 0
+        for key, value in entries:
+            self.on_evict(key, value)
+
+    def values(self):
+        return list(self._entries.values())
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "bytes": self.bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+    def __contains__(self, key) -> bool:
+        return key in self._entries and not self._is_expired(key)
+
+    def __len__(self) -> int:
+        return len(self._entries)
@@ -3,10 +3,109 @@
 from document import Document
 from collections import Counter
 
+import hashlib
+import json
 import re
 import os
 
 RAW_DATA_PATH = "raw_data"
+DEFAULT_STOP_WORD_FILE = os.path.join(RAW_DATA_PATH, "englishST.txt")
+
+# Compiled once instead of on every call of remove_symbols().
+_POSSESSIVE_PATTERN = re.compile(r"'s\b")
+_SYMBOL_PATTERN = re.compile(r"[^\w\s]")
+
+
+class StopWordFilter(object):
+    """
+    Holds a set of stop words that is loaded once and can then be shared between filter_collection(), the IR system
+    and the retrieval models. Membership tests are hashed, so filtering a term list is linear in its length.
+    """
+
+    def __init__(self, stop_words=()):
+        self.stop_words = frozenset(word.lower() for word in stop_words)
+
+    @classmethod
+    def from_text_file(cls, raw_file_path: str = DEFAULT_STOP_WORD_FILE) -> "StopWordFilter":
+        """
+        Creates a filter from a text file with one stop word per line, e. g. englishST.txt
+        :param raw_file_path: Path to the text file that contains the stop words
+        :return: New StopWordFilter
+        """
+        return cls(load_stop_word_list(raw_file_path))
+
+    @classmethod
+    def from_json(cls, json_file_path: str) -> "StopWordFilter":
+        """
+        Creates a filter from a JSON file that contains a list of stop words, e. g. data/stopwords.json
+        :param json_file_path: Path to the JSON file
+        :return: New StopWordFilter
+        """
+        with open(json_file_path, "r") as f:
+            return cls(json.load(f))
+
+    @classmethod
+    def from_collection(cls, collection: list[Document]) -> "StopWordFilter":
+        """
+        Creates a filter from a stop word list generated with Crouch's method.
+        :param collection: Collection to process
+        :return: New StopWordFilter
+        """
+        return cls(create_stop_word_list_by_frequency(collection))
+
+    def save_as_json(self, json_file_path: str) -> None:
+        """
+        Saves the stop words as a (sorted) JSON list.
+        :param json_file_path: Path of the JSON file
+        """
+        with open(json_file_path, "w") as f:
+            json.dump(sorted(self.stop_words), f)
+
+    def is_stop_word(self, term: str) -> bool:
+        return term.lower() in self.stop_words
+
+    def digest(self) -> bytes:
+        """
+        :return: Digest of the stop words (16 bytes), e. g. to detect indexes that were built with other stop words
+        """
+        return hashlib.blake2b("\n".join(sorted(self.stop_words)).encode("utf-8"), digest_size=16).digest()
+
+    def filter_terms(self, term_list: list[str]) -> list[str]:
+        """
+        Removes symbols from each term and drops the terms that are stop words.
+        :param term_list: List that contains the terms
+        :return: List of terms without stop words
+        """
+        stop_words = self.stop_words
+        cleaned_terms = []
+        for term in term_list:
+            term = remove_symbols(term)
+            if term.lower() not in stop_words:
+                cleaned_terms.append(term)
+        return cleaned_terms
+
+    def __contains__(self, term: str) -> bool:
+        return self.is_stop_word(term)
+
+    def __len__(self) -> int:
+        return len(self.stop_words)
+
+    def __bool__(self) -> bool:
+        return bool(self.stop_words)
+
+
+_default_filter = None
+
+
+def get_default_filter() -> StopWordFilter:
+    """
+    Returns the filter for englishST.txt. The file is only read on the first call.
+    :return: Shared StopWordFilter instance
+    """
+    global _default_filter
+    if _default_filter is None:
+        _default_filter = StopWordFilter.from_text_file(DEFAULT_STOP_WORD_FILE)
+    return _default_filter
 
 
 def remove_symbols(text_string: str) -> str:
@@ -18,53 +117,58 @@ def remove_symbols(text_string: str) -> str:
     """
 
     # Remove "'s" but keep the rest of the text
-    text_string = re.sub(r"'s\b", "", text_string)
+    text_string = _POSSESSIVE_PATTERN.sub("", text_string)
     # Remove all other punctuation marks
-    text_string = re.sub(r"[^\w\s]", "", text_string)
+    text_string = _SYMBOL_PATTERN.sub("", text_string)
     return text_string
 
 
-def is_stop_word(term: str, stop_word_list: list[str]) -> bool:
+def is_stop_word(term: str, stop_word_list) -> bool:
     """
     Checks if a given term is a stop word.
-    :param stop_word_list: List of all considered stop words.
+    :param stop_word_list: Collection of all considered stop words. Pass a set or StopWordFilter for constant-time
+    lookups.
     :param term: The term to be checked.
     :return: True if the term is a stop word.
     """
     return term.lower() in stop_word_list
 
 
-def remove_stop_words_from_term_list(term_list: list[str]) -> list[str]:
+def remove_stop_words_from_term_list(term_list: list[str], stop_word_filter: StopWordFilter = None) -> list[str]:
     """
     Takes a list of terms and removes all terms that are stop words.
     :param term_list: List that contains the terms
+    :param stop_word_filter: Filter to use. Defaults to the stop words from englishST.txt, which are loaded only once.
     :return: List of terms without stop words
     """
-    raw_collection_file = os.path.join(RAW_DATA_PATH, "englishST.txt")
-
-    # Hint:  Implement the functions remove_symbols() and is_stop_word() first and use them here.
-    stop_word_list = load_stop_word_list(
-        raw_collection_file
-    )  # Load stop words from file
-    cleaned_terms = []
-    for term in term_list:
-        # Remove symbols from term
-        term = remove_symbols(term)
-        # Check if term is a stop word
-        if not is_stop_word(term, stop_word_list):
-            cleaned_terms.append(term)
-    return cleaned_terms
+    if stop_word_filter is None:
+        stop_word_filter = get_default_filter()
+    return stop_word_filter.filter_terms(term_list)
 
 
-def filter_collection(collection: list[Document]):
+def filter_collection(collection: list[Document], stop_word_filter: StopWordFilter = None):
     """
     For each document in the given collection, this method takes the term list and filters out the stop words.
     Warning: The result is NOT saved in the documents term list, but in an extra field called filtered_terms.
     :param collection: Document collection to process
+    :param stop_word_filter: Filter to use. Defaults to the stop words from englishST.txt.
+    """
+    for _ in filter_documents(collection, stop_word_filter):
+        pass
+
+
+def filter_documents(documents, stop_word_filter: StopWordFilter = None):
+    """
+    Streaming version of filter_collection(): sets the filtered_terms of each document and yields it right away.
+    :param documents: Iterable of documents (e. g. from extraction.iter_collection())
+    :param stop_word_filter: Filter to use. Defaults to the stop words from englishST.txt.
+    :return: Generator of the processed documents
     """
-    for document in collection:
-        filtered_terms = remove_stop_words_from_term_list(document.terms)
-        document.filtered_terms = filtered_terms
+    if stop_word_filter is None:
+        stop_word_filter = get_default_filter()
+    for document in documents:
+        document.filtered_terms = stop_word_filter.filter_terms(document.terms)
+        yield document
 
 
 def load_stop_word_list(raw_file_path: str) -> list[str]:
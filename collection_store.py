@@ -0,0 +1,229 @@
+# Contains the binary on-disk format of a document collection (the IR system's replacement for my_collection.json).
+#
+# File layout (all integers little endian):
+#   header              magic, format version, content fingerprint, document count, term count and section offsets
+#   document blob       per document: a record header (document id, title and text length, number of terms, filtered
+#                       terms and stemmed terms; -1 for a missing list), the UTF-8 title and text and the three term
+#                       lists as uint32 file term ids
+#   term blob           UTF-8 encoded terms, in the order of their file term ids
+#   term offsets        (term count + 1) x uint32, byte offsets into the term blob
+#   document offsets    (document count + 1) x uint64, byte offsets into the document blob
+#
+# The documents come first, so that a collection can be written while it is extracted: every document is written as
+# soon as it arrives, only the terms and the offsets are kept until the end. The sections are located through the
+# offsets in the header (version 1 files, which store the sections in the opposite order, can still be read).
+#
+# The file is memory-mapped. Opening it only reads the header; a document is decoded when it is first accessed and
+# its file term ids are translated into ids of document.term_dictionary one term at a time.
+
+import hashlib
+import mmap
+import os
+import struct
+from array import array
+from collections.abc import Sequence
+
+import document as document_module
+from document import Document
+
+MAGIC = b"IRDC"
+FORMAT_VERSION = 2
+READABLE_VERSIONS = (1, 2)
+
+# magic, version, fingerprint, document count, term count, term offsets, document offsets, term blob, document blob
+_HEADER = struct.Struct("<4sH16sIIQQQQ")
+# document id (-1 for None), title bytes, text bytes, term count, filtered term count, stemmed term count
+_RECORD = struct.Struct("<qIIiii")
+_TERM_LISTS = ("term_ids", "filtered_term_ids", "stemmed_term_ids")
+_UNMAPPED = 0xFFFFFFFF
+
+
+def _encode_document(doc: Document, file_term_ids: dict, terms: list) -> bytes:
+    """
+    Encodes a document as record of the document blob, adding its unknown terms to the file's terms.
+    :param file_term_ids: Maps term ids of document.term_dictionary to term ids of the file
+    :param terms: Terms of the file, in the order of their file term ids
+    """
+    title = (doc.title or "").encode("utf-8")
+    text = (doc.raw_text or "").encode("utf-8")
+    term_lists = []
+    for attribute in _TERM_LISTS:
+        term_ids = getattr(doc, attribute)
+        if term_ids is None:
+            term_lists.append(None)
+            continue
+        converted = array("I")
+        for term_id in term_ids:
+            file_term_id = file_term_ids.get(term_id)
+            if file_term_id is None:
+                file_term_id = file_term_ids[term_id] = len(terms)
+                terms.append(document_module.term_dictionary.term(term_id))
+            converted.append(file_term_id)
+        term_lists.append(converted)
+    document_id = -1 if doc.document_id is None else doc.document_id
+    record = bytearray(_RECORD.pack(document_id, len(title), len(text),
+                                    *(-1 if term_list is None else len(term_list) for term_list in term_lists)))
+    record += title
+    record += text
+    for term_list in term_lists:
+        if term_list is not None:
+            record += term_list.tobytes()
+    return bytes(record)
+
+
+def write_collection(file_path: str, collection) -> bytes:
+    """
+    Saves a collection to a binary file. The documents are written as they arrive, so the collection may be a
+    generator (e. g. from preprocessing.preprocess_documents()) and is never held in memory as a whole. The file is
+    written to a temporary path first and then moved into place.
+    :param file_path: Path of the collection file
+    :param collection: Iterable of Document objects
+    :return: Fingerprint of the written content (also stored in the header)
+    """
+    file_term_ids = {}  # Maps term ids of document.term_dictionary to term ids of the file.
+    terms = []
+    document_offsets = array("Q", [0])
+    digest = hashlib.blake2b(digest_size=16)
+    temporary_path = file_path + ".tmp"
+    with open(temporary_path, "wb") as file:
+        file.write(bytes(_HEADER.size))  # Written at the end, when the section offsets are known.
+        for doc in collection:
+            record = _encode_document(doc, file_term_ids, terms)
+            file.write(record)
+            digest.update(record)
+            document_offsets.append(document_offsets[-1] + len(record))
+
+        term_offsets = array("I", [0])
+        term_blob = bytearray()
+        for term in terms:
+            term_blob += term.encode("utf-8")
+            term_offsets.append(len(term_blob))
+        for section in (term_blob, term_offsets.tobytes(), document_offsets.tobytes()):
+            file.write(section)
+            digest.update(section)
+        fingerprint = digest.digest()
+
+        document_blob_start = _HEADER.size
+        term_blob_start = document_blob_start + document_offsets[-1]
+        term_offsets_start = term_blob_start + len(term_blob)
+        document_offsets_start = term_offsets_start + len(term_offsets) * term_offsets.itemsize
+        file.seek(0)
+        file.write(_HEADER.pack(MAGIC, FORMAT_VERSION, fingerprint, len(document_offsets) - 1, len(terms),
+                                term_offsets_start, document_offsets_start, term_blob_start, document_blob_start))
+    os.replace(temporary_path, file_path)
+    return fingerprint
+
+
+def read_fingerprint(file_path: str) -> bytes:
+    """
+    Reads the content fingerprint from the header of a collection file, without opening the rest of it.
+    :param file_path: Path of the collection file
+    :return: 16 byte fingerprint
+    """
+    with open(file_path, "rb") as file:
+        magic, version, fingerprint = _HEADER.unpack(file.read(_HEADER.size))[:3]
+    if magic != MAGIC or version not in READABLE_VERSIONS:
+        raise ValueError(f"{file_path} is not a collection file of version {FORMAT_VERSION}")
+    return fingerprint
+
+
+class CollectionFile(Sequence):
+    """
+    Read-only, memory-mapped collection written by write_collection(). It can be used like the list of documents it
+    was written from; every document is decoded once, on first access.
+    """
+
+    def __init__(self, file_path: str):
+        self.file_path = file_path
+        with open(file_path, "rb") as file:
+            self._mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        buffer = memoryview(self._mmap)
+        (magic, version, self.fingerprint, self.document_count, self.term_count, term_offsets_start,
+         document_offsets_start, self._term_blob_start, self._document_blob_start) = _HEADER.unpack_from(buffer)
+        if magic != MAGIC or version not in READABLE_VERSIONS:
+            buffer.release()
+            self._mmap.close()
+            raise ValueError(f"{file_path} is not a collection file of version {FORMAT_VERSION}")
+        term_offsets_end = term_offsets_start + 4 * (self.term_count + 1)
+        document_offsets_end = document_offsets_start + 8 * (self.document_count + 1)
+        self._term_offsets = buffer[term_offsets_start:term_offsets_end].cast("I")
+        self._document_offsets = buffer[document_offsets_start:document_offsets_end].cast("Q")
+        self._buffer = buffer
+        # File term ids -> ids of document.term_dictionary, filled in as terms are encountered.
+        self._term_id_map = array("I", [_UNMAPPED]) * self.term_count
+        self._documents = [None] * self.document_count
+
+    def term_at(self, file_term_id: int) -> str:
+        start = self._term_blob_start + self._term_offsets[file_term_id]
+        end = self._term_blob_start + self._term_offsets[file_term_id + 1]
+        return bytes(self._buffer[start:end]).decode("utf-8")
+
+    def _translate(self, file_term_ids: array) -> array:
+        term_id_map = self._term_id_map
+        term_ids = array(document_module.TERM_ID_TYPECODE)
+        for file_term_id in file_term_ids:
+            term_id = term_id_map[file_term_id]
+            if term_id == _UNMAPPED:
+                term_id = term_id_map[file_term_id] = document_module.term_dictionary.intern(
+                    (self.term_at(file_term_id),))[0]
+            term_ids.append(term_id)
+        return term_ids
+
+    def _record(self, position: int) -> tuple:
+        offset = self._document_blob_start + self._document_offsets[position]
+        return offset, _RECORD.unpack_from(self._buffer, offset)
+
+    def document_id_at(self, position: int):
+        """
+        Reads the id of a document without decoding the document.
+        """
+        document_id = self._record(position)[1][0]
+        return None if document_id < 0 else document_id
+
+    def _decode(self, position: int) -> Document:
+        offset, (document_id, title_length, text_length, *term_counts) = self._record(position)
+        offset += _RECORD.size
+        doc = Document()
+        doc.document_id = None if document_id < 0 else document_id
+        doc.title = bytes(self._buffer[offset:offset + title_length]).decode("utf-8")
+        offset += title_length
+        doc.raw_text = bytes(self._buffer[offset:offset + text_length]).decode("utf-8")
+        offset += text_length
+        for attribute, term_count in zip(_TERM_LISTS, term_counts):
+            if term_count < 0:
+                setattr(doc, attribute, None)
+                continue
+            file_term_ids = array("I")
+            file_term_ids.frombytes(self._buffer[offset:offset + 4 * term_count])
+            offset += 4 * term_count
+            setattr(doc, attribute, self._translate(file_term_ids))
+        return doc
+
+    def __getitem__(self, position):
+        if isinstance(position, slice):
+            return [self[index] for index in range(*position.indices(self.document_count))]
+        if position < 0:
+            position += self.document_count
+        if not 0 <= position < self.document_count:
+            raise IndexError(position)
+        doc = self._documents[position]
+        if doc is None:
+            doc = self._documents[position] = self._decode(position)
+        return doc
+
+    def __len__(self) -> int:
+        return self.document_count
+
+    def stream(self):
+        """
+        Decodes the documents one after another without keeping them (e. g. for an export), unlike iterating over the
+        collection, which keeps every decoded document.
+        :return: Generator of Document objects
+        """
+        for position in range(self.document_count):
+            yield self._documents[position] or self._decode(position)
+
+    def close(self):
+        for view in (self._term_offsets, self._document_offsets, self._buffer):
+            view.release()
+        self._mmap.close()
@@ -1,15 +1,112 @@
 # Contains a unified class definition for a document.
+#
+# To keep large collections in memory, documents do not hold lists of strings. Every distinct term is stored once in a
+# collection-wide TermDictionary and the term lists of a document are arrays of term ids (4 bytes per token). The
+# attributes terms, filtered_terms and stemmed_terms still accept and return lists of strings; the strings are only
+# looked up when such an attribute is read.
+
+import threading
+from array import array
+from operator import itemgetter
+
+TERM_ID_TYPECODE = "I"
+
+
+class TermDictionary(object):
+    """
+    Assigns a stable integer id to every distinct term.
+    """
+
+    def __init__(self):
+        self._ids = {}
+        self._terms = []
+        self._lock = threading.Lock()  # Serializes the addition of new terms (segments are merged in a thread).
+
+    def intern(self, terms) -> array:
+        """
+        Converts terms into term ids, adding unknown terms to the dictionary.
+        :param terms: Iterable of terms
+        :return: Array of term ids
+        """
+        ids = self._ids
+        term_ids = array(TERM_ID_TYPECODE)
+        for term in terms:
+            term_id = ids.get(term)
+            if term_id is None:
+                with self._lock:
+                    term_id = ids.get(term)
+                    if term_id is None:
+                        self._terms.append(term)
+                        term_id = ids[term] = len(self._terms) - 1
+            term_ids.append(term_id)
+        return term_ids
+
+    def lookup(self, term_ids) -> list[str]:
+        """
+        Converts term ids back into terms.
+        :param term_ids: Sequence of term ids
+        :return: List of terms
+        """
+        if len(term_ids) == 1:
+            return [self._terms[term_ids[0]]]
+        return list(itemgetter(*term_ids)(self._terms)) if term_ids else []
+
+    def term(self, term_id: int) -> str:
+        return self._terms[term_id]
+
+    def term_id(self, term: str):
+        """
+        :return: Id of a term, or None if the term is unknown
+        """
+        return self._ids.get(term)
+
+    def __len__(self) -> int:
+        return len(self._terms)
+
+
+# Dictionary that is shared by all documents of a process.
+term_dictionary = TermDictionary()
+
+
+def _term_list_property(name: str, doc: str):
+    """
+    Creates a property that stores a term list as term ids in the slot of the given name. None is stored as is.
+    """
+
+    def get_terms(self):
+        term_ids = getattr(self, name)
+        return None if term_ids is None else term_dictionary.lookup(term_ids)
+
+    def set_terms(self, terms):
+        setattr(self, name, None if terms is None else term_dictionary.intern(terms))
+
+    return property(get_terms, set_terms, doc=doc)
+
 
 class Document(object):
+    __slots__ = ("document_id", "title", "raw_text", "term_ids", "filtered_term_ids", "stemmed_term_ids")
+
     def __init__(self):
         self.document_id = None  # Unique document ID
         self.title = ''  # Title of document
         self.raw_text = ''  # Holds complete text of document.
-        self.terms = []  # Holds all terms.
-        self.filtered_terms = []  # Holds terms without stopwords.
-        self.stemmed_terms = []  # Holds terms that were stemmed with Porter algorithm. (Only relevant in PR03!)
+        self.term_ids = array(TERM_ID_TYPECODE)  # Ids of all terms (see term_dictionary).
+        self.filtered_term_ids = array(TERM_ID_TYPECODE)  # Ids of the terms without stopwords.
+        self.stemmed_term_ids = array(TERM_ID_TYPECODE)  # Ids of the stemmed terms.
         # Note: See PR02 task description for instructions regarding these properties.
 
+    terms = _term_list_property("term_ids", "Holds all terms.")
+    filtered_terms = _term_list_property("filtered_term_ids", "Holds terms without stopwords.")
+    stemmed_terms = _term_list_property(
+        "stemmed_term_ids", "Holds terms that were stemmed with Porter algorithm. (Only relevant in PR03!)"
+    )
+
+    def __getstate__(self):
+        # Term ids are only valid within one process, so documents are pickled with their terms.
+        return (self.document_id, self.title, self.raw_text, self.terms, self.filtered_terms, self.stemmed_terms)
+
+    def __setstate__(self, state):
+        self.document_id, self.title, self.raw_text, self.terms, self.filtered_terms, self.stemmed_terms = state
 
     def __str__(self):
         shortened_content = self.raw_text[:10] + "..." if len(self.raw_text) > 10 else self.raw_text
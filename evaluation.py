@@ -0,0 +1,164 @@
+# Contains the evaluation of search results against relevance judgements (qrels).
+#
+# The judgements are parsed once into a mapping from query to the ids of its relevant documents. All metrics use
+# binary relevance and take the retrieved document ids in ranked order.
+
+from math import log2
+
+# Document ids in ground_truth.txt start at 1, the ids of the extracted collection at 0.
+GROUND_TRUTH_ID_OFFSET = 1
+
+METRICS = ("precision", "recall", "precision_at_k", "average_precision", "ndcg")
+
+
+def normalize_query(query: str) -> str:
+    """
+    Normalizes a query for the lookup of its judgements (lowercase, single spaces).
+    """
+    return " ".join(query.lower().split())
+
+
+class Qrels(object):
+    """
+    Relevance judgements: the set of relevant document ids for each query.
+    """
+
+    def __init__(self, judgements: dict = None):
+        """
+        :param judgements: Dictionary from query string to an iterable of relevant document ids
+        """
+        self.judgements = {normalize_query(query): frozenset(doc_ids) for query, doc_ids in (judgements or {}).items()}
+
+    @classmethod
+    def from_file(cls, path: str, id_offset: int = GROUND_TRUTH_ID_OFFSET) -> "Qrels":
+        """
+        Parses a file with one line "query - id, id, ..." per query (like ground_truth.txt). Empty lines and lines
+        starting with "#" are skipped.
+        :param path: Path of the file
+        :param id_offset: Value that is subtracted from every id of the file to obtain collection document ids
+        :return: New Qrels
+        """
+        judgements = {}
+        with open(path, "r", encoding="utf-8") as file:
+            for line in file:
+                line = line.strip()
+                if not line or line.startswith("#"):
+                    continue
+                query, separator, doc_ids = line.rpartition(" - ")
+                try:
+                    if not separator:
+                        raise ValueError()
+                    judgements[query] = [int(doc_id) - id_offset for doc_id in doc_ids.split(",") if doc_id.strip()]
+                except ValueError:
+                    print(f"Skipping malformed line in {path}: {line}")
+        return cls(judgements)
+
+    def relevant(self, query: str):
+        """
+        :param query: Query string
+        :return: Frozenset of the relevant document ids, or None if there are no judgements for the query
+        """
+        return self.judgements.get(normalize_query(query))
+
+    def __contains__(self, query: str) -> bool:
+        return normalize_query(query) in self.judgements
+
+    def __len__(self) -> int:
+        return len(self.judgements)
+
+
+def precision(retrieved: list[int], relevant) -> float:
+    """
+    Fraction of the retrieved documents that are relevant.
+    """
+    if not retrieved:
+        return 0.0
+    return sum(doc_id in relevant for doc_id in set(retrieved)) / len(set(retrieved))
+
+
+def recall(retrieved: list[int], relevant) -> float:
+    """
+    Fraction of the relevant documents that were retrieved.
+    """
+    if not relevant:
+        return 0.0
+    return len(relevant.intersection(retrieved)) / len(relevant)
+
+
+def precision_at_k(retrieved: list[int], relevant, k: int) -> float:
+    """
+    Fraction of relevant documents among the first k results. Missing results count as not relevant.
+    """
+    if k <= 0:
+        return 0.0
+    return sum(doc_id in relevant for doc_id in retrieved[:k]) / k
+
+
+def average_precision(retrieved: list[int], relevant) -> float:
+    """
+    Mean of the precision values at the ranks of the relevant documents. Relevant documents that were not retrieved
+    contribute a precision of 0.
+    """
+    if not relevant:
+        return 0.0
+    hits = 0
+    total = 0.0
+    for rank, doc_id in enumerate(retrieved, start=1):
+        if doc_id in relevant:
+            hits += 1
+            total += hits / rank
+    return total / len(relevant)
+
+
+def ndcg(retrieved: list[int], relevant, k: int) -> float:
+    """
+    Normalized discounted cumulative gain of the first k results.
+    """
+    if not relevant or k <= 0:
+        return 0.0
+    gain = sum(1 / log2(rank + 1) for rank, doc_id in enumerate(retrieved[:k], start=1) if doc_id in relevant)
+    ideal_gain = sum(1 / log2(rank + 1) for rank in range(1, min(k, len(relevant)) + 1))
+    return gain / ideal_gain
+
+
+def evaluate_query(retrieved: list[int], relevant, k: int = 10) -> dict:
+    """
+    Computes all metrics for one query.
+    :param retrieved: Retrieved document ids in ranked order
+    :param relevant: Set of relevant document ids
+    :param k: Cutoff for precision_at_k and ndcg
+    :return: Dictionary from metric name (see METRICS) to value
+    """
+    return {
+        "precision": precision(retrieved, relevant),
+        "recall": recall(retrieved, relevant),
+        "precision_at_k": precision_at_k(retrieved, relevant, k),
+        "average_precision": average_precision(retrieved, relevant),
+        "ndcg": ndcg(retrieved, relevant, k),
+    }
+
+
+def evaluate_batch(runs: dict, qrels: Qrels, k: int = 10) -> dict:
+    """
+    Computes the metrics of many queries and their means. Queries without judgements are skipped.
+    :param runs: Dictionary from query string to the retrieved document ids in ranked order
+    :param qrels: Relevance judgements
+    :param k: Cutoff for precision_at_k and ndcg
+    :return: Dictionary with the metrics per query ("queries") and their means ("mean"); the mean average precision
+    is "mean"["average_precision"] (MAP)
+    """
+    per_query = {}
+    for query, retrieved in runs.items():
+        relevant = qrels.relevant(query)
+        if relevant is not None:
+            per_query[query] = evaluate_query(retrieved, relevant, k)
+    return {"queries": per_query, "mean": mean_metrics(per_query.values())}
+
+
+def mean_metrics(metrics) -> dict:
+    """
+    Averages metric dictionaries (as returned by evaluate_query()).
+    :return: Dictionary from metric name to mean value (0 if there are no dictionaries)
+    """
+    metrics = list(metrics)
+    return {name: sum(values[name] for values in metrics) / len(metrics) if metrics else 0.0 for name in METRICS}
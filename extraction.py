@@ -5,23 +5,86 @@ import json
 from document import Document
 
 
-def extract_collection(source_file_path: str) -> list[Document]:
+# Number of lines before the first fable in aesopa10.txt (table of contents and introduction).
+AESOP_HEADER_LINES = 307
+
+
+class DocumentBoundaries(object):
     """
-    Loads a text file (aesopa10.txt) and extracts each of the listed fables/stories from the file.
-    :param source_file_name: File name of the file that contains the fables
-    :return: List of Document objects
+    Describes the layout of a text file with many documents: a header that is skipped, followed by documents that
+    start with a title line and end with a number of consecutive empty lines.
+    """
+
+    def __init__(self, header_lines: int = AESOP_HEADER_LINES, header_end: str = None, separator_lines: int = 2):
+        """
+        :param header_lines: Number of lines to skip at the beginning of the file
+        :param header_end: If given, the header instead ends with the first line starting with this text (e. g. "*** START
+        OF" in Project Gutenberg files)
+        :param separator_lines: Number of consecutive empty lines that end a document
+        """
+        self.header_lines = header_lines
+        self.header_end = header_end
+        self.separator_lines = separator_lines
+
+    def skip_header(self, lines):
+        """
+        Consumes the header from an iterator of lines.
+        """
+        if self.header_end is not None:
+            for line in lines:
+                if line.strip().startswith(self.header_end):
+                    return
+            return
+        for _ in range(self.header_lines):
+            if next(lines, None) is None:
+                return
+
+    def is_boundary(self, empty_lines: int) -> bool:
+        """
+        :param empty_lines: Number of consecutive empty lines read so far
+        :return: True, if the current document ends here
+        """
+        return empty_lines >= self.separator_lines
+
+
+def _create_document(document_id: int, title: str, lines: list[str]) -> Document:
+    text = " ".join(lines)
+    doc = Document()
+    doc.title = title
+    doc.document_id = document_id
+    doc.terms = text.split()  # Split the raw data into terms
+    doc.raw_text = text
+    return doc
+
+
+def create_document(title: str, text: str) -> Document:
+    """
+    Creates a document that is not extracted from a file (e. g. to add it to the collection). As for extracted
+    documents, the title is the first line of the text.
+    :param title: Title of the document
+    :param text: Text of the document, without the title
+    :return: New document without id
+    """
+    return _create_document(None, title, [line for line in (title, *text.splitlines()) if line.strip()])
+
+
+def iter_collection(source_file_path: str, boundaries: DocumentBoundaries = None):
     """
-    catalog = []  # List to store the document objects
+    Reads a text file line by line and yields each of its documents as soon as it is complete, so that only one
+    document is held in memory at a time.
+    :param source_file_path: Path of the text file (e. g. aesopa10.txt)
+    :param boundaries: Layout of the file, defaults to the layout of aesopa10.txt
+    :return: Generator of Document objects
+    """
+    if boundaries is None:
+        boundaries = DocumentBoundaries()
     document_id = 0  # Unique document ID counter
 
     with open(source_file_path, "r", encoding="utf-8") as file:
-        # Skip lines until reaching line 308
-        for _ in range(307):
-            next(file)
+        boundaries.skip_header(file)
 
-        title = ""  # Temporary variable to store current title
-        current_data = ""  # String to collect raw text for a document
-        is_reading_text = False  # Flag to indicate if reading document content
+        title = ""  # Title of the current document
+        lines = []  # Lines of the current document, including the title
         empty_line_counter = 0  # Counter to detect empty lines and document boundaries
 
         for line in file:
@@ -30,64 +93,59 @@ def extract_collection(source_file_path: str) -> list[Document]:
             # Detect empty lines and handle transitions between documents
             if line == "":
                 empty_line_counter += 1
-                if is_reading_text and empty_line_counter >= 2:
-                    # End of current document
-                    doc = Document()
-                    doc.title = title
-                    doc.document_id = document_id
-                    doc.terms = current_data.split()  # Split the raw data into terms
-                    doc.raw_text = current_data.strip()
-                    catalog.append(doc)
-
-                    # Reset for next document
+                if lines and boundaries.is_boundary(empty_line_counter):
+                    yield _create_document(document_id, title, lines)
                     document_id += 1
                     title = ""
-                    current_data = ""
-                    is_reading_text = False
+                    lines = []
                 continue
 
-            # Title section
-            if not is_reading_text and line:
-                title = line
-                is_reading_text = True
-                empty_line_counter = 0  # Reset empty line counter after the title
-
-            # Content section
-            if is_reading_text and line:
-                current_data += line + " "
-                empty_line_counter = 0  # Reset empty line counter when reading content
+            if not lines:
+                title = line  # The first line of a document is its title.
+            lines.append(line)
+            empty_line_counter = 0
 
         # Handle the last document if the file ends without enough blank lines
-        if current_data:
-            doc = Document()
-            doc.title = title
-            doc.document_id = document_id
-            doc.terms = current_data.split()
-            doc.raw_text = current_data.strip()
-            catalog.append(doc)
+        if lines:
+            yield _create_document(document_id, title, lines)
+
+
+def extract_collection(source_file_path: str, boundaries: DocumentBoundaries = None) -> list[Document]:
+    """
+    Loads a text file (aesopa10.txt) and extracts each of the listed fables/stories from the file.
+    :param source_file_path: Path of the file that contains the fables
+    :param boundaries: Layout of the file, defaults to the layout of aesopa10.txt
+    :return: List of Document objects
+    """
+    return list(iter_collection(source_file_path, boundaries))
 
-    return catalog
 
+def _document_to_json(document: Document) -> dict:
+    return {
+        "document_id": document.document_id,
+        "title": document.title,
+        "raw_text": document.raw_text,
+        "terms": document.terms,
+        "filtered_terms": getattr(document, "filtered_terms", None),  # Handle missing fields
+        "stemmed_terms": getattr(document, "stemmed_terms", None),  # Handle missing fields
+    }
 
-def save_collection_as_json(collection: list[Document], file_path: str) -> None:
+
+def save_collection_as_json(collection, file_path: str) -> None:
     """
-    Saves the collection to a JSON file.
-    :param collection: The collection to store (list of Document objects)
+    Saves the collection to a JSON file. The documents are written one after another, so the collection may also be a
+    generator (e. g. from iter_collection()).
+    :param collection: The collection to store (iterable of Document objects)
     :param file_path: Path of the JSON file
     """
-    serializable_collection = []
-    for document in collection:
-        serializable_collection.append({
-            "document_id": document.document_id,
-            "title": document.title,
-            "raw_text": document.raw_text,
-            "terms": document.terms,
-            "filtered_terms": getattr(document, "filtered_terms", None),  # Handle missing fields
-            "stemmed_terms": getattr(document, "stemmed_terms", None),  # Handle missing fields
-        })
-
     with open(file_path, "w", encoding="utf-8") as json_file:
-        json.dump(serializable_collection, json_file, ensure_ascii=False, indent=4)
+        separator = "[\n    "
+        for document in collection:
+            json_file.write(separator)
+            # Same layout as json.dump(list, indent=4): every line of an element is indented once more.
+            json_file.write(json.dumps(_document_to_json(document), ensure_ascii=False, indent=4).replace("\n", "\n    "))
+            separator = ",\n    "
+        json_file.write("[]" if separator.startswith("[") else "\n]")
 
 
 def load_collection_from_json(file_path: str) -> list[Document]:
@@ -0,0 +1,224 @@
+# Contains the on-disk format of the inverted index used by InvertedListBooleanModel.
+#
+# File layout (all integers little endian):
+#   header            magic, format version, flags, collection fingerprint, term count and section offsets
+#   term offsets      (term count + 1) x uint32, byte offsets into the term blob
+#   posting offsets   (term count + 1) x uint64, byte offsets into the posting blob
+#   term blob         UTF-8 encoded terms, sorted
+#   posting blob      per term: document ids as delta encoded varints
+
+import hashlib
+import mmap
+import os
+import struct
+from array import array
+from bisect import bisect_left
+
+import postings
+
+MAGIC = b"IRIX"
+FORMAT_VERSION = 1
+FLAG_STOPWORD_FILTERING = 1
+FLAG_STEMMING = 2
+
+# magic, version, flags, fingerprint, term count, term offsets, posting offsets, term blob, posting blob
+_HEADER = struct.Struct("<4sHH16sIQQQQ")
+_CONTINUATION_BYTES = bytes(range(0x80, 0x100))
+
+
+def file_fingerprint(file_path: str) -> bytes:
+    """
+    Computes a fingerprint of a file's content, e. g. of my_collection.json. An index is only reused if the
+    fingerprint stored in it matches the one of the current collection file.
+    :param file_path: Path of the file
+    :return: 16 byte digest, or 16 zero bytes if the file does not exist
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    try:
+        with open(file_path, "rb") as file:
+            for chunk in iter(lambda: file.read(1 << 20), b""):
+                digest.update(chunk)
+    except FileNotFoundError:
+        return bytes(16)
+    return digest.digest()
+
+
+def encode_postings(doc_ids) -> bytes:
+    """
+    Encodes a posting list as delta encoded varints (7 bits per byte, high bit set on all but the last byte).
+    :param doc_ids: Document ids, will be sorted
+    :return: Encoded posting list
+    """
+    encoded = bytearray()
+    previous = 0
+    for doc_id in sorted(doc_ids):
+        delta = doc_id - previous
+        previous = doc_id
+        while delta >= 0x80:
+            encoded.append((delta & 0x7F) | 0x80)
+            delta >>= 7
+        encoded.append(delta)
+    return bytes(encoded)
+
+
+def decode_postings(buffer, start: int = 0, end: int = None) -> list[int]:
+    """
+    Decodes a posting list that was encoded with encode_postings().
+    :param buffer: Bytes-like object that contains the encoded posting list
+    :param start: Offset of the first byte
+    :param end: Offset behind the last byte
+    :return: Sorted list of document ids
+    """
+    if end is None:
+        end = len(buffer)
+    doc_ids = []
+    doc_id = 0
+    delta = 0
+    shift = 0
+    for byte in buffer[start:end]:
+        delta |= (byte & 0x7F) << shift
+        if byte & 0x80:
+            shift += 7
+        else:
+            doc_id += delta
+            doc_ids.append(doc_id)
+            delta = 0
+            shift = 0
+    return doc_ids
+
+
+def write_inverted_index(file_path: str, inverted_index: dict, fingerprint: bytes, stopword_filtering=False,
+                         stemming=False) -> None:
+    """
+    Saves an inverted index (term -> document ids) to a binary file. The file is written to a temporary path first and
+    then moved into place, so readers never see a partially written index.
+    :param file_path: Path of the index file
+    :param inverted_index: Mapping from terms to iterables of document ids
+    :param fingerprint: Fingerprint of the collection the index was built from, see file_fingerprint()
+    :param stopword_filtering: Whether the index was built with stop word filtering
+    :param stemming: Whether the index was built with stemming
+    """
+    terms = sorted(inverted_index)
+    term_offsets = array("I", [0])
+    posting_offsets = array("Q", [0])
+    term_blob = bytearray()
+    posting_blob = bytearray()
+    for term in terms:
+        term_blob += term.encode("utf-8")
+        term_offsets.append(len(term_blob))
+        posting_blob += encode_postings(inverted_index[term])
+        posting_offsets.append(len(posting_blob))
+
+    flags = (FLAG_STOPWORD_FILTERING if stopword_filtering else 0) | (FLAG_STEMMING if stemming else 0)
+    term_offsets_start = _HEADER.size
+    posting_offsets_start = term_offsets_start + len(term_offsets) * term_offsets.itemsize
+    term_blob_start = posting_offsets_start + len(posting_offsets) * posting_offsets.itemsize
+    posting_blob_start = term_blob_start + len(term_blob)
+    header = _HEADER.pack(MAGIC, FORMAT_VERSION, flags, fingerprint, len(terms), term_offsets_start,
+                          posting_offsets_start, term_blob_start, posting_blob_start)
+
+    temporary_path = file_path + ".tmp"
+    with open(temporary_path, "wb") as file:
+        file.write(header)
+        file.write(term_offsets.tobytes())
+        file.write(posting_offsets.tobytes())
+        file.write(term_blob)
+        file.write(posting_blob)
+    os.replace(temporary_path, file_path)
+
+
+class InvertedIndexFile(object):
+    """
+    Read-only, memory-mapped view of an index file written by write_inverted_index(). Opening it only reads the header;
+    terms are found by binary search in the sorted term dictionary and posting lists are decoded on access. It can be
+    used like the dict of an in-memory inverted index.
+    """
+
+    def __init__(self, file_path: str):
+        self.file_path = file_path
+        with open(file_path, "rb") as file:
+            self._mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        buffer = memoryview(self._mmap)
+        (magic, version, flags, self.fingerprint, self.term_count, term_offsets_start, posting_offsets_start,
+         self._term_blob_start, self._posting_blob_start) = _HEADER.unpack_from(buffer)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            buffer.release()
+            self._mmap.close()
+            raise ValueError(f"{file_path} is not an inverted index file of version {FORMAT_VERSION}")
+        self.stopword_filtering = bool(flags & FLAG_STOPWORD_FILTERING)
+        self.stemming = bool(flags & FLAG_STEMMING)
+        self._term_offsets = buffer[term_offsets_start:posting_offsets_start].cast("I")
+        self._posting_offsets = buffer[posting_offsets_start:self._term_blob_start].cast("Q")
+        self._buffer = buffer
+        self._terms = _TermList(self)
+
+    def term_at(self, index: int) -> str:
+        start = self._term_blob_start + self._term_offsets[index]
+        end = self._term_blob_start + self._term_offsets[index + 1]
+        return bytes(self._buffer[start:end]).decode("utf-8")
+
+    def _find(self, term: str) -> int:
+        index = bisect_left(self._terms, term)
+        if index < self.term_count and self.term_at(index) == term:
+            return index
+        return -1
+
+    def postings_at(self, index: int) -> array:
+        start = self._posting_blob_start + self._posting_offsets[index]
+        end = self._posting_blob_start + self._posting_offsets[index + 1]
+        return array(postings.TYPECODE, decode_postings(self._buffer, start, end))
+
+    def document_frequency(self, term: str) -> int:
+        """
+        Counts the entries of a posting list without decoding it: every varint ends with a byte below 0x80.
+        """
+        index = self._find(term)
+        if index < 0:
+            return 0
+        start = self._posting_blob_start + self._posting_offsets[index]
+        end = self._posting_blob_start + self._posting_offsets[index + 1]
+        return len(bytes(self._buffer[start:end]).translate(None, _CONTINUATION_BYTES))
+
+    def get(self, term: str, default=None):
+        index = self._find(term)
+        return self.postings_at(index) if index >= 0 else default
+
+    def __getitem__(self, term: str) -> array:
+        index = self._find(term)
+        if index < 0:
+            raise KeyError(term)
+        return self.postings_at(index)
+
+    def __contains__(self, term: str) -> bool:
+        return self._find(term) >= 0
+
+    def __iter__(self):
+        return iter(self._terms)
+
+    def keys(self):
+        return list(self._terms)
+
+    def __len__(self) -> int:
+        return self.term_count
+
+    def close(self):
+        for view in (self._term_offsets, self._posting_offsets, self._buffer):
+            view.release()
+        self._mmap.close()
+
+
+class _TermList(object):
+    """
+    Sequence view of the sorted term dictionary, so that bisect can search it without decoding all terms.
+    """
+
+    def __init__(self, index_file: InvertedIndexFile):
+        self._index_file = index_file
+
+    def __getitem__(self, index: int) -> str:
+        if index < 0 or index >= len(self):
+            raise IndexError(index)
+        return self._index_file.term_at(index)
+
+    def __len__(self) -> int:
+        return self._index_file.term_count
@@ -1,21 +1,34 @@
+import argparse
+import hashlib
 import json
 import os
+import sys
 
+import cache
 import cleanup
+import collection_store
+import evaluation
 import extraction
 import models
 import porter
-from document import Document
-import re
-from sklearn.metrics.pairwise import cosine_similarity
+import postings
+import preprocessing
+import query_parser
+import ranking
+import segments
 
 import time
 
+import numpy as np
+
 # Important paths:
 RAW_DATA_PATH = "raw_data"
 DATA_PATH = "data"
-COLLECTION_PATH = os.path.join(DATA_PATH, "my_collection.json")
+COLLECTION_PATH = os.path.join(DATA_PATH, "my_collection.json")  # JSON export of the collection, for interchange.
+COLLECTION_STORE_PATH = os.path.join(DATA_PATH, "my_collection.bin")  # Binary collection store the system works on.
+SEGMENT_PATH = os.path.join(DATA_PATH, "segments")  # Documents added to the collection store (see segments.py).
 STOPWORD_FILE_PATH = os.path.join(DATA_PATH, "stopwords.json")
+GROUND_TRUTH_PATH = os.path.join(RAW_DATA_PATH, "ground_truth.txt")
 
 # Menu choices:
 (
@@ -25,8 +38,10 @@ STOPWORD_FILE_PATH = os.path.join(DATA_PATH, "stopwords.json")
     CHOICE_UPDATE_STOP_WORDS,
     CHOICE_SET_MODEL,
     CHOICE_SHOW_DOCUMENT,
+    CHOICE_ADD_DOCUMENT,
+    CHOICE_DELETE_DOCUMENT,
     CHOICE_EXIT,
-) = (1, 2, 3, 4, 5, 6, 9)
+) = (1, 2, 3, 4, 5, 6, 7, 8, 9)
 MODEL_BOOL_LIN, MODEL_BOOL_INV, MODEL_BOOL_SIG, MODEL_FUZZY, MODEL_VECTOR = (
     1,
     2,
@@ -34,7 +49,80 @@ MODEL_BOOL_LIN, MODEL_BOOL_INV, MODEL_BOOL_SIG, MODEL_FUZZY, MODEL_VECTOR = (
     4,
     5,
 )
+MODEL_CLASSES = {
+    MODEL_BOOL_LIN: models.LinearBooleanModel,
+    MODEL_BOOL_INV: models.InvertedListBooleanModel,
+    MODEL_BOOL_SIG: models.SignatureBasedBooleanModel,
+    MODEL_FUZZY: models.FuzzySetModel,
+    MODEL_VECTOR: models.VectorSpaceModel,
+}
 SW_METHOD_LIST, SW_METHOD_CROUCH = 1, 2
+SIG_STORAGE_ROWS, SIG_STORAGE_SLICED = 1, 2
+SEARCH_NORMAL, SEARCH_SW, SEARCH_STEM, SEARCH_SW_STEM = 1, 2, 3, 4
+
+# Names of the models and search modes in batch query files:
+BATCH_MODELS = {
+    "linear": (MODEL_BOOL_LIN, False),
+    "inverted": (MODEL_BOOL_INV, False),
+    "signature": (MODEL_BOOL_SIG, False),
+    "signature_sliced": (MODEL_BOOL_SIG, True),
+    "fuzzy": (MODEL_FUZZY, False),
+    "vector": (MODEL_VECTOR, False),
+}
+BATCH_SEARCH_MODES = {"normal": SEARCH_NORMAL, "sw": SEARCH_SW, "stem": SEARCH_STEM, "sw_stem": SEARCH_SW_STEM}
+
+# Limits of the in-memory index cache, which holds one model instance per (model, stopwords, stemming) variant:
+INDEX_CACHE_MAX_ENTRIES = 24
+INDEX_CACHE_MAX_BYTES = 512 * 1024 * 1024
+# Limits of the query result cache:
+RESULT_CACHE_MAX_ENTRIES = 4096
+RESULT_CACHE_MAX_BYTES = 16 * 1024 * 1024
+RESULT_CACHE_TTL = 600  # Seconds
+
+
+def result_size(entry: tuple) -> int:
+    """
+    Estimates the memory held by an entry of the query result cache. The documents belong to the collection and are
+    not counted.
+    :param entry: Tuple of the results (tuples of score and document), the search report and the ranking
+    """
+    results, report, ranked_results = entry
+    return (sys.getsizeof(entry) + sys.getsizeof(results) + sum(sys.getsizeof(result) + 24 for result in results)
+            + (sys.getsizeof(report) + 64 * len(report) if report else 0)
+            + (ranked_results.memory_usage() if ranked_results is not None else 0))
+
+
+def inverted_index_path(stop_word_filtering: bool, stemming: bool) -> str:
+    """
+    Returns the path of the saved inverted index for the given preprocessing options.
+    """
+    suffix = ("_sw" if stop_word_filtering else "") + ("_stem" if stemming else "")
+    return os.path.join(DATA_PATH, f"inverted_index{suffix}.bin")
+
+
+def tfidf_index_path(stop_word_filtering: bool, stemming: bool) -> str:
+    """
+    Returns the directory of the saved TF-IDF index for the given preprocessing options.
+    """
+    suffix = ("_sw" if stop_word_filtering else "") + ("_stem" if stemming else "")
+    return os.path.join(DATA_PATH, f"tfidf{suffix}")
+
+
+def fuzzy_set_path(stop_word_filtering: bool, stemming: bool) -> str:
+    """
+    Returns the directory of the saved fuzzy set matrices for the given preprocessing options.
+    """
+    suffix = ("_sw" if stop_word_filtering else "") + ("_stem" if stemming else "")
+    return os.path.join(DATA_PATH, f"fuzzy{suffix}")
+
+
+def signature_file_path(bit_sliced: bool, stop_word_filtering: bool, stemming: bool) -> str:
+    """
+    Returns the path of the saved signatures for the given storage layout and preprocessing options.
+    """
+    suffix = ("_sw" if stop_word_filtering else "") + ("_stem" if stemming else "")
+    layout = "signature_slices" if bit_sliced else "signatures"
+    return os.path.join(DATA_PATH, f"{layout}{suffix}.npz")
 
 
 class InformationRetrievalSystem(object):
@@ -42,23 +130,36 @@ class InformationRetrievalSystem(object):
         if not os.path.isdir(DATA_PATH):
             os.makedirs(DATA_PATH)
 
-        # Collection of documents, initially empty.
-        try:
-            self.collection = extraction.load_collection_from_json(COLLECTION_PATH)
-        except FileNotFoundError:
-            print("No previous collection was found. Creating empty one.")
-            self.collection = []
+        # Collection of documents, initially empty. Documents of the collection store are decoded on first access, added
+        # documents are kept in segments (see segments.py).
+        self.collection = self.load_collection()
 
-        # Stopword list, initially empty.
+        # Stopword filter, initially empty. It is loaded once and shared with filter_collection() and the models.
         try:
-            with open(STOPWORD_FILE_PATH, "r") as f:
-                self.stop_word_list = json.load(f)
+            self.stop_word_filter = cleanup.StopWordFilter.from_json(STOPWORD_FILE_PATH)
         except FileNotFoundError:
             print("No stopword list was found.")
-            self.stop_word_list = []
+            self.stop_word_filter = cleanup.StopWordFilter()
 
         self.model = None  # Saves the current IR model in use.
+        # Prepared models by (MODEL_* constant, bit_sliced, stop_word_filtering, stemming), see prepare_search().
+        # Dropped models are closed, so that the worker processes of the linear model do not outlive them.
+        self.index_cache = cache.LRUCache(
+            INDEX_CACHE_MAX_ENTRIES, INDEX_CACHE_MAX_BYTES, models.RetrievalModel.memory_usage,
+            on_evict=lambda key, model: model.close(),
+        )
+        self._index_versions = {}  # Collection version each cached model was last synchronized with.
+        # Results by (query, MODEL_* constant, bit_sliced, stop_word_filtering, stemming, k), see search().
+        self.result_cache = cache.LRUCache(
+            RESULT_CACHE_MAX_ENTRIES, RESULT_CACHE_MAX_BYTES, result_size, ttl=RESULT_CACHE_TTL
+        )
+        self._result_cache_version = None  # Collection version the cached results belong to.
         self.output_k = 5  # Controls how many results should be shown for a query.
+        self.scan_workers = 1  # Processes of the linear model's scan (see models.LinearBooleanModel).
+        self.last_search_report = None  # Statistics of the last multi-stage search (e. g. signature search).
+        self.last_ranking = None  # Ranking of the last ranked search, allows fetching further result pages.
+        self._fingerprint = self._fingerprint_key = None  # Cached fingerprint of the collection file.
+        self._qrels = None  # Relevance judgements, loaded on first use.
 
     def main_menu(self):
         """
@@ -75,6 +176,8 @@ class InformationRetrievalSystem(object):
             print(f"{CHOICE_UPDATE_STOP_WORDS} - Rebuild stopword list")
             print(f"{CHOICE_SET_MODEL} - Set model")
             print(f"{CHOICE_SHOW_DOCUMENT} - Show a specific document")
+            print(f"{CHOICE_ADD_DOCUMENT} - Add document")
+            print(f"{CHOICE_DELETE_DOCUMENT} - Delete document")
             print(f"{CHOICE_EXIT} - Exit")
             
             try:
@@ -86,7 +189,7 @@ class InformationRetrievalSystem(object):
             if action_choice == CHOICE_LIST:
                 # List documents in CLI.
                 if self.collection:
-                    for document in self.collection:
+                    for document in self.collection.live_documents():
                         print(document)
                 else:
                     print("No documents.")
@@ -96,7 +199,6 @@ class InformationRetrievalSystem(object):
                 # Read a query string from the CLI and search for it.
 
                 # Determine desired search parameters:
-                SEARCH_NORMAL, SEARCH_SW, SEARCH_STEM, SEARCH_SW_STEM = 1, 2, 3, 4
                 print("Search options:")
                 print(f"{SEARCH_NORMAL} - Standard search (default)")
                 print(f"{SEARCH_SW} - Search documents with removed stopwords")
@@ -114,55 +216,68 @@ class InformationRetrievalSystem(object):
 
                 # Actual query processing begins here:
                 query = input("Query: ")
-                if stemming:
-                    query = porter.stem_query_terms(query)
                 start_time = time.time()  # Start measuring time
 
-                if isinstance(self.model, models.InvertedListBooleanModel):
-                    results = self.inverted_list_search(
-                        query, stemming, stop_word_filtering
-                    )
-                elif isinstance(self.model, models.VectorSpaceModel):
-                    results = self.buckley_lewit_search(
-                        query, stemming, stop_word_filtering
-                    )
-                elif isinstance(self.model, models.SignatureBasedBooleanModel):
-                    results = self.signature_search(
-                        query, stemming, stop_word_filtering
-                    )
-                else:
-                    results = self.basic_query_search(
-                        query, stemming, stop_word_filtering
-                    )
+                try:
+                    results = self.search(query, stemming, stop_word_filtering)
+                except query_parser.QuerySyntaxError as e:
+                    print(f"Malformed query: {e}")
+                    results = []
                 end_time = time.time()  # End measuring time
 
                 # Output of results:
                 for score, document in results:
                     print(f"{score}: {document}")
+                if isinstance(self.model, models.SignatureBasedBooleanModel) and self.last_search_report:
+                    report = self.last_search_report
+                    print(
+                        f"Signature candidates: {report['candidates']} of {report['documents']} documents "
+                        f"({report['signature_time_ms']:.2f} ms), confirmed: {report['confirmed']} "
+                        f"({report['verification_time_ms']:.2f} ms), false drops: {report['false_drops']}"
+                    )
 
                 # Output of quality metrics:
                 print()
-                print(f'precision: {self.calculate_precision(results)}')
-                print(f'recall: {self.calculate_recall(results)}')
+                metrics = self.evaluate(query, results)
+                if metrics is None:
+                    print("No relevance judgements for this query.")
+                else:
+                    print(f'precision: {metrics["precision"]}')
+                    print(f'recall: {metrics["recall"]}')
+                    print(f'P@{self.output_k}: {metrics["precision_at_k"]}')
+                    print(f'average precision: {metrics["average_precision"]}')
+                    print(f'nDCG@{self.output_k}: {metrics["ndcg"]}')
 
                 processing_time = (end_time - start_time) * 1000  # Convert to milliseconds
                 print(f'Query processing time: {processing_time:.2f} ms')
+                print(f'Result cache hit rate: {self.result_cache.stats()["hit_rate"]:.0%}')
 
             elif action_choice == CHOICE_EXTRACT:
                 # Extract document collection from text file.
 
                 raw_collection_file = os.path.join(RAW_DATA_PATH, "aesopa10.txt")
-                self.collection = extraction.extract_collection(raw_collection_file)
-                assert isinstance(self.collection, list)
-                assert all(isinstance(d, Document) for d in self.collection)
+                documents = extraction.iter_collection(raw_collection_file)
 
-                if input("Should stopwords be filtered? [y/N]: ") == "y":
-                    cleanup.filter_collection(self.collection)
+                stop_word_filtering = input("Should stopwords be filtered? [y/N]: ") == "y"
+                stemming = input("Should stemming be performed? [y/N]: ") == "y"
 
-                if input("Should stemming be performed? [y/N]: ") == "y":
-                    porter.stem_all_documents(self.collection)
+                # The documents are filtered and stemmed by worker processes while they are extracted. Use the loaded
+                # stopword list if there is one, otherwise the default list from englishST.txt.
+                documents = preprocessing.preprocess_documents(
+                    documents, stop_word_filtering, stemming, self.stop_word_filter or None
+                )
 
-                extraction.save_collection_as_json(self.collection, COLLECTION_PATH)
+                self.collection.close()
+                # The documents are written to the store as they arrive and the JSON export is derived from the store,
+                # so the collection is never held in memory as a whole.
+                collection_store.write_collection(COLLECTION_STORE_PATH, documents)
+                # The segments of the previous collection are discarded when the new store is opened.
+                self.collection = self.load_collection()
+                extraction.save_collection_as_json(self.collection.base.stream(), COLLECTION_PATH)
+                # The export must not look newer than the store, or it would be imported again (see load_collection()).
+                status = os.stat(COLLECTION_STORE_PATH)
+                os.utime(COLLECTION_PATH, ns=(status.st_atime_ns, status.st_mtime_ns))
+                self.index_cache.clear()
                 print("Done.\n")
 
             elif action_choice == CHOICE_UPDATE_STOP_WORDS:
@@ -178,19 +293,24 @@ class InformationRetrievalSystem(object):
                 if method_choice in (SW_METHOD_LIST, SW_METHOD_CROUCH):
                     # Load stop words using the desired method:
                     if method_choice == SW_METHOD_LIST:
-                        self.stop_word_list = cleanup.load_stop_word_list(
+                        self.stop_word_filter = cleanup.StopWordFilter.from_text_file(
                             os.path.join(RAW_DATA_PATH, "englishST.txt")
                         )
                         print("Done.\n")
                     elif method_choice == SW_METHOD_CROUCH:
-                        self.stop_word_list = (
-                            cleanup.create_stop_word_list_by_frequency(self.collection)
+                        self.stop_word_filter = (
+                            cleanup.StopWordFilter.from_collection(self.collection)
                         )
                         print("Done.\n")
+                    # The prepared models were built with the old stop words; clearing the cache also closes them.
+                    # Saved indexes without stop words are rebuilt, see index_fingerprint().
+                    self.index_cache.clear()
+                    if self.model is not None:
+                        self.model = self.create_model(*self.model_kind(self.model))
+                    self.result_cache.clear()
 
                     # Save new stopword list into file:
-                    with open(STOPWORD_FILE_PATH, "w") as f:
-                        json.dump(self.stop_word_list, f)
+                    self.stop_word_filter.save_as_json(STOPWORD_FILE_PATH)
                 else:
                     print("Invalid choice.")
 
@@ -205,23 +325,25 @@ class InformationRetrievalSystem(object):
                 print(f"{MODEL_FUZZY} - Fuzzy set model")
                 print(f"{MODEL_VECTOR} - Vector space model")
                 model_choice = int(input("Enter choice: "))
-                if model_choice == MODEL_BOOL_LIN:
-                    self.model = models.LinearBooleanModel()
-                elif model_choice == MODEL_BOOL_INV:
-                    self.model = models.InvertedListBooleanModel()
-                elif model_choice == MODEL_BOOL_SIG:
-                    self.model = models.SignatureBasedBooleanModel()
-                elif model_choice == MODEL_FUZZY:
-                    self.model = models.FuzzySetModel()
-                elif model_choice == MODEL_VECTOR:
-                    self.model = models.VectorSpaceModel()
-                else:
+                bit_sliced = False
+                if model_choice == MODEL_BOOL_SIG:
+                    print("Signature storage:")
+                    print(f"{SIG_STORAGE_ROWS} - One signature per document (default)")
+                    print(f"{SIG_STORAGE_SLICED} - Bit-sliced (one bitmap per signature bit)")
+                    bit_sliced = input("Enter choice: ") == str(SIG_STORAGE_SLICED)
+                model = self.create_model(model_choice, bit_sliced)
+                if model is None:
                     print("Invalid choice.")
+                else:
+                    self.model = model
+                    # Otherwise, the indexes of a search mode are loaded (or built) by its first search.
+                    if input("Prepare the indexes for all search modes now? [y/N]: ") == "y":
+                        self.build_indexes()
 
             elif action_choice == CHOICE_SHOW_DOCUMENT:
                 target_id = int(input("ID of the desired document:"))
                 found = False
-                for document in self.collection:
+                for document in self.collection.live_documents():
                     if document.document_id == target_id:
                         print(document.title)
                         print("-" * len(document.title))
@@ -231,7 +353,30 @@ class InformationRetrievalSystem(object):
                 if not found:
                     print(f"Document #{target_id} not found!")
 
+            elif action_choice == CHOICE_ADD_DOCUMENT:
+                # Add a document without rebuilding the collection; only the new document is indexed.
+                title = input("Title: ")
+                print("Text (finish with an empty line):")
+                text = "\n".join(iter(input, ""))
+                document = extraction.create_document(title, text)
+                # Preprocess it like a collection that is built with stopword filtering and stemming.
+                preprocessing.preprocess_collection(
+                    [document], True, True, self.stop_word_filter or None, workers=1
+                )
+                self.collection.add(document)
+                print(f"Added document #{document.document_id}.")
+
+            elif action_choice == CHOICE_DELETE_DOCUMENT:
+                target_id = int(input("ID of the document to delete: "))
+                position = self.collection.position_of(target_id)
+                if position is None:
+                    print(f"Document #{target_id} not found!")
+                else:
+                    self.collection.delete(position)
+                    print(f"Deleted document #{target_id}.")
+
             elif action_choice == CHOICE_EXIT:
+                self.close()
                 break
             else:
                 print("Invalid choice.")
@@ -240,6 +385,342 @@ class InformationRetrievalSystem(object):
             input("Press ENTER to continue...")
             print()
 
+    def close(self):
+        """
+        Closes the current model, the models of the index cache and the collection.
+        """
+        if self.model is not None:
+            self.model.close()
+        for model in self.index_cache.values():
+            model.close()
+        self.collection.close()
+
+    @property
+    def qrels(self) -> evaluation.Qrels:
+        """
+        Relevance judgements from ground_truth.txt. The file is only read once.
+        """
+        if self._qrels is None:
+            try:
+                self._qrels = evaluation.Qrels.from_file(GROUND_TRUTH_PATH)
+            except FileNotFoundError:
+                self._qrels = evaluation.Qrels()
+        return self._qrels
+
+    def evaluate(self, query: str, results: list):
+        """
+        Evaluates the results of a query against the relevance judgements.
+        :param query: Query string, as entered by the user
+        :param results: List of (score, document) tuples in ranked order
+        :return: Dictionary of metrics (see evaluation.evaluate_query()), or None if there are no judgements for the
+        query
+        """
+        relevant = self.qrels.relevant(query)
+        if relevant is None:
+            return None
+        return evaluation.evaluate_query([document.document_id for _, document in results], relevant, self.output_k)
+
+    def create_model(self, model_choice: int, bit_sliced: bool = False):
+        """
+        Creates a retrieval model that shares the system's stopword filter.
+        :param model_choice: One of the MODEL_* constants
+        :param bit_sliced: Controls, whether a signature based model stores its signatures bit-sliced
+        :return: New model, or None for an unknown choice
+        """
+        model_class = MODEL_CLASSES.get(model_choice)
+        if model_class is None:
+            return None
+        if model_class is models.SignatureBasedBooleanModel:
+            return model_class(stop_word_filter=self.stop_word_filter, bit_sliced=bit_sliced)
+        if model_class is models.LinearBooleanModel:
+            return model_class(stop_word_filter=self.stop_word_filter, workers=self.scan_workers)
+        return model_class(stop_word_filter=self.stop_word_filter)
+
+    @staticmethod
+    def model_kind(model) -> tuple:
+        """
+        :return: (MODEL_* constant, bit_sliced) of a model, as passed to create_model()
+        """
+        for model_choice, model_class in MODEL_CLASSES.items():
+            if type(model) is model_class:
+                return model_choice, getattr(model, "bit_sliced", False)
+        raise ValueError(f"Unknown model: {model}")
+
+    def search(self, query: str, stemming: bool, stop_word_filtering: bool) -> list:
+        """
+        Searches the collection with the current model, using the fastest search method the model supports. Results
+        are cached per query (lowercased, with normalized whitespace), model, search mode and k; the cache is emptied
+        when the collection changes (a new collection store, added or deleted documents, merged segments).
+        :param query: Query string
+        :param stemming: Controls, whether stemming is used
+        :param stop_word_filtering: Controls, whether stop-words are ignored in the search
+        :return: List of tuples, where the first element is the relevance score and the second the corresponding
+        document
+        """
+        version = (self.collection.base_fingerprint, self.collection.version)
+        if version != self._result_cache_version:
+            self.result_cache.clear()
+            self._result_cache_version = version
+        # All models lowercase the query terms, and the Boolean keywords are recognized in any case.
+        key = (evaluation.normalize_query(query), *self.model_kind(self.model), stop_word_filtering, stemming,
+               self.output_k)
+        cached = self.result_cache.get(key)
+        if cached is not None:
+            # The ranking is restored as well, so that further pages can still be fetched without scoring again.
+            results, self.last_search_report, self.last_ranking = cached
+            return list(results)
+        self.last_ranking = None  # Only ranked searches set a new ranking.
+        results = self._search(query, stemming, stop_word_filtering)
+        self.result_cache.put(key, (tuple(results), self.last_search_report, self.last_ranking))
+        return results
+
+    def _search(self, query: str, stemming: bool, stop_word_filtering: bool) -> list:
+        if stemming:
+            query = porter.stem_query_terms(query)
+        if isinstance(self.model, models.InvertedListBooleanModel):
+            return self.inverted_list_search(query, stemming, stop_word_filtering)
+        if isinstance(self.model, models.VectorSpaceModel):
+            return self.buckley_lewit_search(query, stemming, stop_word_filtering)
+        if isinstance(self.model, models.SignatureBasedBooleanModel):
+            return self.signature_search(query, stemming, stop_word_filtering)
+        if isinstance(self.model, models.FuzzySetModel):
+            return self.fuzzy_search(query, stemming, stop_word_filtering)
+        return self.basic_query_search(query, stemming, stop_word_filtering)
+
+    @staticmethod
+    def load_collection():
+        """
+        Opens the binary collection store together with the segments of documents that were added to it. If there is
+        no store yet, or if my_collection.json is newer (e. g. because it was replaced by a collection from elsewhere),
+        the JSON file is imported into the store first.
+        :return: segments.SegmentedCollection on top of the memory-mapped store (collection_store.CollectionFile), or
+        on top of an empty list
+        """
+        if os.path.exists(COLLECTION_PATH) and (
+            not os.path.exists(COLLECTION_STORE_PATH)
+            or os.path.getmtime(COLLECTION_PATH) > os.path.getmtime(COLLECTION_STORE_PATH)
+        ):
+            collection_store.write_collection(
+                COLLECTION_STORE_PATH, extraction.load_collection_from_json(COLLECTION_PATH)
+            )
+        try:
+            base = collection_store.CollectionFile(COLLECTION_STORE_PATH)
+            base_fingerprint = base.fingerprint
+        except FileNotFoundError:
+            print("No previous collection was found. Creating empty one.")
+            base, base_fingerprint = [], bytes(16)
+        return segments.SegmentedCollection(base, SEGMENT_PATH, base_fingerprint)
+
+    def collection_fingerprint(self) -> bytes:
+        """
+        Returns the fingerprint of the collection store, which is stored in its header. It is only read again when the
+        file's size or modification time has changed. Added documents are not covered, see
+        segments.SegmentedCollection.fingerprint().
+        """
+        try:
+            status = os.stat(COLLECTION_STORE_PATH)
+        except FileNotFoundError:
+            return bytes(16)
+        key = (status.st_size, status.st_mtime_ns)
+        if self._fingerprint_key != key:
+            self._fingerprint = collection_store.read_fingerprint(COLLECTION_STORE_PATH)
+            self._fingerprint_key = key
+        return self._fingerprint
+
+    def index_fingerprint(self, fingerprint: bytes, stop_word_filtering: bool) -> bytes:
+        """
+        Returns the fingerprint that the saved indexes of a search mode are checked against. Indexes without stop
+        words also depend on the stop word list, so its digest is included and they are rebuilt when it changes.
+        :param fingerprint: Fingerprint of the collection
+        :param stop_word_filtering: Controls, whether the index is built without stop words
+        """
+        if not stop_word_filtering:
+            return fingerprint
+        # The models fall back to the default list if the system's list is empty.
+        stop_word_filter = self.stop_word_filter or cleanup.get_default_filter()
+        return hashlib.blake2b(fingerprint + stop_word_filter.digest(), digest_size=16).digest()
+
+    def prepare_search(self, stemming: bool, stop_word_filtering: bool):
+        """
+        Makes the instance of the current model that holds its indexes for the given preprocessing options the current
+        model, so that the following searches do not have to load anything. Every (model, stopword filtering,
+        stemming) variant has its own instance, which is loaded (or built) on first use and then kept in the index
+        cache until it is evicted by the cache's entry or memory limit.
+        :param stemming: Controls, whether stemming is used
+        :param stop_word_filtering: Controls, whether stop-words are ignored in the search
+        """
+        key = (*self.model_kind(self.model), stop_word_filtering, stemming)
+        model = self.index_cache.get(key)
+        if model is None:
+            model = self.create_model(*key[:2])
+        self.model = model
+        self._load_indexes(stemming, stop_word_filtering)
+        if key not in self.index_cache or self._index_versions.get(key) != self.collection.version:
+            # (Re)computes the memory usage, which changes when documents are added.
+            self.index_cache.put(key, model)
+            self._index_versions[key] = self.collection.version
+
+    def build_indexes(self, search_modes=(SEARCH_NORMAL, SEARCH_SW, SEARCH_STEM, SEARCH_SW_STEM)):
+        """
+        Prepares the current model for several search modes at once (see prepare_search()), so that switching between
+        them does not cost anything afterwards.
+        :param search_modes: SEARCH_* constants
+        """
+        for search_mode in search_modes:
+            stop_word_filtering = search_mode in (SEARCH_SW, SEARCH_SW_STEM)
+            stemming = search_mode in (SEARCH_STEM, SEARCH_SW_STEM)
+            self.prepare_search(stemming, stop_word_filtering)
+
+    def _load_indexes(self, stemming: bool, stop_word_filtering: bool):
+        """
+        Loads (or builds) the index structures the current model needs for the given preprocessing options. Models
+        that are already prepared only index the documents that were added since.
+        """
+        # The saved indexes cover the collection store; documents added since are indexed per segment.
+        fingerprint = self.index_fingerprint(self.collection_fingerprint(), stop_word_filtering)
+        base = self.collection.base
+        if isinstance(self.model, models.InvertedListBooleanModel):
+            if not self.model.is_ready:
+                # Reuse the index from a previous run unless the collection file has changed since.
+                self.model.load_or_build_inverted_list(
+                    base, inverted_index_path(stop_word_filtering, stemming), fingerprint,
+                    stop_word_filtering, stemming,
+                )
+            self.model.sync_segments(self.collection, stop_word_filtering, stemming)
+        elif isinstance(self.model, models.VectorSpaceModel):
+            self.model.load_or_build_index(
+                base, tfidf_index_path(stop_word_filtering, stemming), fingerprint,
+                stop_word_filtering, stemming,
+            )
+            self.model.sync_segments(self.collection, stop_word_filtering, stemming)
+        elif isinstance(self.model, models.SignatureBasedBooleanModel):
+            if not self.model.is_ready:
+                self.model.load_or_build_signatures(
+                    base, signature_file_path(self.model.bit_sliced, stop_word_filtering, stemming),
+                    fingerprint, stop_word_filtering, stemming,
+                )
+            self.model.sync_segments(self.collection, stop_word_filtering, stemming)
+        elif isinstance(self.model, models.LinearBooleanModel):
+            self.model.prepare(self.collection, stop_word_filtering, stemming)
+        elif isinstance(self.model, models.FuzzySetModel):
+            # The correlations depend on all documents, so the fuzzy set model is rebuilt when documents are added.
+            self.model.load_or_build(
+                self.collection, fuzzy_set_path(stop_word_filtering, stemming),
+                self.index_fingerprint(self.collection.fingerprint(), stop_word_filtering),
+                stop_word_filtering, stemming,
+            )
+
+    @staticmethod
+    def parse_batch_line(line: str, options: dict) -> str:
+        """
+        Splits a line of a batch query file into its leading options (e. g. "model=inverted k=10") and the query.
+        :param line: Stripped query line
+        :param options: Known options with their default values, updated with the options of the line
+        :return: Query string
+        """
+        query_terms = line.split()
+        while query_terms and query_terms[0].partition("=")[0] in options and "=" in query_terms[0]:
+            key, _, value = query_terms.pop(0).partition("=")
+            options[key] = value
+        return " ".join(query_terms)
+
+    def run_batch(self, lines, output, model_name: str = "vector", search_mode: str = "normal", k: int = 5) -> dict:
+        """
+        Runs a batch of queries and writes one JSON object per query to the output. Every line holds one query,
+        optionally preceded by options that override the defaults for this query, e. g. "model=inverted mode=stem
+        k=10 fox & crow". Empty lines and lines starting with "#" are skipped. The indexes of each model and search
+        mode are loaded before the first query that uses them and kept in the index cache, so that the measured
+        latencies only cover the searches.
+        :param lines: Iterable of query lines
+        :param output: Text stream the JSON lines are written to
+        :param model_name: Default model (see BATCH_MODELS)
+        :param search_mode: Default search mode (see BATCH_SEARCH_MODES)
+        :param k: Default number of ranked results per query
+        :return: Summary with the number of queries and errors, the throughput (queries per second), the 50th, 95th
+        and 99th percentile of the latencies in milliseconds, the mean metrics of the queries that have relevance
+        judgements (see evaluation.py) and the statistics of the index and result caches
+        """
+        batch_models = {}
+        query_metrics = []
+        latencies = []
+        errors = 0
+        search_time = 0.0
+        for line_number, line in enumerate(lines, start=1):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            options = {"model": model_name, "mode": search_mode, "k": str(k)}
+            query = self.parse_batch_line(line, options)
+            record = {"line": line_number, "query": query, "model": options["model"], "mode": options["mode"]}
+
+            try:
+                model_choice, bit_sliced = BATCH_MODELS[options["model"]]
+                mode = BATCH_SEARCH_MODES[options["mode"]]
+                self.output_k = int(options["k"])
+                if self.output_k < 1:
+                    raise ValueError(f"k must be at least 1, got {self.output_k}")
+            except (KeyError, ValueError) as e:
+                record["error"] = f"Invalid option: {e}"
+                errors += 1
+                output.write(json.dumps(record) + "\n")
+                continue
+            stop_word_filtering = mode in (SEARCH_SW, SEARCH_SW_STEM)
+            stemming = mode in (SEARCH_STEM, SEARCH_SW_STEM)
+
+            # One failing line must not abort the batch, so every error is recorded and the next line is processed.
+            try:
+                if options["model"] not in batch_models:
+                    batch_models[options["model"]] = self.create_model(model_choice, bit_sliced)
+                self.model = batch_models[options["model"]]
+                # Selects the cached instance for this search mode, the indexes are only loaded for its first query.
+                self.prepare_search(stemming, stop_word_filtering)
+            except Exception as e:
+                record["error"] = f"Preparing the model failed: {e!r}"
+                errors += 1
+                output.write(json.dumps(record) + "\n")
+                continue
+
+            start_time = time.perf_counter()
+            try:
+                results = self.search(query, stemming, stop_word_filtering)
+            except query_parser.QuerySyntaxError as e:
+                record["error"] = f"Malformed query: {e}"
+                errors += 1
+                results = []
+            except Exception as e:
+                record["error"] = f"Search failed: {e!r}"
+                errors += 1
+                results = []
+            latency = time.perf_counter() - start_time
+            search_time += latency
+            latencies.append(latency * 1000)
+
+            record["latency_ms"] = latency * 1000
+            record["results"] = [
+                {"document_id": document.document_id, "title": document.title, "score": float(score)}
+                for score, document in results
+            ]
+            metrics = self.evaluate(query, results)
+            if metrics is not None:
+                record["metrics"] = metrics
+                query_metrics.append(metrics)
+            output.write(json.dumps(record) + "\n")
+
+        percentiles = np.percentile(latencies, [50, 95, 99]).tolist() if latencies else [0.0, 0.0, 0.0]
+        return {
+            "queries": len(latencies),
+            "errors": errors,
+            "search_time_s": search_time,
+            "qps": len(latencies) / search_time if search_time > 0 else 0.0,
+            "p50_ms": percentiles[0],
+            "p95_ms": percentiles[1],
+            "p99_ms": percentiles[2],
+            "evaluated": len(query_metrics),
+            "mean_metrics": evaluation.mean_metrics(query_metrics),
+            "index_cache": self.index_cache.stats(),
+            "result_cache": self.result_cache.stats(),
+        }
+
     def basic_query_search(
         self, query: str, stemming: bool, stop_word_filtering: bool
     ) -> list:
@@ -253,20 +734,14 @@ class InformationRetrievalSystem(object):
         :return: List of tuples, where the first element is the relevance score and the second the corresponding
         document
         """
+        self.prepare_search(stemming, stop_word_filtering)
         query_representation = self.model.query_to_representation(query)
-        document_representations = [
-            self.model.document_to_representation(d, stop_word_filtering, stemming)
-            for d in self.collection
-        ]
-        scores = [
-            self.model.match(dr, query_representation)
-            for dr in document_representations
-        ]
-        ranked_collection = sorted(
-            zip(scores, self.collection), key=lambda x: x[0], reverse=True
+        scores = self.model.score_collection(
+            self.collection, query_representation, stop_word_filtering, stemming
         )
-        results = ranked_collection[: self.output_k]
-        return results
+        candidates = self.collection.live_positions() if self.collection.deleted else None
+        self.last_ranking = ranking.RankedResults(scores, self.collection, candidates=candidates)
+        return self.last_ranking.page(0, self.output_k)
 
     def inverted_list_search(
         self, query: str, stemming: bool, stop_word_filtering: bool
@@ -279,85 +754,70 @@ class InformationRetrievalSystem(object):
         :return: List of tuples, where the first element is the relevance score and the second the corresponding
         document
         """
-        if not self.model.is_ready:
-
-            self.model.build_inverted_list(self.collection, stop_word_filtering, stemming)
-
-        query_terms = self.model.query_to_representation(query, stemming)
-        operand_stack = []
-        operator_stack = []
-
-        def execute_operator(operator, left_set, right_set):
-            if operator == '&':
-                return left_set & right_set
-            elif operator == '|':
-                return left_set | right_set
-            elif operator == '-':
-                return left_set - right_set
-            else:
-                raise ValueError(f"Invalid operator: {operator}")
-
-        for token in query_terms:
-            if token in {'&', '|', '-'}:
-                operator_stack.append(token)
-            elif token == '(':
-                operator_stack.append(token)
-            elif token == ')':
-                while operator_stack and operator_stack[-1] != '(':
-                    right_set = operand_stack.pop()
-                    left_set = operand_stack.pop()
-                    operator = operator_stack.pop()
-                    operand_stack.append(execute_operator(operator, left_set, right_set))
-                if operator_stack and operator_stack[-1] == '(':
-                    operator_stack.pop()  # Remove '('
-            else:
-                operand_stack.append(self.model.inverted_index.get(token, set()))
-
-            while len(operand_stack) >= 2 and operator_stack and operator_stack[-1] not in {'(', ')'}:
-                right_set = operand_stack.pop()
-                left_set = operand_stack.pop()
-                operator = operator_stack.pop()
-                operand_stack.append(execute_operator(operator, left_set, right_set))
-
-        while len(operand_stack) >= 2 and operator_stack:
-            right_set = operand_stack.pop()
-            left_set = operand_stack.pop()
-            operator = operator_stack.pop()
-            operand_stack.append(execute_operator(operator, left_set, right_set))
-
-        if len(operand_stack) != 1:
-            raise ValueError("Malformed query: Mismatch between operators and operands")
-
-        final_result_set = operand_stack[0] if operand_stack else set()
-        search_results = [(1, self.collection[doc_id]) for doc_id in final_result_set]
+        self.prepare_search(stemming, stop_word_filtering)
+
+        query_representation = self.model.query_to_representation(query, stemming)
+        query_plan = query_parser.plan(query_representation, self.model.document_frequency)
+        result = query_parser.evaluate(query_plan, self.model.postings, self.collection.live_positions)
+        if self.collection.deleted:
+            result = postings.difference(result, self.collection.deleted_positions())
+        search_results = [(1, self.collection[doc_id]) for doc_id in result]
         return search_results
 
-    def buckley_lewit_search(
+    def fuzzy_search(
         self, query: str, stemming: bool, stop_word_filtering: bool
+    ) -> list:
+        """
+        Query search for the fuzzy set model. The correlation matrix and the membership degrees are loaded from disk
+        (or built once), after which a query is evaluated for all documents with a few vector operations.
+        :param query: Query string
+        :param stemming: Controls, whether stemming is used
+        :param stop_word_filtering: Controls, whether stop-words are ignored in the search
+        :return: List of tuples, where the first element is the relevance score and the second the corresponding
+        document
+        """
+        self.prepare_search(stemming, stop_word_filtering)
+        query_representation = self.model.query_to_representation(query, stemming)
+        scores = self.model.score_collection(
+            self.collection, query_representation, stop_word_filtering, stemming
+        )
+        candidates = np.flatnonzero(scores > 0)
+        if self.collection.deleted:
+            candidates = np.setdiff1d(candidates, self.collection.deleted_positions(), assume_unique=True)
+        self.last_ranking = ranking.RankedResults(scores, self.collection, candidates=candidates)
+        return self.last_ranking.page(0, self.output_k)
+
+    def buckley_lewit_search(
+        self, query: str, stemming: bool, stop_word_filtering: bool, exact: bool = True
     ) -> list:
         """
         Fast query search for the Vector Space Model using the algorithm by Buckley & Lewit.
         :param query: Query string
         :param stemming: Controls, whether stemming is used
         :param stop_word_filtering: Controls, whether stop-words are ignored in the search
+        :param exact: Controls, whether the top k results must be exact or may be approximated (see
+        VectorSpaceModel.term_at_a_time_search())
         :return: List of tuples, where the first element is the relevance score and the second the corresponding
         document
         """
 
-        # Ensure that the vectorizer is fitted
-        if not hasattr(self.model.vectorizer, 'vocabulary_'):
-            documents_text = [d.raw_text for d in self.collection]
-            self.model.vectorizer.fit(documents_text)
-            self.model.document_vectors = self.model.vectorizer.transform(documents_text)
+        # Ensure that the document vectors and the weighted index exist for these preprocessing options
+        self.prepare_search(stemming, stop_word_filtering)
 
         transformed_query = self.model.query_to_representation(query, stemming)
-        vectorized_query = self.model.vectorizer.transform([transformed_query])
-        similarity_scores = cosine_similarity(vectorized_query, self.model.document_vectors).flatten()
-
-        matching_documents = [(score, self.collection[index]) for index, score in enumerate(similarity_scores) if score > 0]
-        matching_documents.sort(reverse=True, key=lambda x: x[0])
+        deleted = self.collection.deleted_positions()
+        start_time = time.perf_counter()
+        similarity_scores, candidates, statistics = self.model.segmented_search(
+            transformed_query, self.output_k, exact, deleted=deleted
+        )
+        statistics["time_ms"] = (time.perf_counter() - start_time) * 1000
+        self.last_search_report = statistics
 
-        return matching_documents
+        candidates = candidates[similarity_scores[candidates] > 0]
+        if len(deleted):
+            candidates = np.setdiff1d(candidates, deleted, assume_unique=True)
+        self.last_ranking = ranking.RankedResults(similarity_scores, self.collection, candidates=candidates)
+        return self.last_ranking.page(0, self.output_k)
 
     def signature_search(self, query: str, stemming: bool, stop_word_filtering: bool) -> list:
         """
@@ -367,110 +827,212 @@ class InformationRetrievalSystem(object):
         :param stop_word_filtering: Controls, whether stop-words are ignored in the search
         :return: List of tuples, where the first element is the relevance score and the second the corresponding document
         """
-         # Tokenize and optionally filter stopwords from the query
-        def process_terms(terms):
-            if stop_word_filtering:
-                terms = [term for term in terms if term not in self.stop_word_list]
-            if stemming:
-                terms = [porter.stem_term(term) for term in terms]
-            return terms
-    
-        # Parse the query
-        query_parts = re.split(r'\s+(AND|OR)\s+', query.upper())
-        term_signatures = []
-        operators = []
-
-        for part in query_parts:
-            if part in {'AND', 'OR'}:
-                operators.append(part)
-            else:
-                terms = process_terms(part.lower().split())
-                term_signatures.append(self.model._create_signature(terms))
-        
-        if not term_signatures:
+        query_representation = self._signature_query(query, stemming, stop_word_filtering)
+        if query_representation is None:
             return []
 
-        # Combine the term signatures according to the operators
-        combined_signature = term_signatures[0]
-        for i, operator in enumerate(operators):
-            if operator == 'AND':
-                combined_signature &= term_signatures[i + 1]
-            elif operator == 'OR':
-                combined_signature |= term_signatures[i + 1]
-
         # Ensure that documents are already processed and their signatures are available
-        if not self.model.documents:
-            for document in self.collection:
-                self.model.document_to_representation(document, stop_word_filtering, stemming)
-    
-        # Search for matching documents
-        results = []
-        for document, doc_signature in self.model.documents:
-            if self.model.match(doc_signature, combined_signature):
-                results.append((1.0, document))  # Assuming a match score of 1.0 for simplicity
-    
-        return results[:self.output_k]
-
-    def calculate_precision(self, result_list: list[tuple]) -> float:
-        try:
-            with open(os.path.join(RAW_DATA_PATH, "ground_truth.txt"), "r") as f:
-                ground_truth = f.read().splitlines()
-
-            relevant_docs = set()
-            for line in ground_truth:
-                if not line.strip() or line.startswith("#"):
-                    # Skip empty lines and comments
-                    continue
-
-                parts = line.split(' - ')
-                if len(parts) == 2:
-                    term, doc_ids = parts
-                    relevant_docs.update(map(int, doc_ids.split(', ')))
-                else:
-                    print(f"Skipping malformed line in ground_truth.txt: {line}")
-
-            retrieved_docs = {doc.document_id for _, doc in result_list}
-            true_positives = len(relevant_docs.intersection(retrieved_docs))
-
-            return true_positives / len(retrieved_docs) if retrieved_docs else 0
-
-        except FileNotFoundError:
-            return 0
-        except Exception as e:
-            print(f"An error occurred while calculating precision: {e}")
-            return 0
-
-    def calculate_recall(self, result_list: list[tuple]) -> float:
-        try:
-            with open(os.path.join(RAW_DATA_PATH, "ground_truth.txt"), "r") as f:
-                ground_truth = f.read().splitlines()
-
-            relevant_docs = set()
-            for line in ground_truth:
-                if not line.strip() or line.startswith("#"):
-                    # Skip empty lines and comments
-                    continue
-
-                parts = line.split(' - ')
-                if len(parts) == 2:
-                    term, doc_ids = parts
-                    relevant_docs.update(map(int, doc_ids.split(', ')))
-                else:
-                    print(f"Skipping malformed line in ground_truth.txt: {line}")
+        self.prepare_search(stemming, stop_word_filtering)
+
+        # Stage 1: cheap signature filter. Stage 2: exact verification of the candidates.
+        start_time = time.perf_counter()
+        candidates = self._signature_candidates(self.model, query_representation)
+        if self.collection.deleted:
+            candidates = postings.difference(candidates, self.collection.deleted_positions())
+        signature_time = time.perf_counter() - start_time
+        start_time = time.perf_counter()
+        matching_positions = self.model.verify(candidates, query_representation)
+        verification_time = time.perf_counter() - start_time
+
+        self.last_search_report = {
+            "documents": len(self.model.documents),
+            "candidates": len(candidates),
+            "confirmed": len(matching_positions),
+            "false_drops": len(candidates) - len(matching_positions),
+            "signature_time_ms": signature_time * 1000,
+            "verification_time_ms": verification_time * 1000,
+        }
+        return [(1.0, self.model.documents[position]) for position in matching_positions]
+
+    def _signature_query(self, query: str, stemming: bool, stop_word_filtering: bool):
+        """
+        Compiles a query for the signature search and optionally removes stop words from it and stems its terms.
+        :return: Root node of the query, or None if no terms are left
+        """
+        query_representation = query_parser.compile_query(query)
+        if stop_word_filtering and query_representation is not None:
+            # Like the models, fall back to the default list if the system's list is empty.
+            stop_word_filter = self.stop_word_filter or cleanup.get_default_filter()
+            query_representation = query_representation.remove_terms(stop_word_filter.is_stop_word)
+        if stemming and query_representation is not None:
+            query_representation = query_representation.map_terms(porter.default_stemmer.stem)
+        return query_representation
+
+    @staticmethod
+    def _signature_candidates(model, query_representation):
+        """
+        Evaluates a compiled query on the signatures of a signature based model. Signatures have false positives, so
+        negations are not applied here, the result is a superset of the real matches.
+        :return: Sorted positions of the candidate documents in model.documents
+        """
+        relaxed_query = query_parser.relax_negations(query_representation)
+        if relaxed_query is None:
+            return postings.from_doc_ids(range(len(model.documents)))
+        # The terms of each conjunction are superimposed into one signature and matched in a single pass.
+        query_plan = query_parser.plan(relaxed_query, lambda term: 0)
+        return query_parser.evaluate(
+            query_plan,
+            lambda term: model.matching_documents([term]),
+            lambda: postings.from_doc_ids(range(len(model.documents))),
+            model.matching_documents,
+        )
 
-            retrieved_docs = {doc.document_id for _, doc in result_list}
-            true_positives = len(relevant_docs.intersection(retrieved_docs))
+    def signature_false_drop_report(self, queries: list[str], stemming=False, stop_word_filtering=False,
+                                    configurations=((64, 4),), hash_scheme="blake2b") -> list[dict]:
+        """
+        Measures how many documents the signature search returns that do not actually match a query ("false drops").
+        The exact results come from an inverted index that is built from the same document terms as the signatures.
+        :param queries: Query strings to evaluate
+        :param stemming: Controls, whether stemming is used
+        :param stop_word_filtering: Controls, whether stop-words are ignored in the search
+        :param configurations: (F, D) pairs to compare
+        :param hash_scheme: Name of the hash scheme, see models.HASH_SCHEMES
+        :return: One dict per configuration with candidate, false drop and timing statistics; malformed queries and
+        queries without terms are skipped
+        """
+        compiled_queries = []
+        for query in queries:
+            try:
+                query_representation = self._signature_query(query, stemming, stop_word_filtering)
+            except query_parser.QuerySyntaxError:
+                continue
+            if query_representation is not None:
+                compiled_queries.append(query_representation)
+        reference_model = models.SignatureBasedBooleanModel(stop_word_filter=self.stop_word_filter)
+        exact_index = {}
+        for position, document in enumerate(self.collection):
+            for term in set(reference_model.document_terms(document, stop_word_filtering, stemming)):
+                exact_index.setdefault(term, postings.empty()).append(position)
+        exact_results = [
+            query_parser.evaluate(
+                query,
+                lambda term: exact_index.get(term, postings.empty()),
+                lambda: postings.from_doc_ids(range(len(self.collection))),
+            )
+            for query in compiled_queries
+        ]
 
-            return true_positives / len(relevant_docs) if relevant_docs else 0
+        report = []
+        for F, D in configurations:
+            model = models.SignatureBasedBooleanModel(
+                F=F, D=D, stop_word_filter=self.stop_word_filter, hash_scheme=hash_scheme
+            )
+            start_time = time.perf_counter()
+            model.build_signature_matrix(self.collection, stop_word_filtering, stemming)
+            build_time = time.perf_counter() - start_time
+
+            candidates = false_drops = non_matching = 0
+            start_time = time.perf_counter()
+            for query, exact in zip(compiled_queries, exact_results):
+                query_candidates = self._signature_candidates(model, query)
+                candidates += len(query_candidates)
+                false_drops += len(postings.difference(query_candidates, exact))
+                non_matching += len(self.collection) - len(exact)
+            query_time = time.perf_counter() - start_time
+
+            report.append({
+                "F": F,
+                "D": D,
+                "hash_scheme": hash_scheme,
+                "queries": len(compiled_queries),
+                "candidates": candidates,
+                "false_drops": false_drops,
+                # Share of the documents that do not match a query but were returned anyway.
+                "false_drop_rate": false_drops / non_matching if non_matching else 0.0,
+                "build_time_ms": build_time * 1000,
+                "query_time_ms": query_time * 1000,
+            })
+        return report
 
-        except FileNotFoundError:
-            return 0
-        except Exception as e:
-            print(f"An error occurred while calculating recall: {e}")
-            return 0
-    
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Information retrieval system. Starts the interactive menu unless a query file is given."
+    )
+    parser.add_argument("--batch", metavar="QUERY_FILE", help="run the queries of a file (one per line) and exit")
+    parser.add_argument("--model", choices=sorted(BATCH_MODELS), default="vector", help="default model")
+    parser.add_argument("--mode", choices=sorted(BATCH_SEARCH_MODES), default="normal", help="default search mode")
+    parser.add_argument("-k", type=int, default=5, help="default number of ranked results per query")
+    parser.add_argument("--output", help="file for the JSON lines results (default: standard output)")
+    parser.add_argument("--scan-workers", type=int, default=1,
+                        help="processes of the linear model's scan (0 for the number of CPUs)")
+    parser.add_argument("--no-result-cache", action="store_true", help="search every query, even if it is repeated")
+    parser.add_argument("--false-drop-report", metavar="QUERY_FILE",
+                        help="measure the false drops of the signature model for the queries of a file and exit")
+    parser.add_argument("--warm-up", action="store_true",
+                        help="prepare the indexes of the default model for all search modes before the queries")
+    arguments = parser.parse_args()
+
     irs = InformationRetrievalSystem()
-    irs.main_menu()
+    irs.scan_workers = arguments.scan_workers or None
+    if arguments.no_result_cache:
+        irs.result_cache.max_entries = 0
+    if arguments.false_drop_report is not None:
+        # The queries of a batch file can be reused, their options are ignored except for the search mode (--mode).
+        with open(arguments.false_drop_report, encoding="utf-8") as query_file:
+            lines = [line.strip() for line in query_file]
+        queries = [irs.parse_batch_line(line, {"model": "", "mode": "", "k": ""})
+                   for line in lines if line and not line.startswith("#")]
+        mode = BATCH_SEARCH_MODES[arguments.mode]
+        # Same F, D and hash scheme as the signature model used for searching.
+        signature_model = irs.create_model(MODEL_BOOL_SIG)
+        false_drop_report = irs.signature_false_drop_report(
+            queries, mode in (SEARCH_STEM, SEARCH_SW_STEM), mode in (SEARCH_SW, SEARCH_SW_STEM),
+            ((signature_model.F, signature_model.D),), signature_model.hash_scheme,
+        )
+        output = sys.stdout if arguments.output is None else open(arguments.output, "w", encoding="utf-8")
+        for configuration in false_drop_report:
+            output.write(json.dumps(configuration) + "\n")
+        if output is not sys.stdout:
+            output.close()
+        irs.close()
+        exit(0)
+    if arguments.batch is None:
+        irs.main_menu()
+        exit(0)
+
+    if arguments.warm_up:
+        irs.model = irs.create_model(*BATCH_MODELS[arguments.model])
+        irs.build_indexes()
+    with open(arguments.batch, encoding="utf-8") as query_file:
+        output = sys.stdout if arguments.output is None else open(arguments.output, "w", encoding="utf-8")
+        try:
+            summary = irs.run_batch(query_file, output, arguments.model, arguments.mode, arguments.k)
+        finally:
+            if output is not sys.stdout:
+                output.close()
+            irs.close()
+    print(
+        f"{summary['queries']} queries ({summary['errors']} errors), {summary['qps']:.1f} queries/s, "
+        f"latency p50 {summary['p50_ms']:.2f} ms, p95 {summary['p95_ms']:.2f} ms, p99 {summary['p99_ms']:.2f} ms",
+        file=sys.stderr,
+    )
+    if summary["evaluated"]:
+        mean_metrics = summary["mean_metrics"]
+        print(
+            f"{summary['evaluated']} queries with relevance judgements: MAP {mean_metrics['average_precision']:.4f}, "
+            f"P@k {mean_metrics['precision_at_k']:.4f}, nDCG@k {mean_metrics['ndcg']:.4f}",
+            file=sys.stderr,
+        )
+    index_cache, result_cache = summary["index_cache"], summary["result_cache"]
+    print(
+        f"Index cache: {index_cache['entries']} indexes, {index_cache['bytes'] / 2 ** 20:.1f} MB, "
+        f"{index_cache['evictions']} evictions",
+        file=sys.stderr,
+    )
+    print(
+        f"Result cache: {result_cache['hits']} hits, {result_cache['misses']} misses "
+        f"(hit rate {result_cache['hit_rate']:.0%}), {result_cache['entries']} entries",
+        file=sys.stderr,
+    )
     exit(0)
@@ -1,18 +1,82 @@
 import hashlib
-from bitarray import bitarray
+import mmap
+import os
+import sys
+import zlib
 from abc import ABC, abstractmethod
+from concurrent.futures import ProcessPoolExecutor
 
 from document import Document
-import re
 import numpy as np
-from collections import defaultdict
-from document import Document
-from porter import stem_term
-from math import log
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
+from collections import Counter
+from collections.abc import Sequence
+import cleanup
 import porter
+import inverted_index
+import postings
+import query_parser
+import segments
+import tfidf
+
+
+def document_sequence(documents):
+    """
+    Keeps sequences of documents (like a memory-mapped collection_store.CollectionFile) as they are, so that their
+    documents are only decoded when they are accessed, and turns other iterables into a list.
+    """
+    return documents if isinstance(documents, Sequence) else list(documents)
+
+
+def document_ids(documents) -> list:
+    """
+    Returns the ids of all documents. A collection store reads them without decoding the documents.
+    """
+    if hasattr(documents, "document_id_at"):
+        return [documents.document_id_at(position) for position in range(len(documents))]
+    return [document.document_id for document in documents]
+
+
+def _estimate_size(value, seen: set) -> int:
+    """
+    Estimates the memory held by an index structure: numpy arrays, arrays and (nested) containers and objects.
+    Memory-mapped arrays and files are backed by the page cache and are not counted.
+    """
+    if id(value) in seen or isinstance(value, (np.memmap, mmap.mmap)):
+        return 0
+    seen.add(id(value))
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(_estimate_size(key, seen) + _estimate_size(item, seen) for key, item in value.items())
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        size += sum(_estimate_size(item, seen) for item in value)
+    elif hasattr(value, "__dict__") and not isinstance(value, (type, Document, Sequence)):
+        size += sum(_estimate_size(item, seen) for item in vars(value).values())
+    return size
+
+
 class RetrievalModel(ABC):
+    # Optional cleanup.StopWordFilter, shared with the IR system so the stop words are only loaded once.
+    stop_word_filter = None
+    # Attributes that refer to data shared with the IR system, they are not part of a model's memory usage.
+    SHARED_ATTRIBUTES = ("documents", "docs", "stop_word_filter")
+
+    def memory_usage(self) -> int:
+        """
+        Estimates the number of bytes held by the model's index structures (see _estimate_size()). The documents
+        and the stop word filter are shared with the IR system and not counted.
+        """
+        seen = set()
+        return sum(_estimate_size(value, seen) for name, value in vars(self).items()
+                   if name not in self.SHARED_ATTRIBUTES)
+
+    def close(self):
+        """
+        Releases resources that are not freed by the garbage collector (e. g. worker processes). The model can still
+        be used afterwards.
+        """
+
     @abstractmethod
     def document_to_representation(
         self, document: Document, stopword_filtering=False, stemming=False
@@ -47,11 +111,160 @@ class RetrievalModel(ABC):
         """
         raise NotImplementedError()
 
+    def score_collection(self, documents, query_representation, stopword_filtering=False, stemming=False):
+        """
+        Scores all documents of a collection for one query. The default implementation converts and matches every
+        document; models that keep precomputed document representations override it.
+        :param documents: Document collection
+        :param query_representation: Query representation, see query_to_representation()
+        :param stopword_filtering: Controls, whether the documents should first be freed of stopwords
+        :param stemming: Controls, whether stemming is used on the documents' terms
+        :return: Scores, aligned with documents
+        """
+        return [
+            self.match(self.document_to_representation(document, stopword_filtering, stemming), query_representation)
+            for document in documents
+        ]
+
+    def _sync_segment_indexes(self, collection, variant, build) -> list[tuple]:
+        """
+        Returns the indexes of the added segments of a segments.SegmentedCollection, building the missing ones.
+        :param collection: Document collection, segment indexes are only needed for a SegmentedCollection
+        :param variant: Preprocessing options (and other parameters) the indexes depend on
+        :param build: Function that builds the index of a segments.Segment
+        :return: List of (segment, index) tuples
+        """
+        if not isinstance(collection, segments.SegmentedCollection):
+            return []
+        if getattr(self, "_segment_variant", None) != variant:
+            self._segment_indexes = segments.SegmentIndexes(build)
+            self._segment_variant = variant
+        return self._segment_indexes.sync(collection)
+
+    def _document_terms(self, document: Document, stopword_filtering=False, stemming=False) -> list[str]:
+        """
+        Preprocesses a document's terms with the collection's own pipeline (cleanup.py and porter.py): symbols are
+        removed, terms are lowercased and optionally freed of stop words and stemmed.
+        :return: List of terms
+        """
+        if stopword_filtering:
+            terms = document.filtered_terms
+            if not terms and self.stop_word_filter:
+                terms = self.stop_word_filter.filter_terms(document.terms)
+        else:
+            terms = [cleanup.remove_symbols(term) for term in document.terms]
+        terms = [term.lower() for term in terms if term]
+        if stemming:
+            terms = porter.default_stemmer.stem_many(terms)
+        return terms
+
+    def _remove_stop_words(self, terms: list[str], document: Document) -> list[str]:
+        """
+        Removes stop words from a term list. Uses the shared stop word filter if one was set and is not empty (the IR
+        system passes an empty filter when there is no stopword list), otherwise falls back to the document's
+        filtered_terms and, if there are none, to the stop words from englishST.txt (like cleanup.filter_collection()).
+        :param terms: Terms of the document
+        :param document: Document the terms belong to
+        :return: Remaining terms
+        """
+        if self.stop_word_filter:
+            stop_words = self.stop_word_filter.stop_words
+        elif document.filtered_terms:
+            filtered_terms = {term.lower() for term in document.filtered_terms}
+            return [term for term in terms if term.lower() in filtered_terms]
+        else:
+            stop_words = cleanup.get_default_filter().stop_words
+        return [term for term in terms if term.lower() not in stop_words]
+
+
+# Term sets of the documents, in a worker process of LinearBooleanModel's parallel scan.
+_scan_term_sets = None
+
+
+def _initialize_scan_worker(term_sets: list[frozenset]):
+    global _scan_term_sets
+    _scan_term_sets = term_sets
+
+
+def _scan_chunk(start: int, end: int, query_terms: frozenset) -> list[int]:
+    return [position for position in range(start, end) if not query_terms.isdisjoint(_scan_term_sets[position])]
+
 
 class LinearBooleanModel(RetrievalModel):
-    # TODO: Implement all abstract methods and __init__() in this class. (PR02)
-    def __init__(self):
+    """
+    Boolean model that scans every document for every query. It serves as the baseline of the other models, so it
+    does not use an index; only the term set of each document is computed once per preprocessing variant. With more
+    than one worker, the scan is split among worker processes.
+    """
+
+    # The worker processes hold their own copy of the term sets.
+    SHARED_ATTRIBUTES = RetrievalModel.SHARED_ATTRIBUTES + ("_scan_pool",)
+    # Collections below this size are always scanned in-process.
+    MIN_PARALLEL_DOCUMENTS = 1024
+
+    def __init__(self, stop_word_filter=None, workers=1):
+        """
+        :param stop_word_filter: Optional cleanup.StopWordFilter
+        :param workers: Number of processes that scan the documents, None for the number of CPUs
+        """
         self.documents = []
+        self.stop_word_filter = stop_word_filter
+        self.workers = workers or os.cpu_count() or 1
+        self.term_sets = []  # Frozenset of the represented terms of each document, aligned with self.documents.
+        self.variant = None  # (stopword_filtering, stemming) the term sets were computed with.
+        self._scan_pool = None
+
+    def prepare(self, documents, stopword_filtering=False, stemming=False):
+        """
+        Computes the term sets of the documents, unless they exist for the given preprocessing options. If documents
+        were appended to the collection since (see segments.py), only their term sets are computed.
+        """
+        documents = document_sequence(documents)
+        if self.variant != (stopword_filtering, stemming) or documents is not self.documents \
+                or len(documents) < len(self.term_sets):
+            self.term_sets = []
+        if len(self.term_sets) == len(documents):
+            self.documents, self.variant = documents, (stopword_filtering, stemming)
+            return
+        for position in range(len(self.term_sets), len(documents)):
+            self.term_sets.append(frozenset(
+                self.document_to_representation(documents[position], stopword_filtering, stemming)
+            ))
+        self.documents, self.variant = documents, (stopword_filtering, stemming)
+        self.close()  # The workers of a running pool have outdated term sets.
+
+    def score_collection(self, documents, query_representation, stopword_filtering=False, stemming=False):
+        """
+        Matches the query against the term set of every document (see match()).
+        """
+        self.prepare(documents, stopword_filtering, stemming)
+        if self.workers == 1 or len(self.term_sets) < self.MIN_PARALLEL_DOCUMENTS:
+            return [self.match(term_set, query_representation) for term_set in self.term_sets]
+        return self._parallel_scan(frozenset(query_representation))
+
+    def _parallel_scan(self, query_terms: frozenset) -> list[float]:
+        if self._scan_pool is None:
+            self._scan_pool = ProcessPoolExecutor(
+                max_workers=self.workers, initializer=_initialize_scan_worker, initargs=(self.term_sets,)
+            )
+        chunk_size = -(-len(self.term_sets) // self.workers)
+        futures = [
+            self._scan_pool.submit(_scan_chunk, start, min(start + chunk_size, len(self.term_sets)), query_terms)
+            for start in range(0, len(self.term_sets), chunk_size)
+        ]
+        scores = [0.0] * len(self.term_sets)
+        for future in futures:
+            for position in future.result():
+                scores[position] = 1.0
+        return scores
+
+    def close(self):
+        """
+        Stops the worker processes of the parallel scan.
+        """
+        if self._scan_pool is not None:
+            self._scan_pool.shutdown()
+            self._scan_pool = None
 
     def document_to_representation(
         self, document: Document, stopword_filtering=False, stemming=False
@@ -67,7 +280,7 @@ class LinearBooleanModel(RetrievalModel):
         terms = [term.lower() for term in terms]  # Convert all terms to lowercase
 
         if stopword_filtering:
-            terms = [term for term in terms if term not in document.filtered_terms]
+            terms = self._remove_stop_words(terms, document)
         return terms
 
     def query_to_representation(self, query: str):
@@ -81,7 +294,7 @@ class LinearBooleanModel(RetrievalModel):
     def match(self, document_representation, query_representation) -> float:
         """
         Matches the query and document presentation based on Boolean search.
-        :param document_representation: List of terms that describes one document
+        :param document_representation: Terms that describe one document (list or, for constant time lookups, set)
         :param query_representation: List of terms that describes a query
         :return: 1.0 if the query term is in the document, 0.0 otherwise
         """
@@ -95,92 +308,440 @@ class LinearBooleanModel(RetrievalModel):
 
 
 class InvertedListBooleanModel(RetrievalModel):
-    def __init__(self):
+    def __init__(self, stop_word_filter=None):
         self.inverted_index = {}
         self.docs = []
         self.is_ready = False
+        self.stop_word_filter = stop_word_filter
+        self.segment_indexes = []  # In-memory inverted indexes of added segments, with collection positions.
 
     def document_to_representation(self, document: Document, stopword_filtering=False, stemming=False):
         terms = set()
 
         if stopword_filtering:
-            terms.update(term.lower() for term in document.filtered_terms)
+            filtered_terms = document.filtered_terms
+            if not filtered_terms and self.stop_word_filter:
+                filtered_terms = self.stop_word_filter.filter_terms(document.terms)
+            terms.update(term.lower() for term in filtered_terms)
         else:
             terms.update(term.lower() for term in document.raw_text.split() if term)
 
         if stemming:
-            terms = {porter.stem_term(term) for term in terms}
+            terms = set(porter.default_stemmer.stem_many(terms))
 
         return terms
 
     def query_to_representation(self, query: str, stemming=False):
-    # Split the query into terms and operators
-        terms = re.split(r'(\W)', query.lower())
+        """
+        Compiles the query into a syntax tree (see query_parser.py).
+        :param query: Search query of the user
+        :param stemming: Controls, whether the query terms are stemmed
+        :return: Root node of the query, or None for an empty query
+        """
+        query_representation = query_parser.compile_query(query)
+        if stemming and query_representation is not None:
+            query_representation = query_representation.map_terms(porter.default_stemmer.stem)
+        return query_representation
 
-        # Remove empty strings and whitespace-only strings
-        terms = [term for term in terms if term.strip()]
-        
-        if stemming:
-            terms = [porter.stem_term(term) if term.isalnum() else term for term in terms]
+    def match(self, document_representation, query_representation):
+        if query_representation is None:
+            return 0.0
+        return 1.0 if query_representation.matches(document_representation) else 0.0
 
-        return terms
+    def document_frequency(self, term: str) -> int:
+        """
+        Returns the length of a term's posting list, used by the query planner.
+        """
+        if isinstance(self.inverted_index, inverted_index.InvertedIndexFile):
+            frequency = self.inverted_index.document_frequency(term)
+        else:
+            frequency = len(self.inverted_index.get(term, ()))
+        return frequency + sum(len(index.get(term, ())) for index in self.segment_indexes)
 
-    def match(self, document_representation, query_representation):
-        return all(term in document_representation for term in query_representation)
+    def postings(self, term: str):
+        """
+        Returns the posting list of a term over the base index and the indexes of all added segments. The segments
+        follow each other in position order, so their posting lists are simply concatenated.
+        """
+        posting_list = self.inverted_index.get(term)
+        if not self.segment_indexes:
+            return postings.empty() if posting_list is None else posting_list
+        posting_list = postings.empty() if posting_list is None else postings.from_sorted(posting_list)
+        for index in self.segment_indexes:
+            posting_list.extend(index.get(term, ()))
+        return posting_list
 
-    def build_inverted_list(self, documents, stopword_filtering=False, stemming=False):
-        self.docs = documents
-        self.inverted_index = {}
-        for doc_id, document in enumerate(documents):
+    def index_documents(self, documents, stopword_filtering=False, stemming=False, start=0) -> dict:
+        """
+        Builds an in-memory inverted index. The documents may also be a generator, they are indexed as they arrive.
+        :param documents: Documents to index
+        :param start: Position of the first document in the collection
+        :return: Dictionary from term to posting list
+        """
+        index = {}
+        for doc_id, document in enumerate(documents, start):
             terms = self.document_to_representation(document, stopword_filtering, stemming)
             for term in terms:
-                if term not in self.inverted_index:
-                    self.inverted_index[term] = set()
-                self.inverted_index[term].add(doc_id)
+                # Documents are visited in id order, so appending keeps every posting list sorted.
+                posting_list = index.get(term)
+                if posting_list is None:
+                    posting_list = index[term] = postings.empty()
+                posting_list.append(doc_id)
+        return index
+
+    def build_inverted_list(self, documents, stopword_filtering=False, stemming=False):
+        """
+        Builds the inverted index. The documents may also be a generator, they are indexed as they arrive.
+        """
+        self.docs = []
+
+        def collect(documents):
+            for document in documents:
+                self.docs.append(document)
+                yield document
+
+        self.inverted_index = self.index_documents(collect(documents), stopword_filtering, stemming)
+        self.is_ready = True
+
+    def sync_segments(self, collection, stopword_filtering=False, stemming=False):
+        """
+        Indexes the segments that were added to the collection since the base index was built (see segments.py).
+        """
+        self.segment_indexes = [index for _, index in self._sync_segment_indexes(
+            collection, (stopword_filtering, stemming),
+            lambda segment: self.index_documents(segment.documents, stopword_filtering, stemming, segment.start),
+        )]
+
+    def save_inverted_list(self, file_path: str, fingerprint: bytes, stopword_filtering=False, stemming=False):
+        """
+        Saves the inverted index to a compressed binary file (see inverted_index.py).
+        :param file_path: Path of the index file
+        :param fingerprint: Fingerprint of the collection file the index was built from
+        :param stopword_filtering: Whether the index was built with stop word filtering
+        :param stemming: Whether the index was built with stemming
+        """
+        inverted_index.write_inverted_index(file_path, self.inverted_index, fingerprint, stopword_filtering, stemming)
+
+    def load_inverted_list(self, documents, file_path: str, fingerprint: bytes, stopword_filtering=False,
+                           stemming=False) -> bool:
+        """
+        Memory-maps a previously saved inverted index, if it matches the collection and the preprocessing options.
+        :param documents: Document collection the index belongs to
+        :param file_path: Path of the index file
+        :param fingerprint: Fingerprint of the current collection file
+        :param stopword_filtering: Whether stop word filtering is required
+        :param stemming: Whether stemming is required
+        :return: True if the index could be used, False if it has to be rebuilt
+        """
+        try:
+            index_file = inverted_index.InvertedIndexFile(file_path)
+        except (FileNotFoundError, ValueError):
+            return False
+        if (index_file.fingerprint != fingerprint or index_file.stopword_filtering != stopword_filtering
+                or index_file.stemming != stemming):
+            index_file.close()
+            return False
+        self.docs = documents
+        self.inverted_index = index_file
         self.is_ready = True
+        return True
+
+    def load_or_build_inverted_list(self, documents, file_path: str, fingerprint: bytes, stopword_filtering=False,
+                                    stemming=False):
+        """
+        Uses the saved inverted index if it is still up to date, otherwise builds and saves a new one.
+        :param documents: Document collection to index
+        :param file_path: Path of the index file
+        :param fingerprint: Fingerprint of the current collection file
+        :param stopword_filtering: Controls, whether the documents should first be freed of stopwords
+        :param stemming: Controls, whether stemming is used on the documents' terms
+        """
+        if self.load_inverted_list(documents, file_path, fingerprint, stopword_filtering, stemming):
+            return
+        self.build_inverted_list(documents, stopword_filtering, stemming)
+        self.save_inverted_list(file_path, fingerprint, stopword_filtering, stemming)
 
     def __str__(self):
         return 'Boolean Model (Inverted Index)'
 
+def md5_hash(term: str) -> tuple[int, int]:
+    """
+    Original hash scheme: the full MD5 digest, with the D bit positions following each other (step 1).
+    """
+    return int(hashlib.md5(term.encode('utf-8')).hexdigest(), 16), 1
+
+
+def _mix32(value: int) -> int:
+    """
+    Finalizer of MurmurHash3: spreads every input bit over all 32 output bits.
+    """
+    value ^= value >> 16
+    value = (value * 0x85EBCA6B) & 0xFFFFFFFF
+    value ^= value >> 13
+    value = (value * 0xC2B2AE35) & 0xFFFFFFFF
+    return value ^ (value >> 16)
+
+
+def crc32_double_hash(term: str) -> tuple[int, int]:
+    """
+    Cheap checksums (non-cryptographic, computed in C) used for double hashing: CRC32 for the first position and the
+    mixed Adler-32 checksum for the step. A second CRC32 with another seed would not do, since CRC is linear: it only
+    differs from the first by a constant that depends on the term length. The step is odd, so the D positions are
+    distinct whenever F is a power of two.
+    """
+    data = term.encode('utf-8')
+    return zlib.crc32(data), _mix32(zlib.adler32(data)) | 1
+
+
+def blake2b_double_hash(term: str) -> tuple[int, int]:
+    """
+    64 bit BLAKE2b digest, split into two 32 bit halves for double hashing.
+    """
+    value = int.from_bytes(hashlib.blake2b(term.encode('utf-8'), digest_size=8).digest(), 'little')
+    return value & 0xFFFFFFFF, (value >> 32) | 1
+
+
+# Available hash schemes for signatures. Each returns (h1, h2); bit i of a term is (h1 + i * h2) mod F. The hashes of
+# a term are computed once per model (see SignatureBasedBooleanModel._term_signature()), so the default is the scheme
+# with the best mixed bits rather than the cheapest one.
+HASH_SCHEMES = {
+    "md5": md5_hash,
+    "crc32": crc32_double_hash,
+    "blake2b": blake2b_double_hash,
+}
+
+
+# Stored with saved signatures; incremented when the hash schemes change, so that older files are rebuilt.
+SIGNATURE_FORMAT_VERSION = 2
+
+
 class SignatureBasedBooleanModel(RetrievalModel):
-    def __init__(self, F=64, D=4):
+    def __init__(self, F=64, D=4, stop_word_filter=None, bit_sliced=False, hash_scheme="blake2b"):
 
         self.F = F
         self.D = D
+        self.hash_scheme = hash_scheme
+        self._hash_function = HASH_SCHEMES[hash_scheme]
+        # Signature bits of each term seen since the last build, so every distinct term is only hashed once.
+        self._term_signatures = {}
+        self.words = (F + 63) // 64  # Number of 64 bit words per signature
         self.documents = []
+        # All document signatures, one row of uint64 words per document (in the order of self.documents).
+        self.signature_matrix = None
+        # Bit-sliced organization: one bitmap over all documents per signature bit (F rows of uint64 words).
+        self.bit_sliced = bit_sliced
+        self.signature_slices = None
+        self.is_ready = False
+        self.base_count = 0  # Number of documents covered by signature_matrix / signature_slices.
+        # Signatures of added segments: (first position, number of documents, signatures in the current layout).
+        self.segment_signatures = []
+        # Preprocessing options of the current signatures and the exact term sets of verified documents.
+        self.stopword_filtering = False
+        self.stemming = False
+        self._document_term_sets = {}
+        self.stop_word_filter = stop_word_filter
 
-    def _hash_function(self, term: str) -> int:
+    def _term_signature(self, term: str) -> int:
         """
-        Hash function to convert a term into an integer.
+        Returns the signature of a single term as an integer bit mask.
         """
-        return int(hashlib.md5(term.encode('utf-8')).hexdigest(), 16)
+        term_signature = self._term_signatures.get(term)
+        if term_signature is None:
+            h1, h2 = self._hash_function(term)
+            term_signature = 0
+            for i in range(self.D):
+                term_signature |= 1 << ((h1 + i * h2) % self.F)
+            self._term_signatures[term] = term_signature
+        return term_signature
 
-    def _create_signature(self, terms):
+    def _create_signature(self, terms) -> np.ndarray:
         """
-        Creates a signature bitarray for the given terms.
+        Creates a signature for the given terms, packed into an array of uint64 words.
         """
-        signature = bitarray(self.F)
-        signature.setall(0)
+        signature = 0
+        for term in set(terms):
+            signature |= self._term_signature(term)
+        return np.array(
+            [(signature >> (64 * word)) & 0xFFFFFFFFFFFFFFFF for word in range(self.words)], dtype=np.uint64
+        )
 
-        for term in terms:
-            hash_value = self._hash_function(term)
-            for i in range(self.D):
-                pos = (hash_value + i) % self.F
-                signature[pos] = 1
-        return signature
+    def document_terms(self, document: Document, stopword_filtering=False, stemming=False) -> list[str]:
+        """
+        Returns the (lowercased, optionally filtered and stemmed) terms a document's signature is built from.
+        """
+        terms = document.terms
+        terms = [term.lower() for term in terms]  # Convert all terms to lowercase
+
+        if stopword_filtering:
+            terms = self._remove_stop_words(terms, document)
+        if stemming:
+            terms = porter.default_stemmer.stem_many(terms)
+        return terms
 
     def document_to_representation(
         self, document: Document, stopword_filtering=False, stemming=False
     ):
-        terms = document.terms
-        terms = [term.lower() for term in terms]  # Convert all terms to lowercase
+        return self._create_signature(self.document_terms(document, stopword_filtering, stemming))
 
-        if stopword_filtering:
-            terms = [term for term in terms if term not in document.filtered_terms]
+    def build_signature_matrix(self, documents, stopword_filtering=False, stemming=False):
+        """
+        Creates the signatures of all documents and packs them into one contiguous matrix.
+        :param documents: Document collection
+        :param stopword_filtering: Controls, whether the documents should first be freed of stopwords
+        :param stemming: Controls, whether stemming is used on the documents' terms
+        """
+        self.documents = document_sequence(documents)
+        self.stopword_filtering, self.stemming = stopword_filtering, stemming
+        self._document_term_sets = {}
+        self._term_signatures = {}
+        signatures = self._build_signatures(self.documents, stopword_filtering, stemming)
+        if self.bit_sliced:
+            self.signature_slices, self.signature_matrix = signatures, None
+        else:
+            self.signature_matrix, self.signature_slices = signatures, None
+        self.base_count = len(self.documents)
+        self.segment_signatures = []
+        self.is_ready = True
 
-        signature = self._create_signature(terms)
-        self.documents.append((document, signature))
-        return signature
+    def _build_signatures(self, documents, stopword_filtering=False, stemming=False) -> np.ndarray:
+        """
+        Creates the signatures of documents in the model's storage layout (rows or bit slices).
+        """
+        signature_matrix = np.zeros((len(documents), self.words), dtype=np.uint64)
+        for position, document in enumerate(documents):
+            signature_matrix[position] = self.document_to_representation(document, stopword_filtering, stemming)
+        return self._slice_signatures(signature_matrix) if self.bit_sliced else signature_matrix
+
+    def sync_segments(self, collection, stopword_filtering=False, stemming=False):
+        """
+        Creates the signatures of the segments that were added to the collection since the base signatures were built
+        (see segments.py). Afterwards, positions refer to the whole collection.
+        """
+        segment_indexes = self._sync_segment_indexes(
+            collection, (stopword_filtering, stemming),
+            lambda segment: self._build_signatures(segment.documents, stopword_filtering, stemming),
+        )
+        self.segment_signatures = [(segment.start, len(segment), signatures) for segment, signatures in segment_indexes]
+        if isinstance(collection, segments.SegmentedCollection):
+            self.documents = collection
+
+    def _signature_blocks(self) -> list[tuple]:
+        base_signatures = self.signature_slices if self.bit_sliced else self.signature_matrix
+        return [(0, self.base_count, base_signatures)] + self.segment_signatures
+
+    @staticmethod
+    def _unpack_bits(words: np.ndarray) -> np.ndarray:
+        """
+        Unpacks uint64 words along the last axis into single bits, lowest bit first.
+        """
+        return np.unpackbits(words.astype("<u8", copy=False).view(np.uint8), axis=-1, bitorder="little")
+
+    def _slice_signatures(self, signature_matrix: np.ndarray) -> np.ndarray:
+        """
+        Transposes a row-per-document signature matrix into bit slices.
+        :param signature_matrix: Matrix with one row of uint64 words per document
+        :return: Matrix with one row per signature bit, where bit d of a row is set if document d has that bit set
+        """
+        bits = self._unpack_bits(signature_matrix)[:, :self.F]  # documents x F
+        slice_words = (len(signature_matrix) + 63) // 64
+        slices = np.zeros((self.F, slice_words * 64), dtype=np.uint8)
+        slices[:, :len(signature_matrix)] = bits.T
+        return np.packbits(slices, axis=1, bitorder="little").view("<u8").astype(np.uint64, copy=False)
+
+    def _sliced_candidates(self, signature_slices: np.ndarray, count: int, query_signature: np.ndarray,
+                           combine) -> np.ndarray:
+        """
+        Combines only the bit slices of the bits that are set in the query signature.
+        :param signature_slices: Bit slices of count documents
+        :param count: Number of documents
+        :param query_signature: Signature of the query terms
+        :param combine: np.bitwise_and for conjunctive matching, np.bitwise_or for disjunctive matching
+        :return: Sorted positions of the matching documents within the slices
+        """
+        query_bits = np.flatnonzero(self._unpack_bits(query_signature))
+        if query_bits.size == 0:
+            return np.arange(count) if combine is np.bitwise_and else np.zeros(0, dtype=np.int64)
+        combined = combine.reduce(signature_slices[query_bits], axis=0)
+        matches = self._unpack_bits(combined)[:count]
+        return np.flatnonzero(matches)
+
+    def _candidates(self, query_signature: np.ndarray, combine):
+        """
+        Matches a query signature against the base signatures and those of all added segments.
+        :param query_signature: Signature of the query terms
+        :param combine: np.bitwise_and for conjunctive matching, np.bitwise_or for disjunctive matching
+        :return: Sorted positions of the matching documents in self.documents
+        """
+        positions = []
+        for start, count, signatures in self._signature_blocks():
+            if self.bit_sliced:
+                matches = self._sliced_candidates(signatures, count, query_signature, combine)
+            elif combine is np.bitwise_and:
+                matches = np.flatnonzero(((signatures & query_signature) == query_signature).all(axis=1))
+            else:
+                matches = np.flatnonzero((signatures & query_signature).any(axis=1))
+            positions.extend((matches + start).tolist())
+        return postings.from_sorted(positions)
+
+    def save_signatures(self, file_path: str, fingerprint: bytes, stopword_filtering=False, stemming=False):
+        """
+        Saves the signatures (in the current storage layout) to a NumPy .npz file.
+        :param file_path: Path of the signature file
+        :param fingerprint: Fingerprint of the collection file the signatures were built from
+        :param stopword_filtering: Whether the signatures were built with stop word filtering
+        :param stemming: Whether the signatures were built with stemming
+        """
+        signatures = self.signature_slices if self.bit_sliced else self.signature_matrix
+        with open(file_path, "wb") as file:
+            np.savez(file, signatures=signatures, fingerprint=np.frombuffer(fingerprint, dtype=np.uint8),
+                     parameters=self._signature_parameters(stopword_filtering, stemming))
+
+    def load_signatures(self, documents, file_path: str, fingerprint: bytes, stopword_filtering=False,
+                        stemming=False) -> bool:
+        """
+        Loads saved signatures if they match the collection, the preprocessing options and the model's parameters.
+        :param documents: Document collection the signatures belong to
+        :param file_path: Path of the signature file
+        :param fingerprint: Fingerprint of the current collection file
+        :param stopword_filtering: Whether stop word filtering is required
+        :param stemming: Whether stemming is required
+        :return: True if the signatures could be used, False if they have to be rebuilt
+        """
+        try:
+            with np.load(file_path) as saved:
+                if (saved["fingerprint"].tobytes() != fingerprint or not np.array_equal(
+                        saved["parameters"], self._signature_parameters(stopword_filtering, stemming, len(documents)))):
+                    return False
+                signatures = saved["signatures"]
+        except (FileNotFoundError, ValueError, KeyError):
+            return False
+        self.documents = document_sequence(documents)
+        self.stopword_filtering, self.stemming = stopword_filtering, stemming
+        self._document_term_sets = {}
+        if self.bit_sliced:
+            self.signature_slices, self.signature_matrix = signatures, None
+        else:
+            self.signature_matrix, self.signature_slices = signatures, None
+        self.base_count = len(self.documents)
+        self.segment_signatures = []
+        self.is_ready = True
+        return True
+
+    def load_or_build_signatures(self, documents, file_path: str, fingerprint: bytes, stopword_filtering=False,
+                                 stemming=False):
+        """
+        Uses the saved signatures if they are still up to date, otherwise builds and saves new ones.
+        """
+        if self.load_signatures(documents, file_path, fingerprint, stopword_filtering, stemming):
+            return
+        self.build_signature_matrix(documents, stopword_filtering, stemming)
+        self.save_signatures(file_path, fingerprint, stopword_filtering, stemming)
+
+    def _signature_parameters(self, stopword_filtering, stemming, document_count=None) -> np.ndarray:
+        if document_count is None:
+            document_count = self.base_count
+        return np.array([SIGNATURE_FORMAT_VERSION, self.F, self.D, list(HASH_SCHEMES).index(self.hash_scheme),
+                         self.bit_sliced, stopword_filtering, stemming, document_count], dtype=np.int64)
 
     def query_to_representation(self, query: str):
         terms = query.lower().split()
@@ -192,70 +753,525 @@ class SignatureBasedBooleanModel(RetrievalModel):
         Matches the query and document presentation based on signature.
         Returns 1.0 if the query signature is a subset of the document signature, 0.0 otherwise.
         """
-        if (document_representation & query_representation) == query_representation:
+        if np.array_equal(document_representation & query_representation, query_representation):
             return 1.0
         return 0.0
 
+    def matching_documents(self, terms) -> list[int]:
+        """
+        Finds the documents whose signature contains the combined signature of all given terms. All signatures are
+        compared at once with vectorized bitwise operations on the signature matrix.
+        :param terms: Query terms
+        :return: Sorted positions of the matching documents in self.documents
+        """
+        return self._candidates(self._create_signature(terms), np.bitwise_and)
+
+    def document_term_set(self, position: int) -> frozenset:
+        """
+        Returns the exact set of terms of a document, computed with the same preprocessing as its signature. The sets
+        are only built for documents that have to be verified and are kept afterwards.
+        :param position: Position of the document in self.documents
+        :return: Set of the document's terms
+        """
+        term_set = self._document_term_sets.get(position)
+        if term_set is None:
+            term_set = frozenset(self.document_terms(self.documents[position], self.stopword_filtering, self.stemming))
+            self._document_term_sets[position] = term_set
+        return term_set
+
+    def verify(self, positions, query_representation) -> list[int]:
+        """
+        Removes false drops from the candidates of a signature search by matching the query against the exact term
+        sets of the candidate documents.
+        :param positions: Candidate positions in self.documents
+        :param query_representation: Compiled query (see query_parser.py)
+        :return: Positions of the documents that really match the query
+        """
+        return postings.from_sorted(
+            position for position in positions if query_representation.matches(self.document_term_set(position))
+        )
+
+    def documents_matching_any(self, terms) -> list[int]:
+        """
+        Finds the documents whose signature shares at least one bit with the combined signature of the given terms.
+        :param terms: Query terms
+        :return: Sorted positions of the matching documents in self.documents
+        """
+        return self._candidates(self._create_signature(terms), np.bitwise_or)
+
     def search(self, query: str, mode='and') -> list:
         """
         Search for documents matching the query.
         Supports 'and' and 'or' modes.
         """
-        query_representation = self.query_to_representation(query)
-        results = []
-
+        terms = query.lower().split()
         if mode == 'and':
-            for document, doc_representation in self.documents:
-                if self.match(doc_representation, query_representation):
-                    results.append(document)
+            positions = self.matching_documents(terms)
         elif mode == 'or':
-            for document, doc_representation in self.documents:
-                if (doc_representation & query_representation).count() > 0:
-                    results.append(document)
-
-        return results
+            positions = self.documents_matching_any(terms)
+        else:
+            positions = []
+        return [self.documents[position] for position in positions]
 
     def __str__(self):
+        if self.bit_sliced:
+            return "Boolean Model (Bit-Sliced Signatures)"
         return "Boolean Model (Signatures)"
 
 
 class VectorSpaceModel(RetrievalModel):
-    def __init__(self):
-        self.vectorizer = TfidfVectorizer()
-        self.document_vectors = None
+    def __init__(self, stop_word_filter=None):
+        self.index = None  # tfidf.TfidfIndex of the collection, built once per preprocessing variant.
         self.documents = None
+        self.document_rows = {}  # Maps document ids to rows of the index.
+        self.variant = None  # (stopword_filtering, stemming) the index was built with.
+        self.stop_word_filter = stop_word_filter
+        self.segment_indexes = []  # (first position, tfidf.TfidfIndex) of the segments added to the collection.
+
+    def build_inverted_list(self, docs, stopword_filtering=False, stemming=False, fingerprint=bytes(16)):
+        self.documents = list(docs)
+        self.index = tfidf.TfidfIndex.from_term_lists(
+            [self.document_to_representation(doc, stopword_filtering, stemming) for doc in docs], fingerprint
+        )
+        self.document_rows = {doc.document_id: row for row, doc in enumerate(docs)}
+        self.variant = (stopword_filtering, stemming)
+
+    def prepare(self, docs, stopword_filtering=False, stemming=False):
+        """
+        Builds the document vectors, unless they already exist for the given preprocessing options.
+        """
+        if self.variant != (stopword_filtering, stemming) or len(self.document_rows) != len(docs):
+            self.build_inverted_list(docs, stopword_filtering, stemming)
+
+    def load_or_build_index(self, docs, directory: str, fingerprint: bytes, stopword_filtering=False, stemming=False):
+        """
+        Loads the saved TF-IDF index if it was built from the current collection, otherwise builds and saves it.
+        :param docs: Document collection
+        :param directory: Directory of the saved index
+        :param fingerprint: Fingerprint of the current collection file
+        :param stopword_filtering: Controls, whether the documents should first be freed of stopwords
+        :param stemming: Controls, whether stemming is used on the documents' terms
+        """
+        if self.variant == (stopword_filtering, stemming) and self.index.fingerprint == fingerprint:
+            return
+        try:
+            index = tfidf.TfidfIndex.load(directory)
+        except (FileNotFoundError, ValueError):
+            index = None
+        if index is not None and index.fingerprint == fingerprint and index.document_count == len(docs):
+            self.documents = document_sequence(docs)
+            self.index = index
+            self.document_rows = {document_id: row for row, document_id in enumerate(document_ids(docs))}
+            self.variant = (stopword_filtering, stemming)
+            return
+        self.build_inverted_list(docs, stopword_filtering, stemming, fingerprint)
+        self.index.save(directory)
+
+    def query_vector(self, query_representation):
+        """
+        Weights the query terms (once per query) with the IDF values of the collection.
+        :return: Term ids and L2 normalized weights
+        """
+        return self.index.query_vector(query_representation)
 
-    def build_inverted_list(self, docs):
-        self.documents = [self.document_to_representation(doc) for doc in docs]
-        self.document_vectors = self.vectorizer.fit_transform(self.documents)
+    def score_collection(self, documents, query_representation, stopword_filtering=False, stemming=False):
+        """
+        Scores all documents with one sparse matrix-vector product of the cached document vectors and the query
+        vector. Both are L2 normalized, so the products are the cosine similarities.
+        """
+        self.prepare(documents, stopword_filtering, stemming)
+        return self.index.score(*self.query_vector(query_representation))
 
     def document_to_representation(self, document: Document, stopword_filtering=False, stemming=False):
-        tokens = document.raw_text.split()
-        if stopword_filtering:
-            tokens = [t for t in tokens if t not in document.filtered_terms]
-        if stemming:
-            tokens = [stem_term(t) for t in tokens]
-        return ' '.join(tokens)
+        """
+        Converts a document into the terms its vector is built from, using the collection's own preprocessing
+        (cleanup.py and porter.py).
+        :return: List of terms
+        """
+        return self._document_terms(document, stopword_filtering, stemming)
 
     def query_to_representation(self, query, stemming=False):
-        tokens = query.split()
+        terms = [cleanup.remove_symbols(term).lower() for term in query.split()]
+        terms = [term for term in terms if term]
         if stemming:
-            tokens = [stem_term(t) for t in tokens]
-        return ' '.join(tokens)
+            terms = porter.default_stemmer.stem_many(terms)
+        return terms
 
     def match(self, doc_rep, query_rep):
-        q_vector = self.vectorizer.transform([query_rep])
-        d_vector = self.vectorizer.transform([doc_rep])
-        return cosine_similarity(q_vector, d_vector).flatten()[0]
+        """
+        Cosine similarity of a document and a query. The document can be given as list of terms or, to avoid
+        vectorizing it again, as its document id; the query as list of terms or as query vector.
+        """
+        if isinstance(doc_rep, list):
+            doc_ids, doc_weights = self.index.query_vector(doc_rep)
+        else:
+            doc_ids, doc_weights = self.index.document_vector(self.document_rows[doc_rep])
+        query_ids, query_weights = self.query_vector(query_rep) if isinstance(query_rep, list) else query_rep
+        _, doc_positions, query_positions = np.intersect1d(doc_ids, query_ids, assume_unique=True,
+                                                           return_indices=True)
+        return float(np.dot(doc_weights[doc_positions], query_weights[query_positions]))
+
+    def term_at_a_time_search(self, query_term_ids, query_weights, k: int, exact=True, tolerance=0.1, index=None):
+        """
+        Term-at-a-time evaluation with score accumulators after Buckley & Lewit. Query terms are processed in the order
+        of their highest possible contribution. Processing stops early once the remaining terms cannot change the set
+        of the k best documents any more (exact mode: k-th best score > (k+1)-th best score + remaining upper bound),
+        or once they could add at most tolerance times the k-th best score (approximate mode).
+        In exact mode, the scores of the k best documents are completed with the remaining terms afterwards.
+        :param query_term_ids: Term ids of the query vector
+        :param query_weights: Weights of the query vector
+        :param k: Number of documents that are needed
+        :param exact: Controls, whether the k best documents and their scores are guaranteed to be exact
+        :param tolerance: Stopping tolerance of the approximate mode
+        :param index: TfidfIndex to search, defaults to the index of the base collection
+        :return: Tuple of the accumulated scores of all documents, the sorted positions of the documents that were
+        touched and a dict with statistics
+        """
+        index = self.index if index is None else index
+        scores = np.zeros(index.document_count)
+        if k <= 0:
+            statistics = self._empty_statistics(len(query_term_ids), index.document_count)
+            return scores, np.zeros(0, dtype=np.int64), statistics
+        touched = np.zeros(index.document_count, dtype=bool)
+        bounds = index.term_max_weights[query_term_ids] * query_weights
+        order = np.argsort(-bounds, kind="stable")
+        remaining_bounds = np.concatenate((np.cumsum(bounds[order][::-1])[::-1][1:], [0.0]))
+        processed = 0
+        postings_read = 0
+
+        for processed, query_position in enumerate(order, start=1):
+            term_id = query_term_ids[query_position]
+            start, end = index.term_pointers[term_id], index.term_pointers[term_id + 1]
+            documents = index.term_documents[start:end]
+            scores[documents] += query_weights[query_position] * index.term_weights[start:end]
+            touched[documents] = True
+            postings_read += end - start
+
+            remaining = remaining_bounds[processed - 1]
+            if remaining == 0.0:
+                break
+            candidate_scores = scores[touched]
+            if len(candidate_scores) < k:
+                continue
+            kth_score, next_score = self._kth_and_next(candidate_scores, k)
+            if exact and kth_score > next_score + remaining:
+                self._complete_scores(scores, order[processed:], query_term_ids, query_weights, touched, k, index)
+                break
+            if not exact and remaining <= tolerance * kth_score:
+                break
+
+        statistics = {
+            "query_terms": len(order),
+            "terms_processed": processed,
+            "postings_read": int(postings_read),
+            "accumulators": int(touched.sum()),
+            "documents": index.document_count,
+        }
+        return scores, np.flatnonzero(touched), statistics
+
+    def sync_segments(self, collection, stopword_filtering=False, stemming=False):
+        """
+        Builds the TF-IDF indexes of the segments that were added to the collection since the base index was built
+        (see segments.py). The document frequencies of a segment's index include the base collection, the base index
+        itself is not changed until the collection is rebuilt.
+        """
+        self.segment_indexes = [(segment.start, index) for segment, index in self._sync_segment_indexes(
+            collection, (stopword_filtering, stemming, self.index.fingerprint),
+            lambda segment: tfidf.TfidfIndex.from_term_lists(
+                [self.document_to_representation(doc, stopword_filtering, stemming) for doc in segment.documents],
+                reference=self.index,
+            ),
+        )]
+
+    def segmented_search(self, query_representation, k: int, exact=True, tolerance=0.1, deleted=()):
+        """
+        Term-at-a-time search (see term_at_a_time_search()) over the base index and the indexes of all added segments.
+        The query is weighted once with the document frequencies of the whole collection. Every index is searched for
+        its k best documents plus the number of its deleted documents, so the k best remaining documents are exact.
+        :param query_representation: Preprocessed query terms
+        :param k: Number of documents that are needed
+        :param exact: Controls, whether the k best documents and their scores are guaranteed to be exact
+        :param tolerance: Stopping tolerance of the approximate mode
+        :param deleted: Sorted positions of deleted documents
+        :return: Tuple of the accumulated scores of all documents, the sorted positions of the documents that were
+        touched and a dict with statistics
+        """
+        if k <= 0:
+            document_count = self.index.document_count + sum(index.document_count for _, index in self.segment_indexes)
+            return np.zeros(document_count), np.zeros(0, dtype=np.int64), self._empty_statistics(0, document_count)
+        if not self.segment_indexes and not len(deleted):
+            return self.term_at_a_time_search(*self.query_vector(query_representation), k, exact, tolerance)
+
+        blocks = [(0, self.index)] + self.segment_indexes
+        document_count = sum(index.document_count for _, index in blocks)
+        counts = Counter(query_representation)
+        frequencies = {term: sum(index.document_frequency(term) for _, index in blocks) for term in counts}
+        counts = {term: count for term, count in counts.items() if frequencies[term]}
+        weights = {
+            term: count * tfidf.inverse_document_frequency(document_count, frequencies[term])
+            for term, count in counts.items()
+        }
+        norm = np.sqrt(sum(weight ** 2 for weight in weights.values()))
+
+        scores = np.zeros(document_count)
+        candidates = []
+        statistics = {"query_terms": len(weights), "terms_processed": 0, "postings_read": 0, "accumulators": 0,
+                      "documents": document_count, "segments": len(blocks)}
+        deleted = np.asarray(deleted, dtype=np.int64)
+        for start, index in blocks:
+            terms = [term for term in weights if term in index.vocabulary]
+            if not terms:
+                continue
+            term_ids = np.array([index.vocabulary[term] for term in terms], dtype=np.int64)
+            term_weights = np.array([weights[term] / norm for term in terms])
+            end = start + index.document_count
+            deleted_count = int(np.searchsorted(deleted, end) - np.searchsorted(deleted, start))
+            block_scores, block_candidates, block_statistics = self.term_at_a_time_search(
+                term_ids, term_weights, k + deleted_count, exact, tolerance, index
+            )
+            scores[start:end] = block_scores
+            candidates.append(block_candidates + start)
+            for name in ("terms_processed", "postings_read", "accumulators"):
+                statistics[name] += block_statistics[name]
+        candidates = np.concatenate(candidates) if candidates else np.zeros(0, dtype=np.int64)
+        return scores, candidates, statistics
+
+    @staticmethod
+    def _empty_statistics(query_terms: int, document_count: int) -> dict:
+        """
+        Statistics of a search that did not process any query term (e. g. because no documents are needed).
+        """
+        return {"query_terms": query_terms, "terms_processed": 0, "postings_read": 0, "accumulators": 0,
+                "documents": document_count}
+
+    @staticmethod
+    def _kth_and_next(candidate_scores: np.ndarray, k: int) -> tuple[float, float]:
+        """
+        Returns the k-th and (k+1)-th highest score. Documents without accumulator count as score 0.
+        """
+        if len(candidate_scores) <= k:
+            return float(np.min(candidate_scores)), 0.0
+        partitioned = np.partition(candidate_scores, len(candidate_scores) - k - 1)
+        next_score = partitioned[len(candidate_scores) - k - 1]
+        kth_score = np.min(partitioned[len(candidate_scores) - k:])
+        return float(kth_score), float(next_score)
+
+    def _complete_scores(self, scores, remaining_order, query_term_ids, query_weights, touched, k: int, index=None):
+        """
+        Adds the contributions of the unprocessed query terms to the k best documents only.
+        """
+        index = self.index if index is None else index
+        candidates = np.flatnonzero(touched)
+        best = np.sort(candidates[np.argpartition(-scores[candidates], k - 1)[:k]])
+        for query_position in remaining_order:
+            term_id = query_term_ids[query_position]
+            start, end = index.term_pointers[term_id], index.term_pointers[term_id + 1]
+            documents = index.term_documents[start:end]
+            positions = np.searchsorted(documents, best)
+            found = positions < len(documents)
+            found[found] = documents[positions[found]] == best[found]
+            scores[best[found]] += query_weights[query_position] * index.term_weights[start + positions[found]]
 
     def __str__(self):
         return "Vector Space Model"
 
 
 class FuzzySetModel(RetrievalModel):
-    # TODO: Implement all abstract methods. (PR04)
-    def __init__(self):
-        raise NotImplementedError()  # TODO: Remove this line and implement the function.
+    """
+    Fuzzy set model after Ogawa, Morita & Kobayashi. The correlation of two terms is c(i, j) = n(i, j) / (n(i) + n(j)
+    - n(i, j)), where n counts the documents containing the terms. A document d belongs to the fuzzy set of term i with
+    the degree mu(i, d) = 1 - prod over the terms j of d of (1 - c(i, j)). Queries are evaluated with the algebraic
+    product (AND), the algebraic sum (OR) and the complement (NOT).
+    """
+
+    # Correlations are capped just below 1, so that log(1 - c) stays finite.
+    MAX_CORRELATION = 1 - 1e-9
+
+    def __init__(self, stop_word_filter=None):
+        self.stop_word_filter = stop_word_filter
+        self.documents = None
+        self.variant = None  # (stopword_filtering, stemming) the matrices were built with.
+        self.fingerprint = bytes(16)
+        self.vocabulary = {}
+        # Term-term correlation matrix in CSR form: row i holds the correlations of term i.
+        self.correlation_pointers = self.correlation_terms = self.correlation_values = None
+        # Membership degrees in CSC form: column i holds mu(i, d) for all documents with a non-zero degree.
+        self.membership_pointers = self.membership_documents = self.membership_degrees = None
+
+    def document_to_representation(self, document: Document, stopword_filtering=False, stemming=False):
+        return self._document_terms(document, stopword_filtering, stemming)
+
+    def query_to_representation(self, query: str, stemming=False):
+        """
+        Compiles the query into a syntax tree (see query_parser.py).
+        :return: Root node of the query, or None for an empty query
+        """
+        query_representation = query_parser.compile_query(query)
+        if stemming and query_representation is not None:
+            query_representation = query_representation.map_terms(porter.default_stemmer.stem)
+        return query_representation
+
+    def build(self, docs, stopword_filtering=False, stemming=False, fingerprint=bytes(16)):
+        """
+        Computes the correlation matrix from sparse document-term co-occurrence counts (A^T A) and the membership
+        degrees of all documents (1 - exp(A log(1 - C))), both with sparse matrix products.
+        :param docs: Document collection
+        :param stopword_filtering: Controls, whether the documents should first be freed of stopwords
+        :param stemming: Controls, whether stemming is used on the documents' terms
+        :param fingerprint: Fingerprint of the collection file
+        """
+        from scipy import sparse  # Only needed for building, not for loading or searching.
+
+        self.documents = list(docs)
+        term_sets = [set(self.document_to_representation(doc, stopword_filtering, stemming)) for doc in docs]
+        terms = sorted(set().union(*term_sets)) if term_sets else []
+        self.vocabulary = {term: term_id for term_id, term in enumerate(terms)}
+        rows = np.repeat(np.arange(len(term_sets)), [len(term_set) for term_set in term_sets])
+        columns = np.fromiter((self.vocabulary[term] for term_set in term_sets for term in term_set), dtype=np.int64,
+                              count=len(rows))
+        incidence = sparse.csr_matrix((np.ones(len(rows)), (rows, columns)), shape=(len(term_sets), len(terms)))
+
+        co_occurrences = (incidence.T @ incidence).tocoo()
+        document_frequencies = np.asarray(incidence.sum(axis=0)).ravel()
+        correlation_values = co_occurrences.data / (
+            document_frequencies[co_occurrences.row] + document_frequencies[co_occurrences.col] - co_occurrences.data
+        )
+        correlation = sparse.csr_matrix(
+            (np.minimum(correlation_values, self.MAX_CORRELATION), (co_occurrences.row, co_occurrences.col)),
+            shape=(len(terms), len(terms)),
+        )
+        correlation.sort_indices()
+
+        log_complement = correlation.copy()
+        log_complement.data = np.log1p(-log_complement.data)
+        membership = (incidence @ log_complement).tocsc()
+        membership.data = -np.expm1(membership.data)
+        # Documents that contain a term belong to its fuzzy set completely.
+        membership = membership.maximum(incidence).tocsc()
+        membership.sort_indices()
+
+        self.correlation_pointers, self.correlation_terms, self.correlation_values = (
+            correlation.indptr, correlation.indices, correlation.data)
+        self.membership_pointers, self.membership_documents, self.membership_degrees = (
+            membership.indptr, membership.indices, membership.data)
+        self.variant = (stopword_filtering, stemming)
+        self.fingerprint = fingerprint
+
+    def prepare(self, docs, stopword_filtering=False, stemming=False):
+        """
+        Builds the matrices, unless they already exist for the given preprocessing options.
+        """
+        if self.variant != (stopword_filtering, stemming) or len(self.documents) != len(docs):
+            self.build(docs, stopword_filtering, stemming)
+
+    def save(self, directory: str):
+        """
+        Saves vocabulary, correlation matrix and membership degrees as .npy files into a directory.
+        """
+        os.makedirs(directory, exist_ok=True)
+        terms = sorted(self.vocabulary, key=self.vocabulary.get)
+        arrays = {
+            "terms": np.array(terms, dtype=str),
+            "correlation_pointers": self.correlation_pointers,
+            "correlation_terms": self.correlation_terms,
+            "correlation_values": self.correlation_values,
+            "membership_pointers": self.membership_pointers,
+            "membership_documents": self.membership_documents,
+            "membership_degrees": self.membership_degrees,
+            "fingerprint": np.frombuffer(self.fingerprint, dtype=np.uint8),
+        }
+        for name, values in arrays.items():
+            np.save(os.path.join(directory, name + ".npy"), values)
+
+    def load_or_build(self, docs, directory: str, fingerprint: bytes, stopword_filtering=False, stemming=False):
+        """
+        Loads the saved matrices if they were built from the current collection, otherwise builds and saves them.
+        :param docs: Document collection
+        :param directory: Directory of the saved matrices
+        :param fingerprint: Fingerprint of the current collection file
+        :param stopword_filtering: Controls, whether the documents should first be freed of stopwords
+        :param stemming: Controls, whether stemming is used on the documents' terms
+        """
+        if self.variant == (stopword_filtering, stemming) and self.fingerprint == fingerprint:
+            return
+        try:
+            saved_fingerprint = np.load(os.path.join(directory, "fingerprint.npy")).tobytes()
+        except (FileNotFoundError, ValueError):
+            saved_fingerprint = None
+        if saved_fingerprint == fingerprint:
+            def load(name):
+                return np.load(os.path.join(directory, name + ".npy"), mmap_mode="r")
+
+            self.documents = document_sequence(docs)
+            self.vocabulary = {term: term_id for term_id, term in enumerate(np.load(
+                os.path.join(directory, "terms.npy")).tolist())}
+            self.correlation_pointers, self.correlation_terms, self.correlation_values = (
+                load("correlation_pointers"), load("correlation_terms"), load("correlation_values"))
+            self.membership_pointers, self.membership_documents, self.membership_degrees = (
+                load("membership_pointers"), load("membership_documents"), load("membership_degrees"))
+            self.variant = (stopword_filtering, stemming)
+            self.fingerprint = fingerprint
+            return
+        self.build(docs, stopword_filtering, stemming, fingerprint)
+        self.save(directory)
+
+    def correlation(self, term_i: str, term_j: str) -> float:
+        """
+        Returns the correlation c(i, j) of two terms of the collection.
+        """
+        i, j = self.vocabulary.get(term_i), self.vocabulary.get(term_j)
+        if i is None or j is None:
+            return 0.0
+        start, end = self.correlation_pointers[i], self.correlation_pointers[i + 1]
+        position = start + np.searchsorted(self.correlation_terms[start:end], j)
+        if position < end and self.correlation_terms[position] == j:
+            return float(self.correlation_values[position])
+        return 0.0
+
+    def membership(self, term: str) -> np.ndarray:
+        """
+        Returns the membership degrees of all documents in the fuzzy set of a term.
+        """
+        degrees = np.zeros(len(self.documents))
+        term_id = self.vocabulary.get(term)
+        if term_id is not None:
+            start, end = self.membership_pointers[term_id], self.membership_pointers[term_id + 1]
+            degrees[self.membership_documents[start:end]] = self.membership_degrees[start:end]
+        return degrees
+
+    def evaluate(self, query_representation) -> np.ndarray:
+        """
+        Computes the membership degree of every document in the fuzzy set of a query.
+        :param query_representation: Query node (see query_parser.py)
+        :return: Degrees of all documents
+        """
+        if isinstance(query_representation, query_parser.Term):
+            return self.membership(query_representation.value)
+        if isinstance(query_representation, query_parser.Not):
+            return 1.0 - self.evaluate(query_representation.child)
+        degrees = [self.evaluate(child) for child in query_representation.children]
+        if isinstance(query_representation, query_parser.And):
+            return np.prod(degrees, axis=0)
+        return 1.0 - np.prod([1.0 - child_degrees for child_degrees in degrees], axis=0)
+
+    def score_collection(self, documents, query_representation, stopword_filtering=False, stemming=False):
+        """
+        Evaluates the query for all documents at once.
+        """
+        self.prepare(documents, stopword_filtering, stemming)
+        if query_representation is None:
+            return np.zeros(len(self.documents))
+        return self.evaluate(query_representation)
+
+    def match(self, document_representation, query_representation) -> float:
+        """
+        Membership degree of one document in the fuzzy set of the query.
+        :param document_representation: Document id (position in the collection)
+        :param query_representation: Query node (see query_parser.py)
+        """
+        if query_representation is None:
+            return 0.0
+        return float(self.evaluate(query_representation)[document_representation])
 
     def __str__(self):
         return "Fuzzy Set Model"
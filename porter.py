@@ -1,22 +1,61 @@
 # Contains all functions related to the porter stemming algorithm.
 
+from collections import OrderedDict
+
 from document import Document
 
 
-def get_measure(term: str) -> int:
-    vowels = "aeiou"
-    consonants = ''.join(set('abcdefghijklmnopqrstuvwxyz') - set(vowels))
+# Character class lookup tables, built once at import time.
+_VOWELS = frozenset("aeiou")
+_CONSONANTS = frozenset("abcdefghijklmnopqrstuvwxyz") - _VOWELS
+# Maps each lowercase letter to "v" (vowel) or "c" (consonant). All other characters are kept, so after translating,
+# a "v" always marks a vowel and a "c" always marks a consonant.
+_CHARACTER_CLASSES = str.maketrans({letter: ("v" if letter in _VOWELS else "c") for letter in "abcdefghijklmnopqrstuvwxyz"})
+
+
+def _prefix_measures(term: str) -> list[int]:
+    """
+    Computes the consonant/vowel pattern of a term once and derives the measure of all of its prefixes from it.
+    :param term: Term to analyze
+    :return: List where the element at index k is the measure of term[:k]
+    """
+    pattern = term.translate(_CHARACTER_CLASSES)
+    measures = [0, 0]
     m = 0
-    current_is_vowel = term[0] in vowels
-    for letter in term[1:]:
-        if current_is_vowel and letter in consonants:
-            m += 1
-            current_is_vowel = False
-        elif not current_is_vowel and letter in vowels:
+    current_is_vowel = pattern[:1] == "v"
+    for letter_class in pattern[1:]:
+        if current_is_vowel:
+            if letter_class == "c":
+                m += 1
+                current_is_vowel = False
+        elif letter_class == "v":
             current_is_vowel = True
-    return m
+        measures.append(m)
+    return measures
 
 
+class _MeasuredTerm(object):
+    """
+    Keeps the prefix measures of the term that is currently being stemmed. Stemming mostly cuts suffixes off, so the
+    measures are computed on first use and only recomputed when a prefix is asked for that differs from the analyzed
+    term.
+    """
+    __slots__ = ("text", "measures")
+
+    def __init__(self, term: str):
+        self.text = term
+        self.measures = None
+
+    def measure(self, prefix: str) -> int:
+        if self.measures is None or not self.text.startswith(prefix):
+            self.text = prefix
+            self.measures = _prefix_measures(prefix)
+        return self.measures[len(prefix)]
+
+
+def get_measure(term: str) -> int:
+    return _prefix_measures(term)[len(term)]
+
 
 def condition_v(stem: str) -> bool:
     """
@@ -24,12 +63,7 @@ def condition_v(stem: str) -> bool:
     :param stem: Word stem to check
     :return: True if the condition *v* holds
     """
-    vowels = "aeiou"
-    for letter in stem:
-        if letter in vowels:
-            return True
-    return False
-
+    return not _VOWELS.isdisjoint(stem)
 
 
 def condition_d(stem: str) -> bool:
@@ -38,8 +72,7 @@ def condition_d(stem: str) -> bool:
     :param stem: Word stem to check
     :return: True if the condition *d holds
     """
-    consonants = ''.join(set('abcdefghijklmnopqrstuvwxyz') - set("aeiou"))
-    return len(stem) > 1 and stem[-1] == stem[-2] and stem[-1] in consonants
+    return len(stem) > 1 and stem[-1] == stem[-2] and stem[-1] in _CONSONANTS
 
 
 def cond_o(stem: str) -> bool:
@@ -51,12 +84,10 @@ def cond_o(stem: str) -> bool:
     """
     if len(stem) < 3:
         return False
-    vowels = "aeiou"
-    consonants = ''.join(set('abcdefghijklmnopqrstuvwxyz') - set(vowels))
-    return (stem[-1] in consonants and
+    return (stem[-1] in _CONSONANTS and
             stem[-1] not in "wxy" and
-            stem[-2] in vowels and
-            stem[-3] in consonants)
+            stem[-2] in _VOWELS and
+            stem[-3] in _CONSONANTS)
 
 
 def stem_term(term: str) -> str:
@@ -69,6 +100,7 @@ def stem_term(term: str) -> str:
     # Note: See the provided file "porter.txt" for information on how to implement it!
     if len(term) <= 2:
         return term
+    measured_term = _MeasuredTerm(term)
 
     # Step 1a
     if term.endswith("sses"):
@@ -82,7 +114,7 @@ def stem_term(term: str) -> str:
 
     # Step 1b
     if term.endswith("eed"):
-        if get_measure(term[:-3]) > 0:
+        if measured_term.measure(term[:-3]) > 0:
             term = term[:-1]
     elif term.endswith("ed") or term.endswith("ing"):
         stem = term[:-2] if term.endswith("ed") else term[:-3]
@@ -92,7 +124,7 @@ def stem_term(term: str) -> str:
                 term += "e"
             elif condition_d(term) and not (term.endswith("l") or term.endswith("s") or term.endswith("z")):
                 term = term[:-1]
-            elif get_measure(term) == 1 and cond_o(term):
+            elif measured_term.measure(term) == 1 and cond_o(term):
                 term += "e"
 
     # Step 1c
@@ -101,86 +133,153 @@ def stem_term(term: str) -> str:
 
     # Steps 2 to 5...
     # Step 2
-        if term.endswith('ational') and get_measure(term[:-5]) > 0:
+        if term.endswith('ational') and measured_term.measure(term[:-5]) > 0:
             term = term[:-5] + 'e'
-        elif term.endswith('tional') and get_measure(term[:-2]) > 0:
+        elif term.endswith('tional') and measured_term.measure(term[:-2]) > 0:
             term = term[:-2]
-        elif term.endswith('enic') and get_measure(term[:-1]) > 0:
+        elif term.endswith('enic') and measured_term.measure(term[:-1]) > 0:
             term = term[:-1] + 'e'
-        elif term.endswith('anci') and get_measure(term[:-1]) > 0:
+        elif term.endswith('anci') and measured_term.measure(term[:-1]) > 0:
             term = term[:-1] + 'e'
-        elif term.endswith('izer') and get_measure(term[:-1]) > 0:
+        elif term.endswith('izer') and measured_term.measure(term[:-1]) > 0:
             term = term[:-1]
-        elif term.endswith('abli') and get_measure(term[:-1]) > 0:
+        elif term.endswith('abli') and measured_term.measure(term[:-1]) > 0:
             term = term[:-1] + 'e'
-        elif term.endswith('alli') and get_measure(term[:-2]) > 0:
+        elif term.endswith('alli') and measured_term.measure(term[:-2]) > 0:
             term = term[:-2]
-        elif term.endswith('entli') and get_measure(term[:-2]) > 0:
+        elif term.endswith('entli') and measured_term.measure(term[:-2]) > 0:
             term = term[:-1]
-        elif term.endswith('eli') and get_measure(term[:-2]) > 0:
+        elif term.endswith('eli') and measured_term.measure(term[:-2]) > 0:
             term = term[:-2]
-        elif term.endswith('ousli') and get_measure(term[:-2]) > 0:
+        elif term.endswith('ousli') and measured_term.measure(term[:-2]) > 0:
             term = term[:-2]
-        elif term.endswith('ization') and get_measure(term[:-5]) > 0:
+        elif term.endswith('ization') and measured_term.measure(term[:-5]) > 0:
             term = term[:-5] + 'e'
-        elif term.endswith('ation') and get_measure(term[:-4]) > 0:
+        elif term.endswith('ation') and measured_term.measure(term[:-4]) > 0:
             term = term[:-4] + 'e'
-        elif term.endswith('ator') and get_measure(term[:-2]) > 0:
+        elif term.endswith('ator') and measured_term.measure(term[:-2]) > 0:
             term = term[:-2] + 'e'
-        elif term.endswith('alism') and get_measure(term[:-3]) > 0:
+        elif term.endswith('alism') and measured_term.measure(term[:-3]) > 0:
             term = term[:-3]
-        elif term.endswith('iveness') and get_measure(term[:-4]) > 0:
+        elif term.endswith('iveness') and measured_term.measure(term[:-4]) > 0:
             term = term[:-4]
-        elif term.endswith('fulness') and get_measure(term[:-4]) > 0:
+        elif term.endswith('fulness') and measured_term.measure(term[:-4]) > 0:
             term = term[:-4]
-        elif term.endswith('ousness') and get_measure(term[:-4]) > 0:
+        elif term.endswith('ousness') and measured_term.measure(term[:-4]) > 0:
             term = term[:-4]
-        elif term.endswith('aliti') and get_measure(term[:-3]) > 0:
+        elif term.endswith('aliti') and measured_term.measure(term[:-3]) > 0:
             term = term[:-3]
-        elif term.endswith('iviti') and get_measure(term[:-3]) > 0:
+        elif term.endswith('iviti') and measured_term.measure(term[:-3]) > 0:
             term = term[:-3] + 'e'
-        elif term.endswith('biliti') and get_measure(term[:-5]) > 0:
+        elif term.endswith('biliti') and measured_term.measure(term[:-5]) > 0:
             term = term[:-5] + 'le'
-        elif term.endswith('xflurti') and get_measure(term[:-6]) > 0:
+        elif term.endswith('xflurti') and measured_term.measure(term[:-6]) > 0:
             term = term[:-6] + 'ti'
 
-        if term.endswith('icate') and get_measure(term[:-3]) > 0:
+        if term.endswith('icate') and measured_term.measure(term[:-3]) > 0:
             term = term[:-3]
-        elif term.endswith('ative') and get_measure(term[:-5]) > 0:
+        elif term.endswith('ative') and measured_term.measure(term[:-5]) > 0:
             term = term[:-5]
-        elif term.endswith('alize') and get_measure(term[:-3]) > 0:
+        elif term.endswith('alize') and measured_term.measure(term[:-3]) > 0:
             term = term[:-3]
-        elif term.endswith('icite') and get_measure(term[:-3]) > 0:
+        elif term.endswith('icite') and measured_term.measure(term[:-3]) > 0:
             term = term[:-3]
-        elif term.endswith('ical') and get_measure(term[:-2]) > 0:
+        elif term.endswith('ical') and measured_term.measure(term[:-2]) > 0:
             term = term[:-2]
-        elif term.endswith('ful') and get_measure(term[:-3]) > 0:
+        elif term.endswith('ful') and measured_term.measure(term[:-3]) > 0:
             term = term[:-3]
-        elif term.endswith('ness') and get_measure(term[:-4]) > 0:
+        elif term.endswith('ness') and measured_term.measure(term[:-4]) > 0:
             term = term[:-4]
         
-        if term.endswith('ement') and get_measure(term[:-5]) > 0:
+        if term.endswith('ement') and measured_term.measure(term[:-5]) > 0:
             term = term[:-5]
-        elif term.endswith(('ance', 'ence', 'able', 'ible', 'ment')) and get_measure(term[:-4]) > 1:
+        elif term.endswith(('ance', 'ence', 'able', 'ible', 'ment')) and measured_term.measure(term[:-4]) > 1:
             term = term[:-4]
-        elif term.endswith(('ant', 'ent', 'ism', 'ate', 'iti', 'ous', 'ive', 'ize')) and get_measure(term[:-3]) > 1:
+        elif term.endswith(('ant', 'ent', 'ism', 'ate', 'iti', 'ous', 'ive', 'ize')) and measured_term.measure(term[:-3]) > 1:
             term = term[:-3]
-        elif term.endswith(('al', 'er', 'ic', 'ou')) and get_measure(term[:-2]) > 1:
+        elif term.endswith(('al', 'er', 'ic', 'ou')) and measured_term.measure(term[:-2]) > 1:
             term = term[:-2]
-        elif term.endswith('ion') and get_measure(term[:-3]) > 1 and (term[-1] == 's' or term[-1] == 't'):
+        elif term.endswith('ion') and measured_term.measure(term[:-3]) > 1 and (term[-1] == 's' or term[-1] == 't'):
             term = term[:-3]
         
         if term.endswith('e'):
-            if get_measure(term[:-1]) > 1 or (get_measure(term[:-1]) == 1 and not cond_o(term[:-1])):
+            if measured_term.measure(term[:-1]) > 1 or (measured_term.measure(term[:-1]) == 1 and not cond_o(term[:-1])):
                 term = term[:-1]
 
         # Step 5b
-        if get_measure(term) > 1 and term.endswith('ll'):
+        if measured_term.measure(term) > 1 and term.endswith('ll'):
             term = term[:-1]
     # Apply further steps as per the algorithm description
 
     return term
 
+class Stemmer(object):
+    """
+    Wraps stem_term() with a size-bounded LRU cache. Natural language vocabularies are heavily skewed, so most calls
+    are cache hits and stemming a collection costs about one stem_term() call per distinct word.
+    """
+
+    def __init__(self, max_cache_size: int = 65536):
+        self.max_cache_size = max_cache_size
+        self._cache = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def stem(self, term: str) -> str:
+        """
+        Stems a single term, using the cache if possible.
+        :param term: Term to stem
+        :return: Stemmed term
+        """
+        cache = self._cache
+        try:
+            stemmed = cache[term]
+        except KeyError:
+            self.misses += 1
+            stemmed = stem_term(term)
+            cache[term] = stemmed
+            if len(cache) > self.max_cache_size:
+                cache.popitem(last=False)
+            return stemmed
+        self.hits += 1
+        try:
+            cache.move_to_end(term)
+        except KeyError:
+            pass  # Evicted by another thread in the meantime (segments are merged in a background thread).
+        return stemmed
+
+    def stem_many(self, terms) -> list[str]:
+        """
+        Stems all terms of an iterable. Each distinct term is only looked up (and stemmed) once per call.
+        :param terms: Iterable of terms
+        :return: List of stemmed terms in the same order as the input
+        """
+        terms = list(terms)
+        stemmed = {term: self.stem(term) for term in dict.fromkeys(terms)}
+        # Repeated occurrences within the batch are served from the local mapping, count them as hits.
+        self.hits += len(terms) - len(stemmed)
+        return [stemmed[term] for term in terms]
+
+    def cache_info(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "size": len(self._cache),
+            "max_size": self.max_cache_size,
+        }
+
+    def clear_cache(self):
+        self._cache.clear()
+        self.hits = 0
+        self.misses = 0
+
+
+# Shared stemmer instance used by the collection processing, the query processing and the models.
+default_stemmer = Stemmer()
+
+
 def stem_all_documents(collection: list[Document]):
     """
     For each document in the given collection, this method uses the stem_term() function on all terms in its term list.
@@ -188,8 +287,19 @@ def stem_all_documents(collection: list[Document]):
     :param collection: Document collection to process
     """
     # TODO: Implement this function. (PR03)
-    for document in collection:
-        document.stemmed_terms = [stem_term(term) for term in document.terms]
+    for _ in stem_documents(collection):
+        pass
+
+
+def stem_documents(documents):
+    """
+    Streaming version of stem_all_documents(): sets the stemmed_terms of each document and yields it right away.
+    :param documents: Iterable of documents (e. g. from extraction.iter_collection())
+    :return: Generator of the processed documents
+    """
+    for document in documents:
+        document.stemmed_terms = default_stemmer.stem_many(document.terms)
+        yield document
 
 
 def stem_query_terms(query: str) -> str:
@@ -200,5 +310,5 @@ def stem_query_terms(query: str) -> str:
     """
     # TODO: Implement this function. (PR03)
     terms = query.split()
-    stemmed_terms = [stem_term(term) for term in terms]
+    stemmed_terms = default_stemmer.stem_many(terms)
     return ' '.join(stemmed_terms)
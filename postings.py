@@ -0,0 +1,129 @@
+# Contains the posting list operations used for Boolean queries on inverted lists.
+#
+# Posting lists are sorted arrays of unsigned ints (array('I')) without duplicates. Intersections gallop through the
+# longer list, so their cost depends on the length of the shorter one; unions and differences are linear merges.
+
+from array import array
+from bisect import bisect_left
+
+TYPECODE = "I"
+
+
+def from_doc_ids(doc_ids) -> array:
+    """
+    Creates a posting list from arbitrary document ids.
+    :param doc_ids: Iterable of document ids, may be unsorted and contain duplicates
+    :return: Sorted array without duplicates
+    """
+    return array(TYPECODE, sorted(set(doc_ids)))
+
+
+def from_sorted(doc_ids) -> array:
+    """
+    Creates a posting list from document ids that are already sorted and unique.
+    """
+    return array(TYPECODE, doc_ids)
+
+
+def empty() -> array:
+    return array(TYPECODE)
+
+
+def _gallop(postings: array, target: int, lo: int) -> int:
+    """
+    Finds the position of the first element >= target, starting at lo. The search range is doubled until it contains
+    the target, followed by a binary search within the last step.
+    """
+    n = len(postings)
+    step = 1
+    hi = lo
+    while hi < n and postings[hi] < target:
+        lo = hi + 1
+        hi += step
+        step <<= 1
+    return bisect_left(postings, target, lo, min(hi, n))
+
+
+def intersect(left: array, right: array) -> array:
+    """
+    Intersects two posting lists. Every element of the shorter list is searched in the longer one by galloping from
+    the position of the previous match.
+    :return: Document ids that are contained in both lists
+    """
+    if len(left) > len(right):
+        left, right = right, left
+    result = array(TYPECODE)
+    position = 0
+    n = len(right)
+    for doc_id in left:
+        position = _gallop(right, doc_id, position)
+        if position == n:
+            break
+        if right[position] == doc_id:
+            result.append(doc_id)
+            position += 1
+    return result
+
+
+def intersect_many(posting_lists: list) -> array:
+    """
+    Intersects any number of posting lists, starting with the shortest ones. Stops as soon as the intermediate result
+    is empty.
+    """
+    if not posting_lists:
+        return array(TYPECODE)
+    ordered = sorted(posting_lists, key=len)
+    result = ordered[0]
+    for postings in ordered[1:]:
+        if not result:
+            break
+        result = intersect(result, postings)
+    return array(TYPECODE, result)
+
+
+def union(left: array, right: array) -> array:
+    """
+    Merges two posting lists.
+    :return: Document ids that are contained in at least one of the lists
+    """
+    if not left:
+        return array(TYPECODE, right)
+    if not right:
+        return array(TYPECODE, left)
+    result = array(TYPECODE)
+    i = j = 0
+    n, m = len(left), len(right)
+    while i < n and j < m:
+        a, b = left[i], right[j]
+        if a < b:
+            result.append(a)
+            i += 1
+        elif b < a:
+            result.append(b)
+            j += 1
+        else:
+            result.append(a)
+            i += 1
+            j += 1
+    result.extend(left[i:])
+    result.extend(right[j:])
+    return result
+
+
+def difference(left: array, right: array) -> array:
+    """
+    Removes all document ids of the right posting list from the left one.
+    :return: Document ids that are contained in left but not in right
+    """
+    if not left or not right:
+        return array(TYPECODE, left)
+    result = array(TYPECODE)
+    j = 0
+    m = len(right)
+    for doc_id in left:
+        if j < m and right[j] < doc_id:
+            j = _gallop(right, doc_id, j)
+        if j < m and right[j] == doc_id:
+            continue
+        result.append(doc_id)
+    return result
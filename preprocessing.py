@@ -0,0 +1,121 @@
+# Contains the preprocessing pipeline that removes stop words from and stems the documents of a collection in parallel.
+#
+# The documents are split into chunks that are processed by a pool of worker processes. Only the term lists are sent
+# to the workers and only the filtered and stemmed term lists are sent back; the documents themselves never leave the
+# main process. The results are identical to cleanup.filter_collection() followed by porter.stem_all_documents().
+
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import chain, islice
+
+import cleanup
+import porter
+
+DEFAULT_CHUNK_SIZE = 64  # Documents per task sent to a worker.
+
+# State of a worker process, set once by _initialize_worker().
+_worker_stop_word_filter = None
+_worker_stemming = False
+
+
+def _initialize_worker(stop_words, stemming: bool):
+    global _worker_stop_word_filter, _worker_stemming
+    _worker_stop_word_filter = None if stop_words is None else cleanup.StopWordFilter(stop_words)
+    _worker_stemming = stemming
+
+
+def preprocess_terms(term_lists: list[list[str]], stop_word_filter, stemming: bool) -> list[tuple]:
+    """
+    Filters and stems the terms of many documents in one pass.
+    :param term_lists: Terms of each document
+    :param stop_word_filter: StopWordFilter to use, or None to skip stop word filtering
+    :param stemming: Controls, whether the terms are stemmed
+    :return: One tuple (filtered terms or None, stemmed terms or None) per document
+    """
+    results = []
+    for terms in term_lists:
+        filtered_terms = None if stop_word_filter is None else stop_word_filter.filter_terms(terms)
+        stemmed_terms = porter.default_stemmer.stem_many(terms) if stemming else None
+        results.append((filtered_terms, stemmed_terms))
+    return results
+
+
+def _preprocess_chunk(term_lists: list[list[str]]) -> list[tuple]:
+    return preprocess_terms(term_lists, _worker_stop_word_filter, _worker_stemming)
+
+
+def _chunks(documents, chunk_size: int):
+    documents = iter(documents)
+    while True:
+        chunk = list(islice(documents, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _apply(chunk: list, results: list[tuple]) -> list:
+    for document, (filtered_terms, stemmed_terms) in zip(chunk, results):
+        if filtered_terms is not None:
+            document.filtered_terms = filtered_terms
+        if stemmed_terms is not None:
+            document.stemmed_terms = stemmed_terms
+    return chunk
+
+
+def preprocess_documents(documents, stopword_filtering=False, stemming=False, stop_word_filter=None, workers=None,
+                         chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Sets the filtered_terms and/or stemmed_terms of each document, using a pool of worker processes. The documents are
+    yielded in their original order; at most two chunks per worker are in flight, so the input may be a generator
+    (e. g. from extraction.iter_collection()).
+    :param documents: Iterable of documents
+    :param stopword_filtering: Controls, whether stop words are removed (into filtered_terms)
+    :param stemming: Controls, whether the terms are stemmed (into stemmed_terms)
+    :param stop_word_filter: Filter to use. Defaults to the stop words from englishST.txt.
+    :param workers: Number of worker processes, defaults to the number of CPUs
+    :param chunk_size: Number of documents per task
+    :return: Generator of the processed documents
+    """
+    if not stopword_filtering and not stemming:
+        yield from documents
+        return
+    if stopword_filtering and stop_word_filter is None:
+        stop_word_filter = cleanup.get_default_filter()
+    if not stopword_filtering:
+        stop_word_filter = None
+    workers = workers or os.cpu_count() or 1
+
+    chunks = _chunks(documents, chunk_size)
+    first_chunk = next(chunks, None)
+    second_chunk = next(chunks, None)
+    if workers == 1 or second_chunk is None:
+        # Starting processes does not pay off for a single chunk.
+        for chunk in chain((first_chunk, second_chunk), chunks):
+            if chunk is None:
+                continue
+            yield from _apply(chunk, preprocess_terms([d.terms for d in chunk], stop_word_filter, stemming))
+        return
+
+    stop_words = None if stop_word_filter is None else stop_word_filter.stop_words
+    with ProcessPoolExecutor(max_workers=workers, initializer=_initialize_worker,
+                             initargs=(stop_words, stemming)) as executor:
+        pending = deque()
+        for chunk in chain((first_chunk, second_chunk), chunks):
+            pending.append((chunk, executor.submit(_preprocess_chunk, [d.terms for d in chunk])))
+            if len(pending) >= 2 * workers:
+                chunk, future = pending.popleft()
+                yield from _apply(chunk, future.result())
+        while pending:
+            chunk, future = pending.popleft()
+            yield from _apply(chunk, future.result())
+
+
+def preprocess_collection(collection: list, stopword_filtering=False, stemming=False, stop_word_filter=None,
+                          workers=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Parallel replacement for cleanup.filter_collection() and porter.stem_all_documents(), see preprocess_documents().
+    :param collection: Document collection to process
+    """
+    for _ in preprocess_documents(collection, stopword_filtering, stemming, stop_word_filter, workers, chunk_size):
+        pass
@@ -0,0 +1,326 @@
+# Contains the Boolean query compiler that is shared by the inverted list and the signature based search.
+#
+# Grammar (from lowest to highest precedence):
+#   query    := and_expr (("|" | "OR") and_expr)*
+#   and_expr := not_expr (("&" | "AND" | "-" | <nothing>) not_expr)*     "a - b" means "a AND NOT b"
+#   not_expr := "NOT" not_expr | primary
+#   primary  := term | "(" query ")"
+# Terms are lowercased. The keywords AND, OR and NOT are recognized in any case (like the original signature search,
+# which upper-cased the whole query), so "and", "or" and "not" cannot be searched for as terms.
+
+import re
+from dataclasses import dataclass
+
+import postings
+from cache import LRUCache
+
+_TOKEN_PATTERN = re.compile(r"\w+(?:'\w+)*|[()&|\-]")
+_OPERATORS = {"&": "AND", "|": "OR", "-": "MINUS", "AND": "AND", "OR": "OR", "NOT": "NOT"}
+
+
+def _operator(token):
+    """
+    :return: Operator name of a token, or None if the token is not an operator
+    """
+    return None if token is None else _OPERATORS.get(token.upper())
+
+
+# Compiled queries, keyed by the query string with normalized whitespace.
+_compiled_queries = LRUCache(max_entries=1024)
+
+
+class QuerySyntaxError(ValueError):
+    pass
+
+
+@dataclass(frozen=True)
+class Term(object):
+    value: str
+
+    def terms(self) -> list[str]:
+        return [self.value]
+
+    def map_terms(self, function):
+        return Term(function(self.value))
+
+    def remove_terms(self, predicate):
+        return None if predicate(self.value) else self
+
+    def matches(self, document_terms) -> bool:
+        return self.value in document_terms
+
+    def __str__(self):
+        return self.value
+
+
+@dataclass(frozen=True)
+class Not(object):
+    child: object
+
+    def terms(self) -> list[str]:
+        return self.child.terms()
+
+    def map_terms(self, function):
+        return Not(self.child.map_terms(function))
+
+    def remove_terms(self, predicate):
+        child = self.child.remove_terms(predicate)
+        return None if child is None else Not(child)
+
+    def matches(self, document_terms) -> bool:
+        return not self.child.matches(document_terms)
+
+    def __str__(self):
+        return f"NOT {self.child}"
+
+
+@dataclass(frozen=True)
+class And(object):
+    children: tuple
+
+    def terms(self) -> list[str]:
+        return [term for child in self.children for term in child.terms()]
+
+    def map_terms(self, function):
+        return And(tuple(child.map_terms(function) for child in self.children))
+
+    def remove_terms(self, predicate):
+        return _combine(And, [child.remove_terms(predicate) for child in self.children])
+
+    def matches(self, document_terms) -> bool:
+        return all(child.matches(document_terms) for child in self.children)
+
+    def __str__(self):
+        return "(" + " AND ".join(str(child) for child in self.children) + ")"
+
+
+@dataclass(frozen=True)
+class Or(object):
+    children: tuple
+
+    def terms(self) -> list[str]:
+        return [term for child in self.children for term in child.terms()]
+
+    def map_terms(self, function):
+        return Or(tuple(child.map_terms(function) for child in self.children))
+
+    def remove_terms(self, predicate):
+        return _combine(Or, [child.remove_terms(predicate) for child in self.children])
+
+    def matches(self, document_terms) -> bool:
+        return any(child.matches(document_terms) for child in self.children)
+
+    def __str__(self):
+        return "(" + " OR ".join(str(child) for child in self.children) + ")"
+
+
+def _combine(node_class, children: list):
+    """
+    Creates an And or Or node. Nested nodes of the same type are flattened, missing children are dropped and nodes with
+    a single child are replaced by that child.
+    """
+    flattened = []
+    for child in children:
+        if child is None:
+            continue
+        if isinstance(child, node_class):
+            flattened.extend(child.children)
+        else:
+            flattened.append(child)
+    if not flattened:
+        return None
+    if len(flattened) == 1:
+        return flattened[0]
+    return node_class(tuple(flattened))
+
+
+def tokenize(query: str) -> list[str]:
+    """
+    Splits a query into terms, parentheses and operators. Characters that are neither are ignored.
+    :param query: Query string
+    :return: List of tokens
+    """
+    return _TOKEN_PATTERN.findall(query)
+
+
+class _Parser(object):
+    def __init__(self, tokens: list[str]):
+        self.tokens = tokens
+        self.position = 0
+
+    def peek(self):
+        return self.tokens[self.position] if self.position < len(self.tokens) else None
+
+    def next(self):
+        token = self.peek()
+        self.position += 1
+        return token
+
+    def parse_query(self):
+        children = [self.parse_and()]
+        while _operator(self.peek()) == "OR":
+            self.next()
+            children.append(self.parse_and())
+        return _combine(Or, children)
+
+    def parse_and(self):
+        children = [self.parse_not()]
+        while True:
+            token = self.peek()
+            operator = _operator(token)
+            if operator == "AND":
+                self.next()
+                children.append(self.parse_not())
+            elif operator == "MINUS":
+                self.next()
+                children.append(Not(self.parse_not()))
+            elif token is not None and token != ")" and operator != "OR":
+                # Adjacent operands are implicitly combined with AND.
+                children.append(self.parse_not())
+            else:
+                return _combine(And, children)
+
+    def parse_not(self):
+        if _operator(self.peek()) == "NOT":
+            self.next()
+            return Not(self.parse_not())
+        return self.parse_primary()
+
+    def parse_primary(self):
+        token = self.next()
+        if token is None:
+            raise QuerySyntaxError("Unexpected end of query")
+        if token == "(":
+            node = self.parse_query()
+            if self.next() != ")":
+                raise QuerySyntaxError("Missing closing parenthesis")
+            return node
+        if token == ")" or _operator(token) is not None:
+            raise QuerySyntaxError(f"Unexpected token '{token}'")
+        return Term(token.lower())
+
+
+def parse(query: str):
+    """
+    Parses a query into an abstract syntax tree of Term, Not, And and Or nodes.
+    :param query: Query string
+    :return: Root node, or None for an empty query
+    """
+    tokens = tokenize(query)
+    if not tokens:
+        return None
+    parser = _Parser(tokens)
+    node = parser.parse_query()
+    if parser.peek() is not None:
+        raise QuerySyntaxError(f"Unexpected token '{parser.peek()}'")
+    return node
+
+
+def compile_query(query: str):
+    """
+    Like parse(), but repeated queries are served from a cache and are not parsed again.
+    :param query: Query string
+    :return: Root node, or None for an empty query
+    """
+    key = " ".join(query.split())
+    node = _compiled_queries.get(key, _compiled_queries)
+    if node is _compiled_queries:
+        node = parse(key)
+        _compiled_queries.put(key, node)
+    return node
+
+
+def relax_negations(node):
+    """
+    Drops all negations from a query, so that it matches a superset of the original query's results. Used for filters
+    that can have false positives (like signatures), where excluding documents for a negated term would be unsafe.
+    :param node: Query node
+    :return: Relaxed query node, or None if the relaxed query matches every document
+    """
+    if isinstance(node, Term):
+        return node
+    if isinstance(node, Not):
+        return None
+    children = [relax_negations(child) for child in node.children]
+    if isinstance(node, Or):
+        return None if any(child is None for child in children) else _combine(Or, children)
+    return _combine(And, children)
+
+
+def estimate(node, cost) -> float:
+    """
+    Estimates the number of documents a node matches.
+    :param node: Query node
+    :param cost: Function that returns the posting list length of a term
+    :return: Estimated number of matching documents
+    """
+    if isinstance(node, Term):
+        return cost(node.value)
+    if isinstance(node, Not):
+        return float("inf")
+    if isinstance(node, And):
+        return min(estimate(child, cost) for child in node.children)
+    return sum(estimate(child, cost) for child in node.children)
+
+
+def plan(node, cost):
+    """
+    Reorders the children of all And nodes so that the operands with the shortest posting lists are evaluated first
+    and negations last. Evaluation can then stop as soon as an intermediate result is empty.
+    :param node: Query node
+    :param cost: Function that returns the posting list length of a term
+    :return: Equivalent, reordered query node
+    """
+    if isinstance(node, Not):
+        return Not(plan(node.child, cost))
+    if isinstance(node, Or):
+        return Or(tuple(plan(child, cost) for child in node.children))
+    if isinstance(node, And):
+        children = [plan(child, cost) for child in node.children]
+        positive = sorted((child for child in children if not isinstance(child, Not)),
+                          key=lambda child: estimate(child, cost))
+        negative = [child for child in children if isinstance(child, Not)]
+        return And(tuple(positive + negative))
+    return node
+
+
+def evaluate(node, lookup, universe, lookup_all=None):
+    """
+    Evaluates a (planned) query node on posting lists.
+    :param node: Query node
+    :param lookup: Function that returns the posting list of a term
+    :param universe: Function that returns the posting list of all documents, needed for negations
+    :param lookup_all: Optional function that returns the posting list of documents containing all given terms at
+    once. If it is given, the terms of an And node are looked up together (e. g. with one combined signature).
+    :return: Sorted posting list of matching document ids
+    """
+    if node is None:
+        return postings.empty()
+    if isinstance(node, Term):
+        return lookup(node.value)
+    if isinstance(node, Not):
+        return postings.difference(universe(), evaluate(node.child, lookup, universe, lookup_all))
+    if isinstance(node, Or):
+        result = postings.empty()
+        for child in node.children:
+            result = postings.union(result, evaluate(child, lookup, universe, lookup_all))
+        return result
+
+    children = node.children
+    result = None
+    if lookup_all is not None:
+        terms = [child.value for child in children if isinstance(child, Term)]
+        if terms:
+            result = lookup_all(terms)
+            children = [child for child in children if not isinstance(child, Term)]
+    for child in children:
+        if result is not None and not result:
+            break
+        if isinstance(child, Not):
+            if result is None:
+                result = universe()
+            result = postings.difference(result, evaluate(child.child, lookup, universe, lookup_all))
+        else:
+            child_result = evaluate(child, lookup, universe, lookup_all)
+            result = child_result if result is None else postings.intersect(result, child_result)
+    return result
@@ -0,0 +1,88 @@
+# Contains the top-k selection that is shared by all ranked searches.
+#
+# Only the best offset + k results are ordered, in O(N log k) with a heap or in O(N) with numpy.argpartition, instead
+# of sorting the whole collection. Ties are broken by position (the earlier document wins), like a stable sort.
+
+import heapq
+import sys
+
+import numpy as np
+
+
+def top_k(scores, k: int, offset: int = 0, candidates=None) -> list[int]:
+    """
+    Selects the positions of the best scores, highest first.
+    :param scores: Scores of all documents (list or NumPy array)
+    :param k: Number of positions to return
+    :param offset: Number of best positions to skip (for paging)
+    :param candidates: Optional positions to restrict the selection to, in increasing order
+    :return: Positions number offset to offset + k - 1 of the ranking
+    """
+    n = offset + k
+    if n <= 0:
+        return []
+    if isinstance(scores, np.ndarray):
+        return _top_k_numpy(scores, n, candidates)[offset:]
+    if candidates is None:
+        candidates = range(len(scores))
+    # heapq.nlargest() is equivalent to a stable sorted(..., reverse=True)[:n], so ties keep the earlier position.
+    return heapq.nlargest(n, candidates, key=scores.__getitem__)[offset:]
+
+
+def _top_k_numpy(scores: np.ndarray, n: int, candidates=None) -> list[int]:
+    positions = np.arange(len(scores)) if candidates is None else np.asarray(candidates, dtype=np.int64)
+    values = scores[positions]
+    if n < len(values):
+        threshold = np.partition(values, len(values) - n)[len(values) - n]
+        above = np.flatnonzero(values > threshold)
+        # Fill the remaining places with the earliest positions that have exactly the threshold score.
+        tied = np.flatnonzero(values == threshold)[:n - len(above)]
+        selected = np.concatenate((above, tied))
+        positions, values = positions[selected], values[selected]
+    order = np.lexsort((positions, -values))
+    return positions[order].tolist()
+
+
+class RankedResults(object):
+    """
+    Scores of one query, ranked on demand. Further pages can be requested without scoring the documents again; the
+    selection is only repeated when a page reaches beyond the results that were ranked so far.
+    """
+
+    def __init__(self, scores, documents: list, candidates=None):
+        """
+        :param scores: Scores of all documents, aligned with documents
+        :param documents: Document collection
+        :param candidates: Optional positions that may appear in the ranking (e. g. only documents with a positive
+        score); all documents by default
+        """
+        self.scores = scores
+        self.documents = documents
+        self.candidates = candidates
+        self._ranked_positions = []
+
+    def __len__(self) -> int:
+        return len(self.scores) if self.candidates is None else len(self.candidates)
+
+    def memory_usage(self) -> int:
+        """
+        Estimates the number of bytes held by the scores, the candidates and the ranked positions. The documents
+        belong to the collection and are not counted.
+        """
+        return sum(
+            values.nbytes if isinstance(values, np.ndarray) else sys.getsizeof(values) + 32 * len(values)
+            for values in (self.scores, self.candidates, self._ranked_positions) if values is not None
+        )
+
+    def page(self, offset: int, k: int) -> list[tuple]:
+        """
+        Returns part of the ranking.
+        :param offset: Number of best results to skip
+        :param k: Number of results to return
+        :return: List of (score, document) tuples
+        """
+        end = min(offset + k, len(self))
+        if end > len(self._ranked_positions):
+            self._ranked_positions = top_k(self.scores, end, candidates=self.candidates)
+        return [(self.scores[position], self.documents[position])
+                for position in self._ranked_positions[offset:end]]
@@ -0,0 +1,494 @@
+# Contains the segment management for incremental indexing.
+#
+# A segmented collection consists of the base collection (the collection store, whose indexes are saved by the
+# models) and of small segments with the documents that were added since. Every document keeps its position: the
+# documents of a segment follow those of the previous one, and deleting a document only marks its position as deleted
+# (tombstone). New documents are collected in an in-memory buffer segment. When the buffer is full, it is flushed into
+# an immutable segment, and a merge policy combines neighbouring segments of similar size in a background thread.
+# Merging compacts the segments: deleted documents are written as empty documents that only keep their id. They are
+# not removed, because the positions of all following documents (and the indexes and tombstones that refer to them)
+# would change.
+# The models keep one index per segment (see SegmentIndexes): adding documents only indexes the new documents, and a
+# merge only indexes the documents of the merged segment.
+#
+# The segments are saved as collection store files in a directory, together with a manifest (manifest.json) that
+# lists them along with the tombstones. The manifest belongs to one base collection and is discarded when the base
+# collection is replaced. A flushed segment is listed in the manifest before the buffer file is emptied; if the
+# system stops in between, the documents of the buffer file that are already in the last segment are skipped on load.
+
+import hashlib
+import itertools
+import json
+import os
+import threading
+import weakref
+from bisect import bisect_right
+from collections.abc import Sequence
+from math import log
+
+import collection_store
+import postings
+from document import Document
+
+MANIFEST_FILE_NAME = "manifest.json"
+BUFFER_FILE_NAME = "buffer.bin"
+
+_segment_keys = itertools.count(1)
+
+
+class Segment(object):
+    """
+    Consecutive documents of a segmented collection. Segments are immutable; adding a document to the buffer creates
+    a new buffer segment. Every segment has a unique key, which the models use to cache its index.
+    """
+
+    def __init__(self, start: int, documents, file_name: str = None):
+        """
+        :param start: Position of the segment's first document in the collection
+        :param documents: Sequence of the segment's documents
+        :param file_name: Name of the collection store file of the segment, None for the buffer
+        """
+        self.key = next(_segment_keys)
+        self.start = start
+        self.documents = documents
+        self.file_name = file_name
+
+    @property
+    def end(self) -> int:
+        return self.start + len(self.documents)
+
+    def __len__(self) -> int:
+        return len(self.documents)
+
+
+class MergePolicy(object):
+    """
+    Tiered merge policy: segments are grouped into tiers by size (tier t holds segments with up to
+    max_buffered_documents * segments_per_tier ** t documents) and segments_per_tier neighbouring segments of the same
+    tier are merged into one segment of the next tier. Every document is therefore only merged a logarithmic number
+    of times.
+    """
+
+    def __init__(self, max_buffered_documents: int = 16, segments_per_tier: int = 4):
+        """
+        :param max_buffered_documents: Number of documents after which the buffer is flushed into a segment
+        :param segments_per_tier: Number of segments of one tier that are merged at once
+        """
+        self.max_buffered_documents = max_buffered_documents
+        self.segments_per_tier = segments_per_tier
+
+    def tier(self, segment_size: int) -> int:
+        if segment_size <= self.max_buffered_documents:
+            return 0
+        return int(log(segment_size / self.max_buffered_documents, self.segments_per_tier) + 1 - 1e-9)
+
+    def find_merge(self, segments: list):
+        """
+        :param segments: Flushed segments, in the order of their positions
+        :return: Slice of the segments to merge, or None if no merge is needed
+        """
+        run_start = 0
+        for index in range(1, len(segments) + 1):
+            if index == len(segments) or self.tier(len(segments[index])) != self.tier(len(segments[run_start])):
+                if index - run_start >= self.segments_per_tier:
+                    return slice(run_start, run_start + self.segments_per_tier)
+                run_start = index
+        return None
+
+
+class SegmentedCollection(Sequence):
+    """
+    Base collection plus added segments, usable like one list of documents (including deleted ones, so that
+    positions stay valid; see is_deleted()).
+    """
+
+    def __init__(self, base, directory: str = None, base_fingerprint: bytes = bytes(16), policy: MergePolicy = None,
+                 background_merges: bool = True):
+        """
+        :param base: Sequence of the base documents (e. g. a collection_store.CollectionFile)
+        :param directory: Directory for the segment files and the manifest, None to keep segments in memory only
+        :param base_fingerprint: Fingerprint of the base collection, the manifest is only used if it matches
+        :param policy: Merge policy, the default policy if None
+        :param background_merges: Controls, whether merges run in a background thread
+        """
+        self.base = base
+        self.directory = directory
+        self.base_fingerprint = base_fingerprint
+        self.policy = policy or MergePolicy()
+        self.background_merges = background_merges
+        self.segments = []  # Flushed segments, in the order of their positions.
+        self.buffer = Segment(len(base), [])
+        self.deleted = set()  # Positions of deleted documents (tombstones).
+        self.version = 0  # Incremented on every change of the collection's content.
+        self.next_document_id = max((document_id for document_id in self._base_document_ids()
+                                     if document_id is not None), default=-1) + 1
+        self._lock = threading.RLock()
+        self._merge_thread = None
+        self._listeners = weakref.WeakSet()  # SegmentIndexes that are informed about new and retired segments.
+        if directory is not None:
+            self._load_manifest()
+
+    def _base_document_ids(self):
+        if hasattr(self.base, "document_id_at"):
+            return (self.base.document_id_at(position) for position in range(len(self.base)))
+        return (document.document_id for document in self.base)
+
+    # Sequence interface:
+
+    def __len__(self) -> int:
+        return self.buffer.end
+
+    def __getitem__(self, position):
+        if isinstance(position, slice):
+            return [self[index] for index in range(*position.indices(len(self)))]
+        if position < 0:
+            position += len(self)
+        if 0 <= position < len(self.base):
+            return self.base[position]
+        segment = self.segment_at(position)
+        if segment is None:
+            raise IndexError(position)
+        return segment.documents[position - segment.start]
+
+    def segment_at(self, position: int):
+        """
+        :return: Segment that contains a position, or None for base positions and positions out of range
+        """
+        segments = self.index_segments()
+        index = bisect_right([segment.start for segment in segments], position) - 1
+        if index < 0 or position >= segments[index].end:
+            return None
+        return segments[index]
+
+    def document_id_at(self, position: int):
+        if position < len(self.base) and hasattr(self.base, "document_id_at"):
+            return self.base.document_id_at(position)
+        return self[position].document_id
+
+    def index_segments(self) -> list[Segment]:
+        """
+        :return: All segments that need an index: the flushed segments and the buffer, if it is not empty
+        """
+        with self._lock:
+            return self.segments + ([self.buffer] if len(self.buffer) else [])
+
+    @property
+    def has_segments(self) -> bool:
+        return bool(self.segments or len(self.buffer) or self.deleted)
+
+    def is_deleted(self, position: int) -> bool:
+        return position in self.deleted
+
+    def live_positions(self):
+        """
+        :return: Posting list of all positions that are not deleted
+        """
+        return postings.difference(postings.from_sorted(range(len(self))), self.deleted_positions())
+
+    def deleted_positions(self):
+        """
+        :return: Posting list of the deleted positions
+        """
+        return postings.from_doc_ids(self.deleted)
+
+    def live_documents(self):
+        """
+        Iterates over all documents that are not deleted.
+        """
+        return (self[position] for position in range(len(self)) if position not in self.deleted)
+
+    def position_of(self, document_id: int):
+        """
+        :return: Position of the (not deleted) document with the given id, or None
+        """
+        for position in range(len(self)):
+            if position not in self.deleted and self.document_id_at(position) == document_id:
+                return position
+        return None
+
+    def fingerprint(self) -> bytes:
+        """
+        Fingerprint of the whole content: the base fingerprint if nothing was added or deleted, otherwise a digest of
+        the base fingerprint, the segments and the tombstones.
+        """
+        if not self.has_segments:
+            return self.base_fingerprint
+        digest = hashlib.blake2b(self.base_fingerprint, digest_size=16)
+        with self._lock:
+            content = [[segment.file_name for segment in self.segments],
+                       [document.document_id for document in self.buffer.documents], sorted(self.deleted)]
+        digest.update(json.dumps(content).encode("utf-8"))
+        return digest.digest()
+
+    # Changes:
+
+    def add(self, document) -> int:
+        """
+        Adds a document to the buffer. Its document_id is set to the next free id.
+        :param document: Document to add, with filled term lists
+        :return: Position of the document
+        """
+        with self._lock:
+            document.document_id = self.next_document_id
+            self.next_document_id += 1
+            old_buffer = self.buffer
+            self.buffer = Segment(old_buffer.start, old_buffer.documents + [document])
+            position = self.buffer.end - 1
+            self.version += 1
+            self._retire([old_buffer])
+            self._save_buffer()
+            self._save_manifest()
+        if len(self.buffer) >= self.policy.max_buffered_documents:
+            self.flush()
+        return position
+
+    def delete(self, position: int) -> bool:
+        """
+        Marks the document at a position as deleted.
+        :return: False, if the position does not exist or was already deleted
+        """
+        with self._lock:
+            if not 0 <= position < len(self) or position in self.deleted:
+                return False
+            self.deleted.add(position)
+            self.version += 1
+            self._save_manifest()
+            return True
+
+    def flush(self):
+        """
+        Turns the buffer into an immutable segment and starts a merge if the policy asks for one.
+        """
+        with self._lock:
+            if not len(self.buffer):
+                return
+            buffer = self.buffer
+            segment = Segment(buffer.start, buffer.documents)
+            segment.key = buffer.key  # Same documents, so the indexes of the buffer can be kept.
+            segment.file_name = self._write_segment(segment)
+            self.segments.append(segment)
+            self.buffer = Segment(segment.end, [])
+            # The manifest is saved first, so the buffered documents are never only in the segment file (see
+            # _load_manifest()).
+            self._save_manifest()
+            self._save_buffer()
+        self.maybe_merge()
+
+    def maybe_merge(self):
+        """
+        Merges segments if the merge policy asks for it, in a background thread unless background merges are off.
+        """
+        with self._lock:
+            if self._merge_thread is not None and self._merge_thread.is_alive():
+                return
+            if self.policy.find_merge(self.segments) is None:
+                return
+            if not self.background_merges:
+                self._merge_all()
+                return
+            self._merge_thread = threading.Thread(target=self._merge_all, name="segment-merge", daemon=True)
+            self._merge_thread.start()
+
+    def _merge_all(self):
+        while True:
+            with self._lock:
+                selection = self.policy.find_merge(self.segments)
+                if selection is None:
+                    return
+                merged_segments = self.segments[selection]
+                deleted = set(self.deleted)
+            # Building the merged segment and its indexes does not block searches and additions.
+            documents = self._compacted_documents(merged_segments, deleted)
+            merged = Segment(merged_segments[0].start, [])
+            if self.directory is None:
+                merged.documents = list(documents)
+            else:
+                # The documents are streamed into the file and read from there, like the segments of the manifest.
+                merged.file_name = self._write_segment(merged, documents)
+                merged.documents = collection_store.CollectionFile(self._path(merged.file_name))
+            for listener in list(self._listeners):
+                listener.prepare(merged)
+            with self._lock:
+                start = self.segments.index(merged_segments[0])
+                self.segments[start:start + len(merged_segments)] = [merged]
+                self.version += 1  # Merged segments get new collection statistics (vector space model).
+                self._retire(merged_segments)
+                self._save_manifest()
+            # The retired segments are not closed here: a search may still read them without the lock. Their memory
+            # maps are released by the garbage collector once no search refers to them anymore (a mapped file can be
+            # removed before that).
+            for segment in merged_segments:
+                self._remove_segment_file(segment)
+
+    @staticmethod
+    def _compacted_documents(segments: list[Segment], deleted: set):
+        """
+        Iterates over the documents of segments that are merged. Deleted documents are replaced by empty documents
+        with the same id, so that their positions stay valid.
+        """
+        for segment in segments:
+            documents = segment.documents
+            if isinstance(documents, collection_store.CollectionFile):
+                documents = documents.stream()  # The retired segment does not need to keep the decoded documents.
+            for position, document in enumerate(documents, start=segment.start):
+                if position in deleted:
+                    placeholder = Document()
+                    placeholder.document_id = document.document_id
+                    document = placeholder
+                yield document
+
+    def wait_for_merges(self):
+        thread = self._merge_thread
+        if thread is not None:
+            thread.join()
+
+    def close(self):
+        """
+        Waits for running merges and closes the files of the base collection and the segments. The buffer is already
+        saved with every change.
+        """
+        self.wait_for_merges()
+        with self._lock:
+            for documents in [self.base] + [segment.documents for segment in self.segments]:
+                if isinstance(documents, collection_store.CollectionFile):
+                    documents.close()
+
+    def register(self, segment_indexes: "SegmentIndexes"):
+        """
+        Registers the segment indexes of a model, so that merges can build their index before the merged segment is
+        used and retired segments can be dropped.
+        """
+        self._listeners.add(segment_indexes)
+
+    def _retire(self, segments: list[Segment]):
+        for listener in list(self._listeners):
+            listener.retire(segment.key for segment in segments)
+
+    # Persistence:
+
+    def _path(self, file_name: str) -> str:
+        return os.path.join(self.directory, file_name)
+
+    def _write_segment(self, segment: Segment, documents=None):
+        """
+        :param documents: Iterable of the documents to write, the documents of the segment if None
+        :return: Name of the segment file, None if segments are kept in memory only
+        """
+        if self.directory is None:
+            return None
+        os.makedirs(self.directory, exist_ok=True)
+        file_name = f"segment_{segment.key}_{segment.start}.bin"
+        collection_store.write_collection(self._path(file_name), segment.documents if documents is None else documents)
+        return file_name
+
+    def _remove_segment_file(self, segment: Segment):
+        if self.directory is not None and segment.file_name is not None:
+            try:
+                os.remove(self._path(segment.file_name))
+            except FileNotFoundError:
+                pass
+
+    def _save_buffer(self):
+        if self.directory is not None:
+            os.makedirs(self.directory, exist_ok=True)
+            collection_store.write_collection(self._path(BUFFER_FILE_NAME), self.buffer.documents)
+
+    def _save_manifest(self):
+        if self.directory is None:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        manifest = {
+            "base_fingerprint": self.base_fingerprint.hex(),
+            "base_documents": len(self.base),
+            "segments": [segment.file_name for segment in self.segments],
+            "deleted": sorted(self.deleted),
+            "next_document_id": self.next_document_id,
+        }
+        temporary_path = self._path(MANIFEST_FILE_NAME + ".tmp")
+        with open(temporary_path, "w", encoding="utf-8") as file:
+            json.dump(manifest, file)
+        os.replace(temporary_path, self._path(MANIFEST_FILE_NAME))
+
+    def _load_manifest(self):
+        try:
+            with open(self._path(MANIFEST_FILE_NAME), "r", encoding="utf-8") as file:
+                manifest = json.load(file)
+        except FileNotFoundError:
+            return
+        if (manifest["base_fingerprint"] != self.base_fingerprint.hex()
+                or manifest["base_documents"] != len(self.base)):
+            # The segments were added to a different base collection.
+            self.clear()
+            return
+        start = len(self.base)
+        for file_name in manifest["segments"]:
+            segment = Segment(start, collection_store.CollectionFile(self._path(file_name)), file_name)
+            self.segments.append(segment)
+            start = segment.end
+        try:
+            buffer_file = collection_store.CollectionFile(self._path(BUFFER_FILE_NAME))
+        except FileNotFoundError:
+            buffered_documents = []
+        else:
+            buffered_documents = list(buffer_file.stream())
+            buffer_file.close()
+        if self.segments and buffered_documents:
+            # Document ids increase with the positions: buffered documents with an id up to the last id of the last
+            # segment were flushed into it, but the buffer file was not emptied anymore.
+            last_segment = self.segments[-1].documents
+            last_document_id = last_segment.document_id_at(len(last_segment) - 1)
+            buffered_documents = [document for document in buffered_documents
+                                  if document.document_id > last_document_id]
+        self.buffer = Segment(start, buffered_documents)
+        self.deleted = set(manifest["deleted"])
+        self.next_document_id = max(self.next_document_id, manifest["next_document_id"])
+
+    def clear(self):
+        """
+        Removes all segments, tombstones and their files.
+        """
+        self.wait_for_merges()
+        with self._lock:
+            self._retire(self.index_segments())
+            if self.directory is not None and os.path.isdir(self.directory):
+                for file_name in os.listdir(self.directory):
+                    if file_name.endswith(".bin") or file_name.startswith(MANIFEST_FILE_NAME):
+                        os.remove(self._path(file_name))
+            self.segments = []
+            self.buffer = Segment(len(self.base), [])
+            self.deleted = set()
+            self.version += 1
+
+
+class SegmentIndexes(object):
+    """
+    Indexes of the segments of a segmented collection, for one model and one set of preprocessing options. The index
+    of a segment is built the first time it is needed (or, for merged segments, in the merge thread) and kept until
+    the segment is retired.
+    """
+
+    def __init__(self, build):
+        """
+        :param build: Function that builds the index of a Segment
+        """
+        self.build = build
+        self._indexes = {}
+
+    def prepare(self, segment: Segment):
+        if segment.key not in self._indexes:
+            self._indexes[segment.key] = self.build(segment)
+
+    def retire(self, keys):
+        for key in keys:
+            self._indexes.pop(key, None)
+
+    def sync(self, collection: SegmentedCollection) -> list[tuple]:
+        """
+        :return: List of (segment, index) tuples for all segments of the collection that need an index
+        """
+        collection.register(self)
+        result = []
+        for segment in collection.index_segments():
+            self.prepare(segment)
+            result.append((segment, self._indexes[segment.key]))
+        return result
@@ -0,0 +1,29 @@
+# Makes the modules of the repository root importable when the tests are run with "pytest" instead of
+# "python -m pytest", and provides the collection of the repository as a fixture.
+
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import extraction  # noqa: E402
+
+
+@pytest.fixture(scope="session", autouse=True)
+def repository_root():
+    # The modules find raw_data/ and data/ relative to the working directory.
+    previous = os.getcwd()
+    os.chdir(ROOT)
+    yield ROOT
+    os.chdir(previous)
+
+
+@pytest.fixture(scope="session")
+def collection(repository_root) -> list:
+    """
+    Documents of data/my_collection.json. Tests must not modify them.
+    """
+    return extraction.load_collection_from_json(os.path.join(repository_root, "data", "my_collection.json"))
@@ -0,0 +1,99 @@
+# Contains round-trip tests of the binary collection file (see collection_store.py).
+
+import pytest
+
+import collection_store
+from document import Document
+
+
+def attributes(doc: Document) -> tuple:
+    return doc.document_id, doc.title, doc.raw_text, doc.terms, doc.filtered_terms, doc.stemmed_terms
+
+
+def make_document(document_id, title: str, raw_text: str, filtered_terms=None, stemmed_terms=None) -> Document:
+    doc = Document()
+    doc.document_id = document_id
+    doc.title = title
+    doc.raw_text = raw_text
+    doc.terms = raw_text.lower().split()
+    doc.filtered_terms = filtered_terms
+    doc.stemmed_terms = stemmed_terms
+    return doc
+
+
+@pytest.fixture
+def collection_file(collection, tmp_path):
+    file_path = str(tmp_path / "collection.bin")
+    fingerprint = collection_store.write_collection(file_path, iter(collection))
+    stored = collection_store.CollectionFile(file_path)
+    yield stored, fingerprint
+    stored.close()
+
+
+def test_round_trip(collection, collection_file):
+    stored, fingerprint = collection_file
+    assert stored.fingerprint == fingerprint
+    assert len(stored) == len(collection)
+    assert [attributes(doc) for doc in stored] == [attributes(doc) for doc in collection]
+    assert [stored.document_id_at(position) for position in range(len(stored))] == [
+        doc.document_id for doc in collection
+    ]
+    assert attributes(stored[-1]) == attributes(collection[-1])
+    assert [attributes(doc) for doc in stored[2:5]] == [attributes(doc) for doc in collection[2:5]]
+    with pytest.raises(IndexError):
+        stored[len(collection)]
+
+
+def test_documents_are_decoded_once(collection_file):
+    stored, _ = collection_file
+    assert stored[3] is stored[3]
+
+
+def test_stream_does_not_keep_documents(collection, collection_file):
+    stored, _ = collection_file
+    assert [attributes(doc) for doc in stored.stream()] == [attributes(doc) for doc in collection]
+    assert stored._documents == [None] * len(collection)
+
+
+def test_missing_values_round_trip(tmp_path):
+    documents = [
+        make_document(None, "Untitled", "The fox and the crow"),
+        make_document(7, "Ünïcödé", "Der Fuchs und der Rabe", [], ["fuchs", "rabe"]),
+        make_document(8, "", "", ["crow"]),
+    ]
+    file_path = str(tmp_path / "collection.bin")
+    collection_store.write_collection(file_path, documents)
+    stored = collection_store.CollectionFile(file_path)
+    try:
+        assert [attributes(doc) for doc in stored] == [attributes(doc) for doc in documents]
+        assert stored.document_id_at(0) is None
+    finally:
+        stored.close()
+
+
+def test_fingerprint_depends_on_content(collection, tmp_path):
+    first = collection_store.write_collection(str(tmp_path / "first.bin"), collection)
+    again = collection_store.write_collection(str(tmp_path / "again.bin"), collection)
+    changed = collection_store.write_collection(str(tmp_path / "changed.bin"), collection[1:])
+    assert first == again != changed
+    assert collection_store.read_fingerprint(str(tmp_path / "first.bin")) == first
+
+
+def test_empty_collection(tmp_path):
+    file_path = str(tmp_path / "empty.bin")
+    collection_store.write_collection(file_path, [])
+    stored = collection_store.CollectionFile(file_path)
+    try:
+        assert len(stored) == 0
+        assert list(stored.stream()) == []
+    finally:
+        stored.close()
+
+
+def test_invalid_file_is_rejected(tmp_path):
+    file_path = tmp_path / "collection.json"
+    file_path.write_bytes(b"[]" + bytes(collection_store._HEADER.size))
+    with pytest.raises(ValueError):
+        collection_store.read_fingerprint(str(file_path))
+    with pytest.raises(ValueError):
+        collection_store.CollectionFile(str(file_path))
@@ -0,0 +1,56 @@
+# Contains round-trip tests of the saved inverted index (inverted_index.py) and its use by InvertedListBooleanModel.
+
+import random
+
+import inverted_index
+import models
+
+
+def test_encode_decode_postings():
+    rng = random.Random(3)
+    for _ in range(100):
+        doc_ids = sorted(rng.sample(range(rng.choice((10, 1000, 10 ** 7))), rng.randint(0, 10)))
+        assert inverted_index.decode_postings(inverted_index.encode_postings(doc_ids)) == doc_ids
+    assert inverted_index.encode_postings([0, 1, 300]) == bytes([0, 1, 0xAB, 0x02])
+
+
+def test_write_and_read_index(tmp_path):
+    index = {"fox": [3, 7, 200000], "crow": [7], "café": [1, 2], "ant": []}
+    file_path = str(tmp_path / "index.bin")
+    fingerprint = bytes(range(16))
+    inverted_index.write_inverted_index(file_path, index, fingerprint, stopword_filtering=True)
+
+    index_file = inverted_index.InvertedIndexFile(file_path)
+    try:
+        assert index_file.fingerprint == fingerprint
+        assert index_file.stopword_filtering and not index_file.stemming
+        assert index_file.keys() == sorted(index)
+        assert len(index_file) == 4
+        for term, doc_ids in index.items():
+            assert list(index_file[term]) == doc_ids
+            assert index_file.document_frequency(term) == len(doc_ids)
+        assert "wolf" not in index_file and index_file.get("wolf") is None
+        assert index_file.document_frequency("wolf") == 0
+    finally:
+        index_file.close()
+
+
+def test_saved_index_matches_built_index(tmp_path, collection):
+    file_path = str(tmp_path / "inverted_index_stem.bin")
+    fingerprint = bytes([1]) * 16
+    built = models.InvertedListBooleanModel()
+    built.load_or_build_inverted_list(collection, file_path, fingerprint, stemming=True)
+    assert isinstance(built.inverted_index, dict)
+
+    loaded = models.InvertedListBooleanModel()
+    assert loaded.load_inverted_list(collection, file_path, fingerprint, stemming=True)
+    assert isinstance(loaded.inverted_index, inverted_index.InvertedIndexFile)
+    assert loaded.inverted_index.keys() == sorted(built.inverted_index)
+    for term, posting_list in built.inverted_index.items():
+        assert loaded.postings(term) == posting_list
+        assert loaded.document_frequency(term) == len(posting_list)
+    loaded.inverted_index.close()
+
+    # Indexes of another collection or other preprocessing options are not used.
+    assert not models.InvertedListBooleanModel().load_inverted_list(collection, file_path, bytes(16), stemming=True)
+    assert not models.InvertedListBooleanModel().load_inverted_list(collection, file_path, fingerprint)
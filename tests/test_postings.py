@@ -0,0 +1,55 @@
+# Contains property tests that compare the posting list operations with the corresponding set operations.
+
+import random
+
+import postings
+
+
+def random_posting_list(rng: random.Random, universe: int):
+    return postings.from_doc_ids(rng.sample(range(universe), rng.randint(0, universe)))
+
+
+def random_pairs(count: int = 300):
+    rng = random.Random(4)
+    for _ in range(count):
+        # Small universes produce overlapping lists, large ones lists of very different lengths (galloping).
+        universe = rng.choice((1, 8, 64, 5000))
+        yield random_posting_list(rng, universe), random_posting_list(rng, universe)
+
+
+def test_from_doc_ids_sorts_and_removes_duplicates():
+    assert list(postings.from_doc_ids([5, 1, 5, 3, 1])) == [1, 3, 5]
+    assert list(postings.from_doc_ids([])) == []
+    assert postings.from_doc_ids([2]).typecode == postings.TYPECODE
+
+
+def test_operations_match_set_operations():
+    for left, right in random_pairs():
+        assert list(postings.intersect(left, right)) == sorted(set(left) & set(right))
+        assert list(postings.union(left, right)) == sorted(set(left) | set(right))
+        assert list(postings.difference(left, right)) == sorted(set(left) - set(right))
+
+
+def test_operations_with_empty_lists():
+    some = postings.from_sorted([0, 4, 9])
+    assert list(postings.intersect(some, postings.empty())) == []
+    assert list(postings.intersect(postings.empty(), some)) == []
+    assert list(postings.union(postings.empty(), some)) == [0, 4, 9]
+    assert list(postings.difference(some, postings.empty())) == [0, 4, 9]
+    assert list(postings.difference(postings.empty(), some)) == []
+
+
+def test_intersect_many_matches_set_intersection():
+    rng = random.Random(7)
+    for _ in range(100):
+        lists = [random_posting_list(rng, rng.choice((16, 2000))) for _ in range(rng.randint(1, 5))]
+        expected = set(lists[0]).intersection(*lists[1:])
+        assert list(postings.intersect_many(lists)) == sorted(expected)
+
+
+def test_results_are_posting_lists():
+    for left, right in random_pairs(20):
+        for result in (postings.intersect(left, right), postings.union(left, right),
+                       postings.difference(left, right)):
+            assert result.typecode == postings.TYPECODE
+            assert list(result) == sorted(set(result))
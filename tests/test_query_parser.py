@@ -0,0 +1,109 @@
+# Contains tests of the Boolean query compiler: parsing, negation relaxing, planning and evaluation on posting lists.
+
+import random
+
+import pytest
+
+import postings
+import query_parser
+from query_parser import And, Not, Or, QuerySyntaxError, Term
+
+
+@pytest.mark.parametrize("query, expected", [
+    ("fox", Term("fox")),
+    ("Fox", Term("fox")),
+    ("fox & crow", And((Term("fox"), Term("crow")))),
+    ("fox crow", And((Term("fox"), Term("crow")))),
+    ("fox AND crow", And((Term("fox"), Term("crow")))),
+    ("fox | crow", Or((Term("fox"), Term("crow")))),
+    ("fox or crow", Or((Term("fox"), Term("crow")))),
+    ("fox - crow", And((Term("fox"), Not(Term("crow"))))),
+    ("fox and not crow", And((Term("fox"), Not(Term("crow"))))),
+    ("NOT NOT fox", Not(Not(Term("fox")))),
+    ("a | b & c", Or((Term("a"), And((Term("b"), Term("c")))))),
+    ("(a | b) & c", And((Or((Term("a"), Term("b"))), Term("c")))),
+    ("a & (b & c)", And((Term("a"), Term("b"), Term("c")))),
+    ("lion's share", And((Term("lion's"), Term("share")))),
+])
+def test_parse(query, expected):
+    assert query_parser.parse(query) == expected
+
+
+@pytest.mark.parametrize("query", ["", "   ", "!?"])
+def test_parse_empty_query(query):
+    assert query_parser.parse(query) is None
+
+
+@pytest.mark.parametrize("query", ["(fox", "fox)", "fox &", "| fox", "NOT", "()", "fox & | crow"])
+def test_parse_malformed_query(query):
+    with pytest.raises(QuerySyntaxError):
+        query_parser.parse(query)
+
+
+def test_compile_query_normalizes_whitespace_and_caches():
+    node = query_parser.compile_query("fox   &  crow")
+    assert node == And((Term("fox"), Term("crow")))
+    assert query_parser.compile_query("fox & crow") is node
+
+
+def test_map_and_remove_terms():
+    node = query_parser.parse("the fox | NOT (the crow)")
+    assert node.map_terms(str.upper) == Or((And((Term("THE"), Term("FOX"))), Not(And((Term("THE"), Term("CROW"))))))
+    assert node.remove_terms(lambda term: term == "the") == Or((Term("fox"), Not(Term("crow"))))
+    assert query_parser.parse("the").remove_terms(lambda term: term == "the") is None
+
+
+@pytest.mark.parametrize("query, expected", [
+    ("fox - crow", Term("fox")),
+    ("fox & (crow | NOT lion)", Term("fox")),
+    ("fox | NOT crow", None),
+    ("NOT fox", None),
+    ("(fox | crow) & wolf", And((Or((Term("fox"), Term("crow"))), Term("wolf")))),
+])
+def test_relax_negations(query, expected):
+    assert query_parser.relax_negations(query_parser.parse(query)) == expected
+
+
+def test_plan_orders_operands_by_cost_and_negations_last():
+    frequencies = {"a": 50, "b": 2, "c": 10, "d": 1}
+    node = query_parser.parse("NOT d & a & (b | c) & c")
+    planned = query_parser.plan(node, frequencies.get)
+    assert planned == And((Term("c"), Or((Term("b"), Term("c"))), Term("a"), Not(Term("d"))))
+    assert query_parser.estimate(planned, frequencies.get) == 10
+
+
+def random_query(rng: random.Random, terms: list[str], depth: int = 0):
+    if depth >= 3 or rng.random() < 0.3:
+        return Term(rng.choice(terms))
+    kind = rng.choice((Not, And, Or))
+    if kind is Not:
+        return Not(random_query(rng, terms, depth + 1))
+    return kind(tuple(random_query(rng, terms, depth + 1) for _ in range(rng.randint(2, 3))))
+
+
+def test_evaluate_matches_brute_force():
+    rng = random.Random(11)
+    terms = ["fox", "crow", "wolf", "lamb", "lion"]
+    documents = [set(rng.sample(terms, rng.randint(0, len(terms)))) for _ in range(40)]
+    index = {term: postings.from_doc_ids(position for position, document in enumerate(documents) if term in document)
+             for term in terms}
+
+    def lookup(term):
+        return index.get(term, postings.empty())
+
+    def lookup_all(query_terms):
+        return postings.intersect_many([lookup(term) for term in query_terms])
+
+    def universe():
+        return postings.from_sorted(range(len(documents)))
+
+    for _ in range(200):
+        node = random_query(rng, terms)
+        expected = [position for position, document in enumerate(documents) if node.matches(document)]
+        planned = query_parser.plan(node, lambda term: len(lookup(term)))
+        assert list(query_parser.evaluate(node, lookup, universe)) == expected
+        assert list(query_parser.evaluate(planned, lookup, universe)) == expected
+        assert list(query_parser.evaluate(planned, lookup, universe, lookup_all)) == expected
+        relaxed = query_parser.relax_negations(node)
+        if relaxed is not None:
+            assert set(expected) <= set(query_parser.evaluate(relaxed, lookup, universe))
@@ -0,0 +1,130 @@
+# Contains tests of the query result cache of the IR system and of the LRU cache it is built on (see cache.py).
+
+import pytest
+
+import cache
+import extraction
+import ir_system
+import preprocessing
+import segments
+
+
+@pytest.fixture
+def system(collection, tmp_path, monkeypatch):
+    # The generated index files are written to tmp_path instead of data/.
+    monkeypatch.setattr(ir_system, "DATA_PATH", str(tmp_path))
+    monkeypatch.setattr(ir_system, "COLLECTION_PATH", str(tmp_path / "my_collection.json"))
+    monkeypatch.setattr(ir_system, "COLLECTION_STORE_PATH", str(tmp_path / "my_collection.bin"))
+    monkeypatch.setattr(ir_system, "SEGMENT_PATH", str(tmp_path / "segments"))
+    monkeypatch.setattr(ir_system, "STOPWORD_FILE_PATH", str(tmp_path / "stopwords.json"))
+    irs = ir_system.InformationRetrievalSystem()
+    irs.collection = segments.SegmentedCollection(list(collection), None, background_merges=False)
+    irs.model = irs.create_model(ir_system.MODEL_VECTOR)
+
+    searches = []
+    uncached_search = irs._search
+
+    def counting_search(query, stemming, stop_word_filtering):
+        searches.append(query)
+        return uncached_search(query, stemming, stop_word_filtering)
+
+    irs._search = counting_search
+    irs.searches = searches
+    yield irs
+    irs.close()
+
+
+def add_document(irs, title: str, text: str):
+    document = extraction.create_document(title, text)
+    preprocessing.preprocess_collection([document], True, True, irs.stop_word_filter or None, workers=1)
+    return irs.collection.add(document)
+
+
+def test_repeated_query_is_answered_from_the_cache(system):
+    results = system.search("fox crow", False, False)
+    ranking = system.last_ranking
+    assert results
+
+    # Case and whitespace do not change the results, so they do not change the key either.
+    assert system.search("  Fox   CROW ", False, False) == results
+    assert system.searches == ["fox crow"]
+    assert system.last_ranking is ranking
+    assert system.result_cache.stats()["hits"] == 1
+
+
+def test_search_options_have_their_own_entries(system):
+    system.search("fox crow", False, False)
+    system.search("fox crow", True, False)
+    system.search("fox crow", False, True)
+    system.output_k = 2
+    assert len(system.search("fox crow", False, False)) <= 2
+    system.model = system.create_model(ir_system.MODEL_BOOL_INV)
+    system.search("fox crow", False, False)
+    assert len(system.searches) == 5
+
+
+def test_cached_ranking_is_restored(system):
+    system.output_k = 2
+    system.search("the fox", False, False)
+    ranking = system.last_ranking
+    system.search("the crow", False, False)
+    assert system.last_ranking is not ranking
+
+    system.search("the fox", False, False)
+    assert system.last_ranking is ranking
+    assert len(system.last_ranking.page(1, 2)) == 2
+
+
+def test_added_document_invalidates_the_cache(system):
+    system.search("zebra", False, False)
+    assert system.search("zebra", False, False) == []
+    position = add_document(system, "The Zebra", "A zebra met a fox.")
+
+    results = system.search("zebra", False, False)
+    assert system.searches == ["zebra", "zebra"]
+    assert [document.document_id for _, document in results] == [system.collection[position].document_id]
+
+
+def test_deleted_document_invalidates_the_cache(system):
+    results = system.search("fox crow", False, False)
+    best = results[0][1]
+    system.collection.delete(system.collection.position_of(best.document_id))
+
+    results = system.search("fox crow", False, False)
+    assert len(system.searches) == 2
+    assert best.document_id not in [document.document_id for _, document in results]
+
+
+def test_new_collection_store_invalidates_the_cache(system):
+    system.search("fox crow", False, False)
+    base = system.collection.base
+    system.collection = segments.SegmentedCollection(base, None, bytes(range(16)), background_merges=False)
+    system.search("fox crow", False, False)
+    assert len(system.searches) == 2
+
+
+def test_entries_expire():
+    now = [0.0]
+    expired = []
+    lru_cache = cache.LRUCache(4, ttl=10, clock=lambda: now[0], on_evict=lambda key, value: expired.append(key))
+    lru_cache.put("fox", 1)
+    now[0] = 9.5
+    assert lru_cache.get("fox") == 1
+    now[0] = 10.0
+    assert "fox" not in lru_cache
+    assert lru_cache.get("fox") is None
+    assert expired == ["fox"]
+    assert lru_cache.stats()["expirations"] == 1
+
+
+def test_least_recently_used_entries_are_evicted():
+    lru_cache = cache.LRUCache(3, max_bytes=10, sizeof=len)
+    lru_cache.put("fox", "aaaa")
+    lru_cache.put("crow", "bbbb")
+    lru_cache.get("fox")
+    lru_cache.put("wolf", "cccc")  # Exceeds max_bytes, the crow was used least recently.
+    assert "crow" not in lru_cache
+    assert "fox" in lru_cache and "wolf" in lru_cache
+    assert lru_cache.bytes == 8
+    lru_cache.put("lamb", "d" * 20)  # The newest entry is kept even if it alone is too large.
+    assert len(lru_cache) == 1 and "lamb" in lru_cache
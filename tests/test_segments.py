@@ -0,0 +1,129 @@
+# Contains round-trip tests of the segmented collection: adding, flushing, merging, deleting and reopening documents.
+
+import os
+
+import collection_store
+import extraction
+import segments
+
+
+def create_documents(count: int, first: int = 0) -> list:
+    return [extraction.create_document(f"Fable {number}", f"The fox met crow number {number}.")
+            for number in range(first, first + count)]
+
+
+def open_collection(directory, base=(), base_fingerprint=bytes(16)) -> segments.SegmentedCollection:
+    return segments.SegmentedCollection(list(base), str(directory), base_fingerprint,
+                                        segments.MergePolicy(max_buffered_documents=4, segments_per_tier=2),
+                                        background_merges=False)
+
+
+def contents(collection: segments.SegmentedCollection) -> list:
+    return [(collection.document_id_at(position), collection[position].title, collection[position].terms)
+            for position in range(len(collection))]
+
+
+def test_add_flush_merge_reopen(tmp_path):
+    base = create_documents(3)
+    for document_id, document in enumerate(base):
+        document.document_id = document_id
+    collection = open_collection(tmp_path, base)
+    for document in create_documents(13, first=3):
+        collection.add(document)
+    collection.wait_for_merges()
+
+    assert len(collection) == 16
+    assert [len(segment) for segment in collection.segments] == [8, 4]  # Two segments of 4 were merged.
+    assert len(collection.buffer) == 1
+    assert [segment.start for segment in collection.segments] == [3, 11]
+    assert isinstance(collection.segments[0].documents, collection_store.CollectionFile)
+    assert [collection.document_id_at(position) for position in range(16)] == list(range(16))
+    expected = contents(collection)
+    assert expected[5][1:] == ("Fable 5", ["Fable", "5", "The", "fox", "met", "crow", "number", "5."])
+    fingerprint = collection.fingerprint()
+    collection.close()
+
+    reopened = open_collection(tmp_path, base)
+    assert contents(reopened) == expected
+    assert reopened.fingerprint() == fingerprint
+    assert reopened.next_document_id == 16
+    assert reopened.add(create_documents(1, first=16)[0]) == 16
+    assert reopened.document_id_at(16) == 16
+    reopened.close()
+
+
+def test_deleted_documents_are_compacted_and_keep_their_position(tmp_path):
+    collection = open_collection(tmp_path)
+    for document in create_documents(4):
+        collection.add(document)
+    assert collection.delete(1)
+    assert not collection.delete(1)
+    for document in create_documents(4, first=4):
+        collection.add(document)
+    collection.wait_for_merges()
+
+    assert [len(segment) for segment in collection.segments] == [8]
+    assert collection[1].title == "" and collection[1].terms == []
+    assert collection.document_id_at(1) == 1
+    assert collection[2].title == "Fable 2"
+    assert collection.position_of(1) is None
+    assert collection.position_of(6) == 6
+    assert list(collection.live_positions()) == [0, 2, 3, 4, 5, 6, 7]
+    collection.close()
+
+    reopened = open_collection(tmp_path)
+    assert reopened.deleted == {1}
+    assert [document.title for document in reopened.live_documents()] == [
+        "Fable 0", "Fable 2", "Fable 3", "Fable 4", "Fable 5", "Fable 6", "Fable 7"]
+    reopened.close()
+
+
+def test_buffer_of_an_interrupted_flush_is_not_loaded_twice(tmp_path):
+    collection = open_collection(tmp_path)
+    for document in create_documents(3):
+        collection.add(document)
+    # The buffer file is not emptied after the flush, as if the system stopped right after saving the manifest.
+    collection._save_buffer = lambda: None
+    collection.add(create_documents(1, first=3)[0])
+    buffer_file = collection_store.CollectionFile(os.path.join(tmp_path, segments.BUFFER_FILE_NAME))
+    assert len(buffer_file) == 3
+    buffer_file.close()
+    collection.close()
+
+    reopened = open_collection(tmp_path)
+    assert [reopened[position].title for position in range(len(reopened))] == [
+        "Fable 0", "Fable 1", "Fable 2", "Fable 3"]
+    assert len(reopened.buffer) == 0
+    reopened.close()
+
+
+def test_manifest_of_another_base_collection_is_discarded(tmp_path):
+    collection = open_collection(tmp_path)
+    for document in create_documents(2):
+        collection.add(document)
+    collection.close()
+
+    reopened = open_collection(tmp_path, base_fingerprint=bytes(range(16)))
+    assert len(reopened) == 0
+    assert not reopened.has_segments
+    assert not os.listdir(tmp_path)
+    reopened.close()
+
+
+def test_retired_segments_stay_readable_after_a_merge(tmp_path):
+    collection = open_collection(tmp_path)
+    for document in create_documents(8):
+        collection.add(document)
+    collection.add(create_documents(1, first=8)[0])
+    for document in create_documents(3, first=9):
+        collection.add(document)
+    # A search that took the segment list before the merge may still read the retired segments.
+    segments_before_merge = collection.index_segments()
+    for document in create_documents(4, first=12):
+        collection.add(document)
+    collection.wait_for_merges()
+
+    assert [len(segment) for segment in collection.segments] == [16]
+    assert [segment.documents[position].title for segment in segments_before_merge
+            for position in range(len(segment))] == [f"Fable {number}" for number in range(12)]
+    collection.close()
@@ -0,0 +1,32 @@
+# Contains tests of the verification stage of the signature search, which removes the false drops of the signatures.
+
+import pytest
+
+import ir_system
+import models
+import porter
+import query_parser
+
+QUERIES = ["fox & crow", "wolf | lamb", "fox - crow", "NOT fox", "lion & (mouse | net)", "fox & NOT (crow | grapes)",
+           "zebra", "fox | zebra"]
+
+
+@pytest.mark.parametrize("stopword_filtering, stemming", [(False, False), (True, True)])
+def test_verified_results_match_exact_results(collection, stopword_filtering, stemming):
+    # With few bits per signature, many documents are false drops that the verification has to remove.
+    model = models.SignatureBasedBooleanModel(F=16, D=2)
+    model.build_signature_matrix(collection, stopword_filtering, stemming)
+    term_sets = [frozenset(model.document_terms(document, stopword_filtering, stemming)) for document in collection]
+
+    false_drops = 0
+    for query in QUERIES:
+        node = query_parser.compile_query(query)
+        if stemming:
+            node = node.map_terms(porter.default_stemmer.stem)
+        expected = [position for position, term_set in enumerate(term_sets) if node.matches(term_set)]
+
+        candidates = ir_system.InformationRetrievalSystem._signature_candidates(model, node)
+        assert set(candidates) >= set(expected)
+        assert list(model.verify(candidates, node)) == expected
+        false_drops += len(candidates) - len(expected)
+    assert false_drops > 0
@@ -0,0 +1,68 @@
+# Contains tests of the signature based Boolean model: the signature matrix and its vectorized matching.
+
+import numpy as np
+import pytest
+
+import models
+
+QUERY_TERMS = [["fox"], ["fox", "crow"], ["wolf", "lamb"], ["lion", "mouse", "net"], ["zebra"], []]
+
+
+@pytest.fixture(scope="module")
+def signature_model(collection):
+    model = models.SignatureBasedBooleanModel(F=64, D=4)
+    model.build_signature_matrix(collection)
+    return model
+
+
+def test_matrix_rows_are_document_signatures(signature_model, collection):
+    matrix = signature_model.signature_matrix
+    assert matrix.shape == (len(collection), 1) and matrix.dtype == np.uint64
+    for position in (0, 17, len(collection) - 1):
+        assert np.array_equal(matrix[position], signature_model.document_to_representation(collection[position]))
+
+
+@pytest.mark.parametrize("terms", QUERY_TERMS)
+def test_matching_documents_matches_row_by_row(signature_model, collection, terms):
+    query_signature = signature_model._create_signature(terms)
+    expected = [position for position in range(len(collection))
+                if signature_model.match(signature_model.signature_matrix[position], query_signature)]
+    assert list(signature_model.matching_documents(terms)) == expected
+    # Signatures may have false drops, but never miss a document that contains all terms.
+    assert set(expected) >= {position for position in range(len(collection))
+                             if set(terms) <= set(signature_model.document_terms(collection[position]))}
+
+
+@pytest.mark.parametrize("F, D, hash_scheme", [(64, 4, "blake2b"), (100, 3, "crc32"), (256, 4, "md5")])
+def test_bit_sliced_layout_matches_rows(collection, F, D, hash_scheme):
+    rows = models.SignatureBasedBooleanModel(F=F, D=D, hash_scheme=hash_scheme)
+    rows.build_signature_matrix(collection, stopword_filtering=True)
+    sliced = models.SignatureBasedBooleanModel(F=F, D=D, hash_scheme=hash_scheme, bit_sliced=True)
+    sliced.build_signature_matrix(collection, stopword_filtering=True)
+    assert sliced.signature_slices.shape == (F, (len(collection) + 63) // 64)
+    for terms in QUERY_TERMS:
+        assert list(sliced.matching_documents(terms)) == list(rows.matching_documents(terms))
+        assert list(sliced.documents_matching_any(terms)) == list(rows.documents_matching_any(terms))
+
+
+@pytest.mark.parametrize("bit_sliced", [False, True])
+def test_saved_signatures_are_reused(tmp_path, collection, bit_sliced):
+    file_path = str(tmp_path / "signatures.npz")
+    fingerprint = bytes([2]) * 16
+    built = models.SignatureBasedBooleanModel(bit_sliced=bit_sliced)
+    built.load_or_build_signatures(collection, file_path, fingerprint, stemming=True)
+
+    loaded = models.SignatureBasedBooleanModel(bit_sliced=bit_sliced)
+    assert loaded.load_signatures(collection, file_path, fingerprint, stemming=True)
+    for terms in QUERY_TERMS:
+        assert list(loaded.matching_documents(terms)) == list(built.matching_documents(terms))
+
+    # Signatures of another collection, preprocessing, layout or hash scheme are rebuilt.
+    assert not models.SignatureBasedBooleanModel(bit_sliced=bit_sliced).load_signatures(
+        collection, file_path, bytes(16), stemming=True)
+    assert not models.SignatureBasedBooleanModel(bit_sliced=bit_sliced).load_signatures(
+        collection, file_path, fingerprint)
+    assert not models.SignatureBasedBooleanModel(bit_sliced=not bit_sliced).load_signatures(
+        collection, file_path, fingerprint, stemming=True)
+    assert not models.SignatureBasedBooleanModel(bit_sliced=bit_sliced, hash_scheme="crc32").load_signatures(
+        collection, file_path, fingerprint, stemming=True)
@@ -0,0 +1,61 @@
+# Contains tests of the native TF-IDF index, which replaced scikit-learn's TfidfVectorizer in the vector space model.
+
+import numpy as np
+import pytest
+
+import models
+import tfidf
+
+QUERIES = ["fox crow", "the wolf and the lamb", "lion mouse net", "a man and his ass went to the market", "zebra",
+           "fox fox grapes"]
+
+
+@pytest.fixture(scope="module")
+def term_lists(collection) -> list:
+    model = models.VectorSpaceModel()
+    return [model.document_to_representation(document, True, True) for document in collection]
+
+
+@pytest.fixture(scope="module")
+def index(term_lists) -> tfidf.TfidfIndex:
+    return tfidf.TfidfIndex.from_term_lists(term_lists, bytes(range(16)))
+
+
+@pytest.mark.parametrize("query", QUERIES)
+def test_scores_match_scikit_learn(term_lists, index, query):
+    feature_extraction = pytest.importorskip("sklearn.feature_extraction.text")
+    pairwise = pytest.importorskip("sklearn.metrics.pairwise")
+    # The terms are already preprocessed, so scikit-learn must take them as they are.
+    vectorizer = feature_extraction.TfidfVectorizer(analyzer=lambda terms: terms)
+    document_vectors = vectorizer.fit_transform(term_lists)
+
+    query_terms = models.VectorSpaceModel().query_to_representation(query, stemming=True)
+    expected = pairwise.cosine_similarity(vectorizer.transform([query_terms]), document_vectors).flatten()
+    np.testing.assert_allclose(index.score(*index.query_vector(query_terms)), expected, atol=1e-12)
+
+
+def test_idf_matches_scikit_learn(term_lists, index):
+    feature_extraction = pytest.importorskip("sklearn.feature_extraction.text")
+    vectorizer = feature_extraction.TfidfVectorizer(analyzer=lambda terms: terms)
+    vectorizer.fit(term_lists)
+    assert index.terms.tolist() == vectorizer.get_feature_names_out().tolist()
+    np.testing.assert_allclose(index.idf, vectorizer.idf_)
+
+
+def test_save_and_load_round_trip(index, tmp_path):
+    index.save(str(tmp_path / "tfidf"))
+    loaded = tfidf.TfidfIndex.load(str(tmp_path / "tfidf"))
+
+    assert loaded.fingerprint == index.fingerprint
+    assert loaded.terms.tolist() == index.terms.tolist()
+    for name in ("idf", "indptr", "indices", "data", "norms"):
+        np.testing.assert_array_equal(getattr(loaded, name), getattr(index, name))
+    for query in QUERIES:
+        terms = query.split()
+        np.testing.assert_array_equal(loaded.score(*loaded.query_vector(terms)),
+                                      index.score(*index.query_vector(terms)))
+
+
+def test_document_frequency(term_lists, index):
+    for term in ("fox", "crow", "unknown"):
+        assert index.document_frequency(term) == sum(term in term_list for term_list in term_lists)
@@ -0,0 +1,63 @@
+# Contains tests of the term-at-a-time search of the vector space model, which stops early once the remaining query
+# terms cannot change the k best documents.
+
+import numpy as np
+import pytest
+
+import models
+
+QUERIES = ["fox crow", "the wolf and the lamb", "lion mouse net", "a man and his ass went to the market", "the",
+           "zebra", "in a dog", "a and ass", "lamb a was man mouse", "it mouse crow said he"]
+
+
+@pytest.fixture(scope="module")
+def vector_model(collection):
+    model = models.VectorSpaceModel()
+    model.build_inverted_list(collection)
+    return model
+
+
+def top_k(scores: np.ndarray, positions: np.ndarray, k: int) -> np.ndarray:
+    positions = positions[scores[positions] > 0]
+    return positions[np.argsort(-scores[positions], kind="stable")[:k]]
+
+
+@pytest.mark.parametrize("query", QUERIES)
+@pytest.mark.parametrize("k", [1, 3, 10])
+def test_exact_search_matches_exhaustive_scoring(vector_model, query, k):
+    term_ids, weights = vector_model.query_vector(vector_model.query_to_representation(query))
+    expected = vector_model.index.score(term_ids, weights)
+    scores, touched, statistics = vector_model.term_at_a_time_search(term_ids, weights, k)
+
+    best = top_k(scores, touched, k)
+    expected_best = top_k(expected, np.arange(len(expected)), k)
+    # Ties may be broken differently, but the scores of the k best documents must be the exhaustive ones.
+    np.testing.assert_allclose(scores[best], expected[best])
+    np.testing.assert_allclose(scores[best], expected[expected_best])
+    assert statistics["terms_processed"] <= statistics["query_terms"]
+
+
+def test_exact_search_stops_early(vector_model):
+    term_ids, weights = vector_model.query_vector(
+        vector_model.query_to_representation("a man and his ass went to the market")
+    )
+    _, _, statistics = vector_model.term_at_a_time_search(term_ids, weights, 1)
+    assert statistics["terms_processed"] < statistics["query_terms"]
+    assert statistics["postings_read"] < sum(vector_model.index.document_frequency(term)
+                                             for term in vector_model.index.terms[term_ids].tolist())
+
+
+@pytest.mark.parametrize("query", QUERIES)
+def test_approximate_search_never_overestimates(vector_model, query):
+    term_ids, weights = vector_model.query_vector(vector_model.query_to_representation(query))
+    expected = vector_model.index.score(term_ids, weights)
+    scores, _, _ = vector_model.term_at_a_time_search(term_ids, weights, 3, exact=False, tolerance=0.5)
+    assert np.all(scores <= expected + 1e-12)
+
+
+def test_zero_k_returns_no_documents(vector_model):
+    term_ids, weights = vector_model.query_vector(vector_model.query_to_representation("fox crow"))
+    scores, touched, statistics = vector_model.term_at_a_time_search(term_ids, weights, 0)
+    assert len(touched) == 0
+    assert not scores.any()
+    assert statistics["terms_processed"] == 0
@@ -0,0 +1,171 @@
+# Contains a self-contained sparse TF-IDF index for the vector space model.
+#
+# Weights follow the usual smoothed TF-IDF scheme (raw term frequency, idf = ln((1 + N) / (1 + df)) + 1) and vectors
+# are compared by cosine similarity. Document vectors are stored in CSR form (one row per document) together with
+# their norms; a term-major copy of the normalized weights serves as weighted inverted index.
+
+import os
+from collections import Counter
+
+import numpy as np
+
+_ARRAYS = ("terms", "idf", "indptr", "indices", "data", "norms", "fingerprint")
+
+
+def inverse_document_frequency(document_count, document_frequencies):
+    """
+    Smoothed inverse document frequency: ln((1 + N) / (1 + df)) + 1.
+    """
+    return np.log((1 + document_count) / (1 + np.asarray(document_frequencies, dtype=np.float64))) + 1
+
+
+class TfidfIndex(object):
+    def __init__(self, terms: np.ndarray, idf: np.ndarray, indptr: np.ndarray, indices: np.ndarray, data: np.ndarray,
+                 norms: np.ndarray, fingerprint: bytes = bytes(16)):
+        """
+        :param terms: Vocabulary, sorted; the position of a term is its id
+        :param idf: Inverse document frequency per term id
+        :param indptr: CSR row pointers, the entries of document d are indptr[d]:indptr[d + 1]
+        :param indices: CSR term ids, sorted within each row
+        :param data: CSR TF-IDF weights (not normalized)
+        :param norms: L2 norm of each document vector
+        :param fingerprint: Fingerprint of the collection the index was built from
+        """
+        self.terms = terms
+        self.vocabulary = {term: term_id for term_id, term in enumerate(terms.tolist())}
+        self.idf = idf
+        self.indptr = indptr
+        self.indices = indices
+        self.data = data
+        self.norms = norms
+        self.fingerprint = fingerprint
+        self._build_term_major()
+
+    @classmethod
+    def from_term_lists(cls, term_lists: list[list[str]], fingerprint: bytes = bytes(16),
+                        reference: "TfidfIndex" = None) -> "TfidfIndex":
+        """
+        Builds an index from the (already preprocessed) terms of each document.
+        :param term_lists: One list of terms per document
+        :param fingerprint: Fingerprint of the collection the index is built from
+        :param reference: Index of other documents of the same collection (e. g. of the base collection, when the
+        documents are a segment added to it); its documents are included in the document frequencies
+        :return: New TfidfIndex
+        """
+        counts = [Counter(term_list) for term_list in term_lists]
+        terms = sorted(set().union(*counts)) if counts else []
+        vocabulary = {term: term_id for term_id, term in enumerate(terms)}
+
+        indptr = np.zeros(len(counts) + 1, dtype=np.int64)
+        indices = []
+        frequencies = []
+        for row, term_counts in enumerate(counts):
+            row_entries = sorted((vocabulary[term], count) for term, count in term_counts.items())
+            indices.extend(term_id for term_id, _ in row_entries)
+            frequencies.extend(count for _, count in row_entries)
+            indptr[row + 1] = len(indices)
+        indices = np.array(indices, dtype=np.int32)
+        frequencies = np.array(frequencies, dtype=np.float64)
+
+        document_count = len(counts)
+        document_frequencies = np.bincount(indices, minlength=len(terms))
+        if reference is not None:
+            document_count += reference.document_count
+            document_frequencies = document_frequencies + np.array(
+                [reference.document_frequency(term) for term in terms], dtype=np.int64)
+        idf = inverse_document_frequency(document_count, document_frequencies)
+        data = frequencies * idf[indices]
+        rows = np.repeat(np.arange(len(counts)), np.diff(indptr))
+        norms = np.sqrt(np.bincount(rows, weights=data ** 2, minlength=len(counts)))
+        return cls(np.array(terms, dtype=str), idf, indptr, indices, data, norms, fingerprint)
+
+    def _build_term_major(self):
+        """
+        Transposes the normalized document vectors into one weighted posting list per term. The postings of term t
+        are term_documents[term_pointers[t]:term_pointers[t + 1]] (sorted) with the matching term_weights.
+        """
+        rows = np.repeat(np.arange(len(self.norms)), np.diff(self.indptr))
+        safe_norms = np.where(self.norms > 0, self.norms, 1.0)
+        normalized = self.data / safe_norms[rows]
+        order = np.argsort(self.indices, kind="stable")
+        self.term_documents = rows[order]
+        self.term_weights = normalized[order]
+        self.term_pointers = np.zeros(len(self.terms) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(self.indices, minlength=len(self.terms)), out=self.term_pointers[1:])
+        self.term_max_weights = np.zeros(len(self.terms))
+        non_empty = np.flatnonzero(np.diff(self.term_pointers) > 0)
+        if non_empty.size:
+            self.term_max_weights[non_empty] = np.maximum.reduceat(self.term_weights, self.term_pointers[non_empty])
+
+    @property
+    def document_count(self) -> int:
+        return len(self.norms)
+
+    def document_frequency(self, term: str) -> int:
+        """
+        :return: Number of documents that contain a term
+        """
+        term_id = self.vocabulary.get(term)
+        if term_id is None:
+            return 0
+        return int(self.term_pointers[term_id + 1] - self.term_pointers[term_id])
+
+    def query_vector(self, terms: list[str]) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Weights the terms of a query with the collection's IDF values. Unknown terms are ignored.
+        :param terms: Preprocessed query terms
+        :return: Term ids and L2 normalized weights
+        """
+        counts = Counter(self.vocabulary[term] for term in terms if term in self.vocabulary)
+        term_ids = np.array(sorted(counts), dtype=np.int64)
+        weights = np.array([counts[term_id] for term_id in term_ids.tolist()], dtype=np.float64) * self.idf[term_ids]
+        norm = np.sqrt(np.dot(weights, weights))
+        return term_ids, (weights / norm if norm > 0 else weights)
+
+    def document_vector(self, row: int) -> tuple[np.ndarray, np.ndarray]:
+        """
+        :param row: Position of the document
+        :return: Term ids and L2 normalized weights of the document
+        """
+        start, end = self.indptr[row], self.indptr[row + 1]
+        norm = self.norms[row]
+        return self.indices[start:end], (self.data[start:end] / norm if norm > 0 else self.data[start:end])
+
+    def score(self, term_ids: np.ndarray, weights: np.ndarray) -> np.ndarray:
+        """
+        Computes the cosine similarity of a query vector to all documents (a sparse matrix-vector product over the
+        posting lists of the query terms).
+        :return: Scores of all documents
+        """
+        scores = np.zeros(self.document_count)
+        for term_id, weight in zip(term_ids.tolist(), weights.tolist()):
+            start, end = self.term_pointers[term_id], self.term_pointers[term_id + 1]
+            scores[self.term_documents[start:end]] += weight * self.term_weights[start:end]
+        return scores
+
+    def save(self, directory: str):
+        """
+        Saves the index as one .npy file per array into a directory.
+        :param directory: Target directory, created if necessary
+        """
+        os.makedirs(directory, exist_ok=True)
+        arrays = {
+            "terms": self.terms, "idf": self.idf, "indptr": self.indptr, "indices": self.indices, "data": self.data,
+            "norms": self.norms, "fingerprint": np.frombuffer(self.fingerprint, dtype=np.uint8),
+        }
+        for name, values in arrays.items():
+            np.save(os.path.join(directory, name + ".npy"), values)
+
+    @classmethod
+    def load(cls, directory: str) -> "TfidfIndex":
+        """
+        Loads an index that was saved with save(). The numeric arrays are memory-mapped.
+        :param directory: Directory of the saved index
+        :return: Loaded TfidfIndex
+        """
+        arrays = {}
+        for name in _ARRAYS:
+            mmap_mode = None if name in ("terms", "fingerprint") else "r"
+            arrays[name] = np.load(os.path.join(directory, name + ".npy"), mmap_mode=mmap_mode)
+        return cls(arrays["terms"], arrays["idf"], arrays["indptr"], arrays["indices"], arrays["data"],
+                   arrays["norms"], arrays["fingerprint"].tobytes())